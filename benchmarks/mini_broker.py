@@ -0,0 +1,332 @@
+"""
+Minimal MQTT Broker
+
+An in-process broker stand-in for offline benchmarks. It runs its own
+asyncio event loop on a background thread and speaks just enough of MQTT
+3.1.1 and 5.0 for paho clients: CONNECT, PUBLISH (QoS 0/1/2), PUBACK,
+SUBSCRIBE, UNSUBSCRIBE, PINGREQ and DISCONNECT. MQTT 5 shared
+subscriptions ($share/<group>/<filter>) are delivered round-robin to the
+group's members. MQTT 5 properties are read and ignored. There is no
+authentication, no retained messages, no will messages and no session
+persistence. Granted subscription QoS is capped at 1.
+"""
+
+import asyncio
+import logging
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from paho.mqtt.client import topic_matches_sub
+
+
+# Control packet types (upper nibble of the fixed header)
+CONNECT = 1
+CONNACK = 2
+PUBLISH = 3
+PUBACK = 4
+PUBREC = 5
+PUBREL = 6
+PUBCOMP = 7
+SUBSCRIBE = 8
+SUBACK = 9
+UNSUBSCRIBE = 10
+UNSUBACK = 11
+PINGREQ = 12
+PINGRESP = 13
+DISCONNECT = 14
+
+MQTTV5 = 5
+
+# Called as on_publish(client_id, topic, payload) for every client PUBLISH;
+# return True to consume the message instead of routing it to subscribers
+PublishHook = Callable[[str, str, bytes], bool]
+
+
+def _encode_remaining_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        encoded.append(byte)
+        if not length:
+            return bytes(encoded)
+
+
+def _decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decode a variable byte integer; returns (value, offset after it)."""
+    value, multiplier = 0, 1
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            return value, offset
+        multiplier *= 128
+
+
+def _skip_properties(data: bytes, offset: int) -> int:
+    """Skip an MQTT 5 property block; returns the offset after it."""
+    length, offset = _decode_varint(data, offset)
+    return offset + length
+
+
+def _encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return bytes([(packet_type << 4) | flags]) + _encode_remaining_length(len(body)) + body
+
+
+@dataclass
+class _Session:
+    client_id: str
+    writer: asyncio.StreamWriter
+    version: int = 4
+    subscriptions: Dict[str, int] = field(default_factory=dict)
+    next_packet_id: int = 0
+
+    def packet_id(self) -> int:
+        self.next_packet_id = self.next_packet_id % 0xFFFF + 1
+        return self.next_packet_id
+
+
+class MiniBroker:
+    """Minimal MQTT 3.1.1/5.0 broker running on its own thread and event loop."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        on_publish: Optional[PublishHook] = None
+    ):
+        self.host = host
+        self.port = port
+        self.on_publish = on_publish
+
+        self.logger = logging.getLogger(__name__)
+
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ready = threading.Event()
+        self._sessions: List[_Session] = []
+        # topic -> (direct [(session, granted_qos)], shared [[(session, granted_qos)]]),
+        # rebuilt when subscriptions change
+        self._route_cache: Dict[str, Tuple[List[Tuple[_Session, int]], List[list]]] = {}
+        # (group, filter) -> round-robin position
+        self._share_cursor: Dict[Tuple[str, str], int] = {}
+
+    def start(self, timeout: float = 5.0):
+        """Start the broker thread and wait until it is listening."""
+        self._thread = threading.Thread(target=self._run, name="mini-broker", daemon=True)
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("Broker did not start in time")
+
+    def stop(self, timeout: float = 5.0):
+        """Close all connections and stop the broker thread."""
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self.loop = None
+
+    def call(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the broker loop from another thread and return its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def subscription_count(self) -> int:
+        """Number of active subscriptions across all sessions."""
+        return sum(len(s.subscriptions) for s in list(self._sessions))
+
+    def thread_cpu_time(self) -> float:
+        """CPU seconds consumed by the broker thread."""
+        async def _cpu() -> float:
+            return time.thread_time()
+        return self.call(_cpu(), timeout=5.0)
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0) -> int:
+        """
+        Deliver a message to matching subscribers (broker thread only).
+
+        Returns the number of subscribers it was written to. Callers sending
+        many messages should await drain() afterwards.
+        """
+        routes = self._route_cache.get(topic)
+        if routes is None:
+            routes = self._build_routes(topic)
+            self._route_cache[topic] = routes
+        direct, shared = routes
+        for session, granted in direct:
+            self._deliver(session, topic, payload, min(qos, granted))
+        for key, members in shared:
+            position = self._share_cursor.get(key, 0)
+            self._share_cursor[key] = position + 1
+            session, granted = members[position % len(members)]
+            self._deliver(session, topic, payload, min(qos, granted))
+        return len(direct) + len(shared)
+
+    def _build_routes(self, topic: str):
+        direct = []
+        groups: Dict[Tuple[str, str], List[Tuple[_Session, int]]] = {}
+        for session in self._sessions:
+            for sub, granted in session.subscriptions.items():
+                if sub.startswith("$share/"):
+                    _, group, topic_filter = sub.split("/", 2)
+                    if topic_matches_sub(topic_filter, topic):
+                        groups.setdefault((group, topic_filter), []).append((session, granted))
+                elif topic_matches_sub(sub, topic):
+                    direct.append((session, granted))
+        return direct, list(groups.items())
+
+    @staticmethod
+    def _deliver(session: _Session, topic: str, payload: bytes, qos: int):
+        body = _encode_string(topic)
+        if qos:
+            body += struct.pack("!H", session.packet_id())
+        if session.version == MQTTV5:
+            body += b"\x00"  # no properties
+        session.writer.write(_packet(PUBLISH, qos << 1, body + payload))
+
+    async def drain(self):
+        """Wait until all session write buffers are flushed."""
+        for session in list(self._sessions):
+            try:
+                await session.writer.drain()
+            except ConnectionError:
+                pass
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle_client, self.host, self.port)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _shutdown(self):
+        self._server.close()
+        for session in list(self._sessions):
+            session.writer.close()
+        await self._server.wait_closed()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session: Optional[_Session] = None
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length, multiplier = 0, 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    if not byte & 0x80:
+                        break
+                    multiplier *= 128
+                body = await reader.readexactly(length) if length else b""
+
+                packet_type, flags = header[0] >> 4, header[0] & 0x0F
+                if session is None:
+                    if packet_type != CONNECT:
+                        break
+                    session = self._connect(body, writer)
+                elif packet_type == PUBLISH:
+                    self._handle_publish(session, flags, body)
+                elif packet_type == PUBREL:
+                    writer.write(_packet(PUBCOMP, 0, body[:2]))
+                elif packet_type == SUBSCRIBE:
+                    self._subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self._unsubscribe(session, body)
+                elif packet_type == PINGREQ:
+                    writer.write(_packet(PINGRESP, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+                # PUBACK/PUBREC/PUBCOMP for deliveries need no action here
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session is not None and session in self._sessions:
+                self._sessions.remove(session)
+                self._route_cache.clear()
+            writer.close()
+
+    def _connect(self, body: bytes, writer: asyncio.StreamWriter) -> _Session:
+        # Variable header: protocol name, level, flags, keepalive, [properties];
+        # then client id
+        name_len = struct.unpack_from("!H", body, 0)[0]
+        version = body[2 + name_len]
+        offset = 2 + name_len + 4
+        if version == MQTTV5:
+            offset = _skip_properties(body, offset)
+        id_len = struct.unpack_from("!H", body, offset)[0]
+        client_id = body[offset + 2:offset + 2 + id_len].decode("utf-8")
+        session = _Session(client_id=client_id, writer=writer, version=version)
+        self._sessions.append(session)
+        connack = b"\x00\x00\x00" if version == MQTTV5 else b"\x00\x00"
+        writer.write(_packet(CONNACK, 0, connack))
+        self.logger.debug(f"Client connected: {client_id}")
+        return session
+
+    def _handle_publish(self, session: _Session, flags: int, body: bytes):
+        qos = (flags >> 1) & 0x03
+        topic_len = struct.unpack_from("!H", body, 0)[0]
+        topic = body[2:2 + topic_len].decode("utf-8")
+        offset = 2 + topic_len
+        if qos:
+            packet_id = body[offset:offset + 2]
+            offset += 2
+            ack_type = PUBACK if qos == 1 else PUBREC
+            session.writer.write(_packet(ack_type, 0, packet_id))
+        if session.version == MQTTV5:
+            offset = _skip_properties(body, offset)
+        payload = body[offset:]
+
+        if self.on_publish is not None and self.on_publish(session.client_id, topic, payload):
+            return
+        self.publish(topic, payload, qos)
+
+    def _subscribe(self, session: _Session, body: bytes):
+        packet_id = body[:2]
+        offset, granted = 2, bytearray()
+        if session.version == MQTTV5:
+            offset = _skip_properties(body, offset)
+        while offset < len(body):
+            filter_len = struct.unpack_from("!H", body, offset)[0]
+            topic_filter = body[offset + 2:offset + 2 + filter_len].decode("utf-8")
+            requested = body[offset + 2 + filter_len] & 0x03
+            offset += 3 + filter_len
+            session.subscriptions[topic_filter] = min(requested, 1)
+            granted.append(min(requested, 1))
+        self._route_cache.clear()
+        properties = b"\x00" if session.version == MQTTV5 else b""
+        session.writer.write(_packet(SUBACK, 0, packet_id + properties + bytes(granted)))
+
+    def _unsubscribe(self, session: _Session, body: bytes):
+        packet_id = body[:2]
+        offset, removed = 2, 0
+        if session.version == MQTTV5:
+            offset = _skip_properties(body, offset)
+        while offset < len(body):
+            filter_len = struct.unpack_from("!H", body, offset)[0]
+            session.subscriptions.pop(body[offset + 2:offset + 2 + filter_len].decode("utf-8"), None)
+            offset += 2 + filter_len
+            removed += 1
+        self._route_cache.clear()
+        if session.version == MQTTV5:
+            # No properties, then a success reason code per filter
+            session.writer.write(_packet(UNSUBACK, 0, packet_id + b"\x00" + bytes(removed)))
+        else:
+            session.writer.write(_packet(UNSUBACK, 0, packet_id))
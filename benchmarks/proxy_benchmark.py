@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Proxy Load Benchmark
+
+Runs MQTTProxy end to end against the in-process MiniBroker and reports
+throughput, receive-to-forward latency, CPU and RSS. Everything runs on
+the local machine, so no network or external broker is needed.
+
+The broker plays both ends. It publishes generated messages to the proxy's
+subscriber connection and records when each one was written. It then
+consumes what the proxy's publisher forwards instead of routing it back to
+the proxy. Latency is the time between those two points. Linux only
+(CPU and RSS come from getrusage and /proc).
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add src and this directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from audit_logger import AuditLogger
+from config_loader import load_config
+from metrics_exporter import MetricsExporter
+from mini_broker import MiniBroker
+from mqtt_proxy import MQTTProxy
+from quarantine_store import QuarantineStore
+
+
+# Messages written per burst when pacing the generator
+TICK_SECONDS = 0.005
+
+
+def generate_messages(
+    count: int,
+    payload_size: int,
+    topic_cardinality: int,
+    invalid_ratio: float,
+    topic_template: str,
+    seed: int,
+    start_index: int = 0
+) -> List[Tuple[str, bytes]]:
+    """
+    Build unique temperature:v1 messages padded to roughly payload_size bytes.
+
+    Each payload carries its index in device_id so the broker can match a
+    forwarded message to the moment it was sent. Invalid messages have an
+    out-of-range value.
+    """
+    rng = random.Random(seed + start_index)
+    messages = []
+    for index in range(start_index, start_index + count):
+        obj = {
+            "schema_id": "temperature:v1",
+            "device_id": f"bench_{index}",
+            "timestamp": "2023-12-07T14:30:00.000Z",
+            "value": round(rng.uniform(-40.0, 60.0), 2),
+            "unit": "celsius",
+            "metadata": {"padding": ""},
+        }
+        if rng.random() < invalid_ratio:
+            obj["value"] = 5000
+        payload = json.dumps(obj)
+        padding = max(0, payload_size - len(payload))
+        obj["metadata"]["padding"] = "x" * padding
+        topic = topic_template.format(n=rng.randrange(topic_cardinality))
+        messages.append((topic, json.dumps(obj).encode("utf-8")))
+    return messages
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MiB."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class ForwardRecorder:
+    """Matches messages forwarded by the proxy to the time they were sent."""
+
+    def __init__(self, publisher_marker: str = "-publisher"):
+        self.publisher_marker = publisher_marker
+        self.sent_at: Dict[bytes, float] = {}
+        self.latencies: List[float] = []
+        self.forwarded = 0
+        self.last_forward = 0.0
+        self._lock = threading.Lock()
+
+    def on_publish(self, client_id: str, topic: str, payload: bytes) -> bool:
+        # Only the proxy publishers' messages are consumed; everything else
+        # is routed normally
+        if self.publisher_marker not in client_id:
+            return False
+        now = time.perf_counter()
+        with self._lock:
+            sent = self.sent_at.pop(payload, None)
+            if sent is not None:
+                self.latencies.append(now - sent)
+                self.forwarded += 1
+                self.last_forward = now
+        return True
+
+
+async def send_messages(
+    broker: MiniBroker,
+    recorder: Optional[ForwardRecorder],
+    messages: List[Tuple[str, bytes]],
+    rate: float
+) -> Tuple[float, float]:
+    """Publish messages from the broker loop at `rate` msg/s (0 = unpaced)."""
+    start = time.perf_counter()
+    sent = 0
+    while sent < len(messages):
+        if rate > 0:
+            due = min(len(messages), int((time.perf_counter() - start) * rate) + 1)
+            if due <= sent:
+                await asyncio.sleep(TICK_SECONDS)
+                continue
+        else:
+            due = min(len(messages), sent + 500)
+        for topic, payload in messages[sent:due]:
+            if recorder is not None:
+                recorder.sent_at[payload] = time.perf_counter()
+            broker.publish(topic, payload, qos=1)
+        sent = due
+        await broker.drain()
+        await asyncio.sleep(0)
+    return start, time.perf_counter()
+
+
+def dropped_count(exporters: List[MetricsExporter]) -> float:
+    """Messages dropped by the ingest queues before validation."""
+    return sum(
+        exporter.registry.get_sample_value("mqtt_ingest_dropped_total", {"reason": reason}) or 0.0
+        for exporter in exporters
+        for reason in ("drop_newest", "drop_oldest", "spill_full", "not_running")
+    )
+
+
+def processed_count(exporters: List[MetricsExporter]) -> float:
+    """Messages the proxies have finished with: validated or dropped on ingest."""
+    total = dropped_count(exporters)
+    for exporter in exporters:
+        for status in ("valid", "invalid"):
+            total += exporter.registry.get_sample_value(
+                "mqtt_messages_total", {"status": status}
+            ) or 0.0
+    return total
+
+
+def received_by_instance(exporters: List[MetricsExporter], instance_ids: List[str]) -> Dict[str, int]:
+    """Messages the broker delivered to each proxy instance."""
+    return {
+        instance_id: int(exporter.registry.get_sample_value(
+            "mqtt_instance_messages_received_total", {"instance_id": instance_id}
+        ) or 0)
+        for exporter, instance_id in zip(exporters, instance_ids)
+    }
+
+
+async def wait_processed(exporters: List[MetricsExporter], target: float, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while processed_count(exporters) < target:
+        if time.monotonic() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    config = load_config(args.config)
+    proxy_overrides = {
+        "ingest_workers": args.workers,
+        "message_queue_size": args.queue_size,
+        "validation_processes": args.validation_processes,
+    }
+    config = dataclasses.replace(
+        config,
+        proxy_config={
+            **config.proxy_config,
+            **{k: v for k, v in proxy_overrides.items() if v is not None},
+        },
+    )
+
+    workdir = tempfile.mkdtemp(prefix="proxy-bench-")
+    # One exporter per instance, as each replica would expose its own
+    exporters = [MetricsExporter() for _ in range(args.instances)]
+    instance_ids = [f"bench-{index}" for index in range(args.instances)]
+    quarantine_store = QuarantineStore(
+        db_path=os.path.join(workdir, "quarantine.sqlite3"),
+        quarantine_dir=os.path.join(workdir, "quarantine"),
+        metrics_exporter=exporters[0]
+    )
+    audit_logger = AuditLogger(
+        log_file=os.path.join(workdir, "audit.jsonl"),
+        console_output=False,
+        queued=not args.sync_audit,
+        metrics_exporter=exporters[0]
+    )
+
+    recorder = ForwardRecorder()
+    broker = MiniBroker(on_publish=recorder.on_publish)
+    broker.start()
+
+    proxies = []
+    for exporter, instance_id in zip(exporters, instance_ids):
+        instance_config = config
+        if args.instances > 1:
+            instance_config = dataclasses.replace(
+                config,
+                proxy_config={
+                    **config.proxy_config,
+                    "shared_subscription_group": "bench",
+                    "instance_id": instance_id,
+                },
+            )
+        proxy = MQTTProxy(instance_config, quarantine_store, audit_logger, exporter)
+        proxy.broker_config = dataclasses.replace(
+            proxy.broker_config, host=broker.host, port=broker.port,
+            use_tls=False, username=None, password=None
+        )
+        proxies.append(proxy)
+
+    proxy_tasks = [asyncio.create_task(proxy.start()) for proxy in proxies]
+    try:
+        subscriptions = len(config.topic_patterns) * len(proxies)
+        while (
+            not all(proxy.is_running for proxy in proxies)
+            or broker.subscription_count() < subscriptions
+        ):
+            for task in proxy_tasks:
+                if task.done():
+                    task.result()
+            await asyncio.sleep(0.05)
+
+        # Warm up schema loading and caches outside the measured window
+        if args.warmup:
+            warmup = generate_messages(
+                args.warmup, args.payload_size, args.topic_cardinality,
+                args.invalid_ratio, args.topic_template, args.seed,
+                start_index=args.count
+            )
+            baseline = processed_count(exporters)
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+                send_messages(broker, None, warmup, 0), broker.loop
+            ))
+            await wait_processed(exporters, baseline + len(warmup), args.drain_timeout)
+
+        messages = generate_messages(
+            args.count, args.payload_size, args.topic_cardinality,
+            args.invalid_ratio, args.topic_template, args.seed
+        )
+        expected_valid = sum(1 for _, p in messages if b'"value": 5000' not in p)
+
+        baseline = processed_count(exporters)
+        dropped_baseline = dropped_count(exporters)
+        received_baseline = received_by_instance(exporters, instance_ids)
+        broker_cpu_start = broker.thread_cpu_time()
+        usage_start = resource.getrusage(resource.RUSAGE_SELF)
+        rss_start = current_rss_mb()
+
+        send_start, send_end = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(
+            send_messages(broker, recorder, messages, args.rate), broker.loop
+        ))
+        completed = await wait_processed(
+            exporters, baseline + len(messages), args.drain_timeout
+        )
+        end = time.perf_counter()
+        usage_end = resource.getrusage(resource.RUSAGE_SELF)
+        broker_cpu = broker.thread_cpu_time() - broker_cpu_start
+
+        # Processing is done; give the last publishes a moment to reach the broker
+        deadline = time.monotonic() + 1.0
+        while recorder.forwarded < expected_valid and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        processed = processed_count(exporters) - baseline
+        dropped = dropped_count(exporters) - dropped_baseline
+        received = {
+            instance_id: count - received_baseline[instance_id]
+            for instance_id, count in received_by_instance(exporters, instance_ids).items()
+        }
+    finally:
+        await asyncio.gather(*(proxy.stop() for proxy in proxies))
+        for task in proxy_tasks:
+            task.cancel()
+        await asyncio.gather(*proxy_tasks, return_exceptions=True)
+        await asyncio.to_thread(audit_logger.close)
+        await quarantine_store.close()
+        broker.stop()
+
+    elapsed = end - send_start
+    process_cpu = (
+        (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+    )
+    latencies = sorted(recorder.latencies)
+    return {
+        "messages": len(messages),
+        "processed": int(processed),
+        "dropped": int(dropped),
+        "received_by_instance": received,
+        "forwarded": recorder.forwarded,
+        "expected_forwarded": expected_valid,
+        "completed": completed,
+        "offered_rate": len(messages) / max(send_end - send_start, 1e-9),
+        "throughput": processed / max(elapsed, 1e-9),
+        "elapsed_seconds": elapsed,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": (latencies[-1] * 1000) if latencies else float("nan"),
+        },
+        "cpu_percent": {
+            "proxy": (process_cpu - broker_cpu) / max(elapsed, 1e-9) * 100,
+            "broker": broker_cpu / max(elapsed, 1e-9) * 100,
+        },
+        "rss_mb": {
+            "start": rss_start,
+            "end": current_rss_mb(),
+            "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+
+
+def print_report(args: argparse.Namespace, result: Dict[str, Any]):
+    latency = result["latency_ms"]
+    print("\n" + "="*50)
+    print("PROXY LOAD BENCHMARK")
+    print("="*50)
+    print(f"Messages:           {result['messages']} "
+          f"({args.payload_size} B, {args.topic_cardinality} topics, "
+          f"{args.invalid_ratio:.0%} invalid)")
+    rate = f"{args.rate:.0f} msg/s" if args.rate > 0 else "unpaced"
+    print(f"Offered rate:       {result['offered_rate']:.0f} msg/s ({rate})")
+    print(f"Throughput:         {result['throughput']:.0f} msg/s")
+    print(f"Processed:          {result['processed']} ({result['dropped']} dropped on ingest)")
+    print(f"Forwarded:          {result['forwarded']} / {result['expected_forwarded']}")
+    if len(result["received_by_instance"]) > 1:
+        for instance_id, count in result["received_by_instance"].items():
+            print(f"  {instance_id + ':':<18}{count} received")
+    print(f"Latency p50:        {latency['p50']:.2f} ms")
+    print(f"Latency p95:        {latency['p95']:.2f} ms")
+    print(f"Latency p99:        {latency['p99']:.2f} ms")
+    print(f"Latency max:        {latency['max']:.2f} ms")
+    print(f"CPU (proxy):        {result['cpu_percent']['proxy']:.0f}%")
+    print(f"CPU (broker):       {result['cpu_percent']['broker']:.0f}%")
+    print(f"RSS:                {result['rss_mb']['end']:.1f} MiB "
+          f"(peak {result['rss_mb']['peak']:.1f} MiB)")
+    if not result["completed"]:
+        print(f"WARNING: proxy did not finish within {args.drain_timeout}s")
+    print("="*50)
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="End-to-end MQTTProxy benchmark against an in-process broker",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                    # 20000 messages, unpaced
+  %(prog)s --rate 5000 --count 50000          # fixed offered load
+  %(prog)s --payload-size 4096 --invalid-ratio 0.2
+  %(prog)s --instances 3                      # shared-subscription scale-out
+  %(prog)s --validation-processes 4           # validate in worker processes
+  %(prog)s --json results.json                # save results for comparison
+        """
+    )
+    parser.add_argument('--config', '-c', default='config/rules.yaml',
+                        help='Path to configuration file')
+    parser.add_argument('--count', '-n', type=int, default=20000,
+                        help='Number of measured messages')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='Offered load in msg/s (0 = as fast as possible)')
+    parser.add_argument('--payload-size', type=int, default=256,
+                        help='Approximate payload size in bytes')
+    parser.add_argument('--topic-cardinality', type=int, default=100,
+                        help='Number of distinct topics')
+    parser.add_argument('--topic-template', default='sensor/room{n}/temperature',
+                        help='Topic template; {n} is replaced by the topic number')
+    parser.add_argument('--invalid-ratio', type=float, default=0.05,
+                        help='Fraction of messages failing schema validation')
+    parser.add_argument('--warmup', type=int, default=1000,
+                        help='Unmeasured messages sent first')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Override proxy_config.ingest_workers')
+    parser.add_argument('--queue-size', type=int, default=None,
+                        help='Override proxy_config.message_queue_size')
+    parser.add_argument('--validation-processes', type=int, default=None,
+                        help='Override proxy_config.validation_processes')
+    parser.add_argument('--instances', type=int, default=1,
+                        help='Proxy replicas sharing the load via $share subscriptions')
+    parser.add_argument('--sync-audit', action='store_true',
+                        help='Write audit events on the event loop instead of queued')
+    parser.add_argument('--drain-timeout', type=float, default=60.0,
+                        help='Seconds to wait for the proxy to finish processing')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for message generation')
+    parser.add_argument('--json', metavar='FILE',
+                        help='Also write results as JSON to FILE')
+    parser.add_argument('--log-level', default='ERROR',
+                        help='Log level for proxy components')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()))
+
+    result = asyncio.run(run_benchmark(args))
+    print_report(args, result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parameters": vars(args), "results": result}, f, indent=2)
+
+    return 0 if result["completed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
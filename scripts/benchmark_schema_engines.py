@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Schema Engine Benchmark Script
+
+Compares the 'interpreted' (jsonschema Draft7Validator) and 'compiled'
+JSON Schema engines of SchemaValidator on generated payloads and checks that
+both return the same (bool, reason) results.
+"""
+
+import argparse
+import copy
+import json
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Add src to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from config_loader import load_config
+from message_context import MessageContext
+from schema_validator import SchemaValidator
+
+
+ENGINES = ("interpreted", "compiled")
+
+
+def generate_payloads(
+    schema: Dict[str, Any], count: int, invalid_ratio: float, seed: int
+) -> List[bytes]:
+    """
+    Generate temperature_v1-style payloads from the schema's examples.
+
+    Valid payloads vary device_id and value; invalid ones drop a required
+    field, push the value out of range or add an unexpected property.
+    """
+    rng = random.Random(seed)
+    examples = schema.get("examples") or [{}]
+    required = schema.get("required", [])
+    payloads = []
+    for index in range(count):
+        obj = copy.deepcopy(rng.choice(examples))
+        if "device_id" in obj:
+            obj["device_id"] = f"sensor_{index % 1000:04d}"
+        if isinstance(obj.get("value"), (int, float)):
+            obj["value"] = round(rng.uniform(-40.0, 60.0), 2)
+        if rng.random() < invalid_ratio:
+            mutation = rng.randrange(3)
+            if mutation == 0 and required:
+                obj.pop(rng.choice(required), None)
+            elif mutation == 1:
+                obj["value"] = 5000
+            else:
+                obj["unexpected_field"] = True
+        payloads.append(json.dumps(obj).encode("utf-8"))
+    return payloads
+
+
+def run_engine(
+    validator: SchemaValidator, schema_id: str, payloads: List[bytes], rounds: int
+) -> Tuple[float, List[Tuple[bool, str]]]:
+    """Validate every payload `rounds` times; return best elapsed seconds and results."""
+    # Warm up schema loading/compilation outside the timed loop
+    validator.validate(schema_id, payloads[0])
+    best = float("inf")
+    results: List[Tuple[bool, str]] = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        # A fresh context per message, as in the proxy
+        results = [validator.validate(schema_id, MessageContext(None, p)) for p in payloads]
+        best = min(best, time.perf_counter() - start)
+    return best, results
+
+
+def main() -> int:
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark interpreted vs compiled JSON Schema validation",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  %(prog)s                                    # temperature:v1, 20000 payloads
+  %(prog)s --count 100000 --invalid-ratio 0.2
+  %(prog)s --schema-id humidity:v1
+        """
+    )
+    parser.add_argument('--config', '-c', default='config/rules.yaml',
+                        help='Path to configuration file')
+    parser.add_argument('--schema-id', default='temperature:v1',
+                        help='JSON Schema id to benchmark')
+    parser.add_argument('--count', '-n', type=int, default=20000,
+                        help='Number of payloads per round')
+    parser.add_argument('--rounds', '-r', type=int, default=3,
+                        help='Timed rounds per engine (best is reported)')
+    parser.add_argument('--invalid-ratio', type=float, default=0.1,
+                        help='Fraction of payloads made invalid')
+    parser.add_argument('--seed', type=int, default=42,
+                        help='Random seed for payload generation')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    config = load_config(args.config)
+    schema_cfg = config.schema_files.get(args.schema_id)
+    if schema_cfg is None or schema_cfg.format != "jsonschema":
+        print(f"Error: {args.schema_id} is not a configured jsonschema schema")
+        return 1
+    with open(schema_cfg.file, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+
+    payloads = generate_payloads(schema, args.count, args.invalid_ratio, args.seed)
+
+    timings: Dict[str, float] = {}
+    results: Dict[str, List[Tuple[bool, str]]] = {}
+    for engine in ENGINES:
+        validator = SchemaValidator(config, engine=engine)
+        timings[engine], results[engine] = run_engine(
+            validator, args.schema_id, payloads, args.rounds
+        )
+
+    mismatches = sum(
+        1 for a, b in zip(results["interpreted"], results["compiled"]) if a != b
+    )
+    valid = sum(1 for ok, _ in results["interpreted"] if ok)
+
+    print("\n" + "="*50)
+    print("SCHEMA ENGINE BENCHMARK")
+    print("="*50)
+    print(f"Schema:             {args.schema_id}")
+    print(f"Payloads:           {len(payloads)} ({valid} valid)")
+    for engine in ENGINES:
+        elapsed = timings[engine]
+        print(f"{engine + ':':<20}{len(payloads) / elapsed:>10.0f} msg/s "
+              f"({elapsed / len(payloads) * 1e6:.2f} us/msg)")
+    print(f"Speedup:            {timings['interpreted'] / timings['compiled']:.2f}x")
+    print(f"Result mismatches:  {mismatches}")
+    print("="*50)
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
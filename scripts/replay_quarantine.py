@@ -4,6 +4,16 @@ Quarantine Replay Script
 
 This script processes quarantined messages and attempts to re-validate them
 using current rules and schemas. Valid messages can be forwarded to the broker.
+
+Replay is pipelined: pages are streamed from the quarantine store while the
+previous batch is validated (grouped by schema), published through a bounded
+inflight window at a rate limited by a token bucket, and its processed and
+retry count updates are committed in one transaction per batch.
+
+Streaming replays are recorded as runs in the quarantine database. Each
+batch's commit also stores the run's cursor and statistics, so an
+interrupted run can be continued with --resume without rescanning or
+counting up retries a second time.
 """
 
 import argparse
@@ -11,21 +21,55 @@ import asyncio
 import json
 import logging
 import sys
+import time
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Union
 
 # Add src to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
 
-from quarantine_store import QuarantineStore, QuarantinedMessage
-from config_loader import ConfigLoader
+from quarantine_store import (
+    REPLAY_COMPLETED,
+    QuarantineStore,
+    QuarantinedMessage,
+    QuarantineRecord,
+    ReplayRun,
+)
+from config_loader import load_config
 from topic_validator import TopicValidator
 from schema_validator import SchemaValidator
-from mqtt_proxy import MQTTProxy
+from publisher_pool import PublisherPool
 import paho.mqtt.client as mqtt
 
 
+# Messages are either streamed records or fully loaded messages
+ReplayMessage = Union[QuarantineRecord, QuarantinedMessage]
+
+
+class TokenBucket:
+    """Token bucket rate limiter: rate tokens per second, bursts up to capacity."""
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+    
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until the tokens are available and take them."""
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
 class QuarantineReplayManager:
     """Manages replay of quarantined messages."""
     
@@ -34,12 +78,32 @@ class QuarantineReplayManager:
         config_path: str,
         quarantine_db: str = "quarantine.sqlite3",
         dry_run: bool = False,
-        max_retries: int = 3
+        max_retries: int = 3,
+        batch_size: int = 500,
+        max_inflight: int = 100,
+        rate_limit: Optional[float] = None,
+        ack_timeout: float = 30.0
     ):
+        """
+        Args:
+            config_path: Path of rules.yaml
+            quarantine_db: Path of the quarantine database
+            dry_run: Validate only, don't forward messages
+            max_retries: Retry count after which still invalid messages are
+                no longer counted up
+            batch_size: Messages read, validated and committed together
+            max_inflight: Unacknowledged publishes allowed at once
+            rate_limit: Maximum messages forwarded per second; None for no limit
+            ack_timeout: Seconds to wait for a batch's PUBACKs before giving
+                up on marking it processed
+        """
         self.config_path = config_path
         self.quarantine_db = quarantine_db
         self.dry_run = dry_run
         self.max_retries = max_retries
+        self.batch_size = max(1, batch_size)
+        self.max_inflight = max_inflight
+        self.ack_timeout = ack_timeout
         
         self.logger = logging.getLogger(__name__)
         
@@ -48,7 +112,10 @@ class QuarantineReplayManager:
         self.quarantine_store = None
         self.topic_validator = None
         self.schema_validator = None
-        self.mqtt_client = None
+        self.publisher_pool: Optional[PublisherPool] = None
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+        # Checkpointed run of a streaming replay
+        self.run: Optional[ReplayRun] = None
         
         # Statistics
         self.stats = {
@@ -63,15 +130,18 @@ class QuarantineReplayManager:
         """Initialize all components."""
         try:
             # Load configuration
-            config_loader = ConfigLoader(self.config_path)
-            self.config = config_loader.load()
+            self.config = load_config(self.config_path)
             
             # Initialize quarantine store
             self.quarantine_store = QuarantineStore(self.quarantine_db)
             
-            # Initialize validators
+            # Initialize validators; the compiled ruleset already has every
+            # schema loaded, with the same engine the proxy uses
             self.topic_validator = TopicValidator(self.config)
-            self.schema_validator = SchemaValidator(self.config)
+            ruleset = self.config.ruleset
+            self.schema_validator = (
+                ruleset.schema_validator if ruleset is not None else SchemaValidator(self.config)
+            )
             
             # Initialize MQTT client for forwarding
             if not self.dry_run:
@@ -84,9 +154,7 @@ class QuarantineReplayManager:
             raise
     
     async def _setup_mqtt_client(self):
-        """Setup MQTT client for message forwarding."""
-        self.mqtt_client = mqtt.Client(client_id="quarantine-replay")
-        
+        """Setup the publisher used for message forwarding."""
         # Configure connection based on config
         broker_config = getattr(self.config, 'broker_config', {})
         host = broker_config.get('host', 'localhost')
@@ -94,13 +162,25 @@ class QuarantineReplayManager:
         username = broker_config.get('username')
         password = broker_config.get('password')
         
-        if username and password:
-            self.mqtt_client.username_pw_set(username, password)
+        def create_client(client_id: str) -> mqtt.Client:
+            client = mqtt.Client(client_id=client_id)
+            if username and password:
+                client.username_pw_set(username, password)
+            return client
+        
+        self.publisher_pool = PublisherPool(
+            create_client, client_id="quarantine-replay", max_inflight=self.max_inflight
+        )
         
         # Connect to broker
         try:
-            self.mqtt_client.connect(host, port, 60)
-            self.mqtt_client.loop_start()
+            self.publisher_pool.connect(host, port, 60)
+            for _ in range(50):
+                if self.publisher_pool.is_connected():
+                    break
+                await asyncio.sleep(0.1)
+            if not self.publisher_pool.is_connected():
+                raise ConnectionError(f"No connection to {host}:{port}")
             self.logger.info(f"Connected to MQTT broker at {host}:{port}")
         except Exception as e:
             self.logger.error(f"Failed to connect to MQTT broker: {e}")
@@ -108,28 +188,21 @@ class QuarantineReplayManager:
     
     async def replay_all_unprocessed(self, limit: Optional[int] = None) -> Dict[str, int]:
         """
-        Replay all unprocessed quarantined messages.
+        Replay all unprocessed quarantined messages, oldest first.
         
         Args:
-            limit: Maximum number of messages to process
+            limit: Maximum number of messages to process; None for all
             
         Returns:
             Dictionary with processing statistics
         """
         try:
-            # Get unprocessed messages
-            messages = await self.quarantine_store.get_unprocessed(limit or 1000)
+            await self._run_replay({'mode': 'unprocessed', 'limit': limit})
             
-            if not messages:
+            if not self.stats['processed']:
                 self.logger.info("No unprocessed quarantined messages found")
                 return self.stats
             
-            self.logger.info(f"Found {len(messages)} unprocessed quarantined messages")
-            
-            # Process each message
-            for message in messages:
-                await self._process_message(message)
-            
             # Print summary
             self._print_summary()
             
@@ -150,25 +223,19 @@ class QuarantineReplayManager:
             Dictionary with processing statistics
         """
         try:
-            for message_id in message_ids:
-                # Search for the message
-                messages = await self.quarantine_store.search_messages(
-                    limit=1
-                )
+            message_ids = list(dict.fromkeys(message_ids))
+            for start in range(0, len(message_ids), self.batch_size):
+                batch_ids = message_ids[start:start + self.batch_size]
+                found = await self.quarantine_store.get_by_ids(batch_ids)
                 
-                # Find matching message
-                target_message = None
-                for msg in messages:
-                    if msg.id == message_id:
-                        target_message = msg
-                        break
+                if len(found) < len(batch_ids):
+                    found_ids = {message.id for message in found}
+                    for message_id in batch_ids:
+                        if message_id not in found_ids:
+                            self.logger.warning(f"Message not found: {message_id}")
+                            self.stats['errors'] += 1
                 
-                if target_message:
-                    await self._process_message(target_message)
-                else:
-                    self.logger.warning(f"Message not found: {message_id}")
-                    self.stats['errors'] += 1
-            
+                await self._process_messages(found)
             self._print_summary()
             return self.stats
             
@@ -198,25 +265,47 @@ class QuarantineReplayManager:
             Dictionary with processing statistics
         """
         try:
-            # Search for matching messages
-            messages = await self.quarantine_store.search_messages(
-                topic_pattern=topic_pattern,
-                reason_pattern=reason_pattern,
-                start_date=start_date,
-                end_date=end_date,
-                limit=limit
-            )
+            await self._run_replay({
+                'mode': 'criteria',
+                'topic_pattern': topic_pattern,
+                'reason_pattern': reason_pattern,
+                'start_date': start_date.isoformat() if start_date else None,
+                'end_date': end_date.isoformat() if end_date else None,
+                'limit': limit
+            })
             
-            if not messages:
+            if not self.stats['processed']:
                 self.logger.info("No messages found matching criteria")
                 return self.stats
             
-            self.logger.info(f"Found {len(messages)} messages matching criteria")
+            self._print_summary()
+            return self.stats
             
-            # Process each message
-            for message in messages:
-                await self._process_message(message)
+        except Exception as e:
+            self.logger.error(f"Error during replay: {e}")
+            raise
+    
+    async def resume(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Continue an interrupted replay run after its last committed batch.
+        
+        Args:
+            run_id: Run ID; None for the latest run that has not completed
             
+        Returns:
+            Dictionary with processing statistics, including the run's
+            earlier batches
+        """
+        run = await self.quarantine_store.get_replay_run(run_id)
+        if run is None:
+            raise ValueError(f"Replay run not found: {run_id}" if run_id else "No unfinished replay run to resume")
+        if run.status == REPLAY_COMPLETED:
+            raise ValueError(f"Replay run {run.id} has already completed")
+        
+        self.stats.update(run.stats)
+        self.logger.info(f"Resuming replay run {run.id} after {self.stats['processed']} processed messages")
+        try:
+            await self._run_replay(run.filters, run)
             self._print_summary()
             return self.stats
             
@@ -224,76 +313,211 @@ class QuarantineReplayManager:
             self.logger.error(f"Error during replay: {e}")
             raise
     
-    async def _process_message(self, message: QuarantinedMessage):
-        """Process a single quarantined message."""
+    def _iter_run_messages(self, filters: Dict[str, Any], cursor: Optional[str]) -> AsyncIterator[QuarantineRecord]:
+        """Stream the messages a run selects, after its cursor."""
+        if filters['mode'] == 'unprocessed':
+            return self.quarantine_store.iter_messages(
+                processed=False, page_size=self.batch_size, cursor=cursor
+            )
+        return self.quarantine_store.iter_messages(
+            processed=None,
+            topic_pattern=filters['topic_pattern'],
+            reason_pattern=filters['reason_pattern'],
+            start_date=datetime.fromisoformat(filters['start_date']) if filters['start_date'] else None,
+            end_date=datetime.fromisoformat(filters['end_date']) if filters['end_date'] else None,
+            page_size=min(filters['limit'] or self.batch_size, self.batch_size),
+            cursor=cursor
+        )
+    
+    async def _run_replay(self, filters: Dict[str, Any], run: Optional[ReplayRun] = None):
+        """Replay the messages a run selects, checkpointing every batch."""
+        if run is None:
+            run = await self.quarantine_store.create_replay_run(filters, self.stats)
+            self.logger.info(f"Started replay run {run.id}")
+        self.run = run
+        
+        limit = filters.get('limit')
+        remaining = None if limit is None else limit - self.stats['processed']
+        status = "failed"
         try:
-            self.stats['processed'] += 1
-            
-            self.logger.debug(f"Processing message {message.id}: {message.topic}")
-            
-            # Validate topic
-            topic_valid, topic_reason = await self.topic_validator.validate(message.topic)
-            
-            if not topic_valid:
-                self.logger.info(f"Message {message.id} still invalid - Topic: {topic_reason}")
-                await self._handle_still_invalid(message, f"Topic validation: {topic_reason}")
-                return
-            
-            # Get schema for topic
-            schema_id = self.config.get_schema_for_topic(message.topic)
-            if not schema_id:
-                self.logger.info(f"Message {message.id} still invalid - No schema mapping")
-                await self._handle_still_invalid(message, "No schema mapping found")
-                return
-            
-            # Validate payload against schema
-            schema_valid, schema_reason = await self.schema_validator.validate(
-                schema_id, message.payload
+            if remaining is None or remaining > 0:
+                await self._replay_stream(self._iter_run_messages(filters, run.cursor), remaining)
+            status = REPLAY_COMPLETED
+        except asyncio.CancelledError:
+            status = "interrupted"
+            raise
+        finally:
+            # Anything but completed can be resumed, with the statistics of
+            # its last checkpoint
+            await self.quarantine_store.finish_replay_run(
+                run.id, status, self.stats if status == REPLAY_COMPLETED else None
             )
-            
-            if not schema_valid:
-                self.logger.info(f"Message {message.id} still invalid - Schema: {schema_reason}")
-                await self._handle_still_invalid(message, f"Schema validation: {schema_reason}")
-                return
-            
-            # Message is now valid
-            self.stats['valid'] += 1
-            self.logger.info(f"Message {message.id} is now valid - forwarding")
-            
-            # Forward message if not in dry run mode
-            if not self.dry_run and self.mqtt_client:
+    
+    async def _replay_stream(self, records: AsyncIterator[QuarantineRecord], limit: Optional[int]):
+        """Process streamed records in batches while the next batch is being read."""
+        # Two batches ahead at most: reading overlaps processing with bounded memory
+        batches: asyncio.Queue = asyncio.Queue(maxsize=2)
+        reader = asyncio.create_task(self._read_batches(records, batches, limit))
+        try:
+            while True:
+                batch = await batches.get()
+                if batch is None:
+                    break
+                await self._process_messages(batch, batch[-1].cursor)
+                self.logger.info(f"Replayed {self.stats['processed']} messages")
+        finally:
+            if not reader.done():
+                reader.cancel()
+            try:
+                # Surfaces read errors
+                await reader
+            except asyncio.CancelledError:
+                pass
+    
+    async def _read_batches(
+        self,
+        records: AsyncIterator[QuarantineRecord],
+        batches: asyncio.Queue,
+        limit: Optional[int]
+    ):
+        """Group streamed records into batches; None marks the end."""
+        try:
+            batch: List[QuarantineRecord] = []
+            count = 0
+            async for record in records:
+                batch.append(record)
+                count += 1
+                if len(batch) >= self.batch_size:
+                    await batches.put(batch)
+                    batch = []
+                if limit and count >= limit:
+                    break
+            if batch:
+                await batches.put(batch)
+            await batches.put(None)
+        except Exception:
+            await batches.put(None)
+            raise
+        finally:
+            await records.aclose()
+    
+    async def _process_messages(self, messages: List[ReplayMessage], cursor: Optional[str] = None):
+        """
+        Re-validate and forward a batch of quarantined messages.
+        
+        Payloads of the same schema are validated together. Processed marks
+        and retry counts of the batch are committed in one transaction each,
+        or during a run in one transaction with the run's checkpoint at
+        cursor. Forwarded messages are only marked processed once the broker
+        has acknowledged them; during a run, missing acknowledgements stop it
+        at its previous checkpoint.
+        """
+        by_schema: Dict[str, List[ReplayMessage]] = {}
+        processed_ids: List[str] = []
+        retry_ids: List[str] = []
+        for message in messages:
+            try:
+                self.stats['processed'] += 1
+                
+                self.logger.debug(f"Processing message {message.id}: {message.topic}")
+                
+                # Validate topic
+                topic_valid, topic_reason = self.topic_validator.validate(message.topic)
+                
+                if not topic_valid:
+                    self.logger.info(f"Message {message.id} still invalid - Topic: {topic_reason}")
+                    self._handle_still_invalid(message, f"Topic validation: {topic_reason}", retry_ids)
+                    continue
+                
+                # Get schema for topic
+                schema_id = self.config.get_schema_for_topic(message.topic)
+                if not schema_id:
+                    self.logger.info(f"Message {message.id} still invalid - No schema mapping")
+                    self._handle_still_invalid(message, "No schema mapping found", retry_ids)
+                    continue
+                
+                by_schema.setdefault(schema_id, []).append(message)
+                
+            except Exception as e:
+                self.logger.error(f"Error processing message {message.id}: {e}")
+                self.stats['errors'] += 1
+        
+        for schema_id, group in by_schema.items():
+            # Validate payloads against schema
+            results = self.schema_validator.validate_batch(
+                schema_id, [message.payload for message in group]
+            )
+            for message, (schema_valid, schema_reason) in zip(group, results):
                 try:
-                    result = self.mqtt_client.publish(message.topic, message.payload, qos=1)
-                    if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                        self.stats['forwarded'] += 1
-                        self.logger.info(f"Forwarded message {message.id} to {message.topic}")
-                    else:
-                        self.logger.error(f"Failed to forward message {message.id}: {mqtt.error_string(result.rc)}")
-                        self.stats['errors'] += 1
-                        return
+                    if not schema_valid:
+                        self.logger.info(f"Message {message.id} still invalid - Schema: {schema_reason}")
+                        self._handle_still_invalid(message, f"Schema validation: {schema_reason}", retry_ids)
+                        continue
+                    await self._handle_now_valid(message, processed_ids)
                 except Exception as e:
-                    self.logger.error(f"Error forwarding message {message.id}: {e}")
+                    self.logger.error(f"Error processing message {message.id}: {e}")
+                    self.stats['errors'] += 1
+        
+        if processed_ids and self.publisher_pool and not self.dry_run:
+            if not await self.publisher_pool.drain(self.ack_timeout):
+                if self.run is not None:
+                    # Stop at the last checkpoint, so --resume replays this
+                    # batch instead of skipping past it
+                    raise RuntimeError(
+                        f"PUBACKs missing for {len(processed_ids)} forwarded messages, "
+                        f"replay run {self.run.id} stopped before checkpointing"
+                    )
+                # Left unprocessed, so a later replay forwards them again
+                self.logger.error(f"Not marking {len(processed_ids)} forwarded messages processed: PUBACKs missing")
+                self.stats['errors'] += len(processed_ids)
+                processed_ids = []
+        
+        if self.run is None:
+            await self.quarantine_store.mark_processed_batch(processed_ids)
+            await self.quarantine_store.increment_retry_count_batch(retry_ids)
+        elif not await self.quarantine_store.commit_replay_batch(
+            self.run.id, cursor, self.stats, processed_ids, retry_ids
+        ):
+            # Stop at the last checkpoint rather than skip past this batch
+            raise RuntimeError(f"Could not checkpoint replay run {self.run.id}")
+    
+    async def _handle_now_valid(self, message: ReplayMessage, processed_ids: List[str]):
+        """Forward a message that now passes validation; its id is queued for marking processed."""
+        self.stats['valid'] += 1
+        self.logger.debug(f"Message {message.id} is now valid - forwarding")
+        
+        # Forward message if not in dry run mode
+        if not self.dry_run and self.publisher_pool:
+            try:
+                if self.rate_limiter:
+                    await self.rate_limiter.acquire()
+                # Waits while the inflight window is full
+                rc = await self.publisher_pool.publish(message.topic, message.payload, qos=1)
+                if rc == mqtt.MQTT_ERR_SUCCESS:
+                    self.stats['forwarded'] += 1
+                    self.logger.debug(f"Forwarded message {message.id} to {message.topic}")
+                else:
+                    self.logger.error(f"Failed to forward message {message.id}: {mqtt.error_string(rc)}")
                     self.stats['errors'] += 1
                     return
-            else:
-                self.logger.info(f"DRY RUN: Would forward message {message.id} to {message.topic}")
-                self.stats['forwarded'] += 1
-            
-            # Mark message as processed
-            await self.quarantine_store.mark_processed(message.id)
-            
-        except Exception as e:
-            self.logger.error(f"Error processing message {message.id}: {e}")
-            self.stats['errors'] += 1
+            except Exception as e:
+                self.logger.error(f"Error forwarding message {message.id}: {e}")
+                self.stats['errors'] += 1
+                return
+        else:
+            self.logger.info(f"DRY RUN: Would forward message {message.id} to {message.topic}")
+            self.stats['forwarded'] += 1
+        
+        processed_ids.append(message.id)
     
-    async def _handle_still_invalid(self, message: QuarantinedMessage, reason: str):
-        """Handle a message that is still invalid after re-validation."""
+    def _handle_still_invalid(self, message: ReplayMessage, reason: str, retry_ids: List[str]):
+        """Handle a message that is still invalid; its id is queued for a retry count increment."""
         self.stats['invalid'] += 1
         
         # Increment retry count
         if message.retry_count < self.max_retries:
-            await self.quarantine_store.increment_retry_count(message.id)
-            self.logger.debug(f"Incremented retry count for message {message.id} (now {message.retry_count + 1})")
+            retry_ids.append(message.id)
+            self.logger.debug(f"Incrementing retry count for message {message.id} (now {message.retry_count + 1})")
         else:
             self.logger.warning(f"Message {message.id} exceeded max retries ({self.max_retries})")
     
@@ -302,6 +526,8 @@ class QuarantineReplayManager:
         print("\n" + "="*50)
         print("QUARANTINE REPLAY SUMMARY")
         print("="*50)
+        if self.run is not None:
+            print(f"Replay run:         {self.run.id}")
         print(f"Messages processed: {self.stats['processed']}")
         print(f"Now valid:          {self.stats['valid']}")
         print(f"Still invalid:      {self.stats['invalid']}")
@@ -316,12 +542,11 @@ class QuarantineReplayManager:
     
     async def cleanup(self):
         """Cleanup resources."""
-        if self.mqtt_client:
-            self.mqtt_client.loop_stop()
-            self.mqtt_client.disconnect()
+        if self.publisher_pool:
+            self.publisher_pool.disconnect()
         
         if self.quarantine_store:
-            self.quarantine_store.close()
+            await self.quarantine_store.close()
 
 
 def setup_logging(verbose: bool = False):
@@ -333,6 +558,19 @@ def setup_logging(verbose: bool = False):
     )
 
 
+def read_ids(path: str) -> List[str]:
+    """Message ids from a file ('-' for stdin), one per line; blank lines and # comments are skipped."""
+    source = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [
+            line.strip() for line in source
+            if line.strip() and not line.lstrip().startswith('#')
+        ]
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+
 def parse_date(date_str: str) -> datetime:
     """Parse date string to datetime object."""
     try:
@@ -354,10 +592,14 @@ Examples:
   %(prog)s                                    # Replay all unprocessed messages
   %(prog)s --limit 50                        # Replay first 50 unprocessed messages
   %(prog)s --id msg1 msg2                    # Replay specific messages by ID
+  %(prog)s --ids-from ids.txt                # Replay the message IDs listed in a file
+  sqlite3 ... | %(prog)s --ids-from -        # Replay message IDs read from stdin
   %(prog)s --topic "sensor/%%"               # Replay messages with topics starting with 'sensor/'
   %(prog)s --reason "%%schema%%"             # Replay messages with schema-related failures
   %(prog)s --start-date 2023-12-01           # Replay messages from Dec 1, 2023
   %(prog)s --dry-run                         # Validate only, don't forward messages
+  %(prog)s --rate 200 --max-inflight 50      # Forward at most 200 messages/s, 50 unacknowledged
+  %(prog)s --resume                          # Continue the last interrupted replay run
         """
     )
     
@@ -385,6 +627,12 @@ Examples:
         help='Specific message IDs to replay'
     )
     
+    parser.add_argument(
+        '--ids-from',
+        metavar='FILE',
+        help="File of message IDs to replay, one per line ('-' for stdin)"
+    )
+    
     parser.add_argument(
         '--topic',
         help='Topic pattern to filter messages (SQL LIKE syntax)'
@@ -420,6 +668,34 @@ Examples:
         help='Maximum retry attempts for failed messages'
     )
     
+    parser.add_argument(
+        '--resume',
+        nargs='?',
+        const='',
+        metavar='RUN_ID',
+        help='Continue an interrupted replay run (default: the latest one) with its original filters'
+    )
+    
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=500,
+        help='Messages read, validated and committed per batch'
+    )
+    
+    parser.add_argument(
+        '--max-inflight',
+        type=int,
+        default=100,
+        help='Maximum unacknowledged messages published at once'
+    )
+    
+    parser.add_argument(
+        '--rate',
+        type=float,
+        help='Maximum messages forwarded per second (default: unlimited)'
+    )
+    
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
@@ -436,15 +712,23 @@ Examples:
         config_path=args.config,
         quarantine_db=args.quarantine_db,
         dry_run=args.dry_run,
-        max_retries=args.max_retries
+        max_retries=args.max_retries,
+        batch_size=args.batch_size,
+        max_inflight=args.max_inflight,
+        rate_limit=args.rate
     )
     
     try:
         await manager.initialize()
         
         # Determine replay mode and execute
-        if args.id:
-            await manager.replay_by_id(args.id)
+        if args.resume is not None:
+            await manager.resume(args.resume or None)
+        elif args.id or args.ids_from:
+            message_ids = list(args.id or [])
+            if args.ids_from:
+                message_ids.extend(read_ids(args.ids_from))
+            await manager.replay_by_id(message_ids)
         elif any([args.topic, args.reason, args.start_date, args.end_date]):
             await manager.replay_by_criteria(
                 topic_pattern=args.topic,
@@ -456,10 +740,14 @@ Examples:
         else:
             await manager.replay_all_unprocessed(args.limit)
         
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\nReplay interrupted by user")
+        if manager.run is not None:
+            print(f"Continue with --resume {manager.run.id}")
     except Exception as e:
         print(f"Error: {e}")
+        if manager.run is not None:
+            print(f"Continue with --resume {manager.run.id}")
         return 1
     finally:
         await manager.cleanup()
@@ -3,19 +3,36 @@ Audit Logger Module
 
 This module provides structured logging for all MQTT message processing events.
 Logs are emitted in JSON format for easy ingestion by log aggregation systems.
+
+In queued mode the log_* coroutines only enqueue a tuple; a writer thread
+formats events in batches and writes each batch with one write() per
+stream handler, so file I/O never runs on the event loop.
 """
 
 import json
 import logging
+import queue
+import threading
 import time
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 import asyncio
 
 from pythonjsonlogger import jsonlogger
 
+from metrics_exporter import MetricsExporter
+
+
+SUPPORTED_OVERFLOW_POLICIES = {"drop_newest", "drop_oldest"}
+
+# Queue entry kinds
+_MESSAGE_EVENT = 0  # (kind, created, topic, schema_id, status, reason, client_id,
+                    #  payload_size, processing_time_ms, metadata)
+_RECORD = 1         # (kind, created, levelno, msg, event_data)
+_STOP = object()
+
 
 @dataclass
 class MessageEvent:
@@ -44,10 +61,25 @@ class AuditLogger:
         self,
         log_file: str = "logs/audit.jsonl",
         console_output: bool = True,
-        log_level: str = "INFO"
+        log_level: str = "INFO",
+        queued: bool = False,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval_ms: int = 100,
+        overflow_policy: str = "drop_newest",
+        metrics_exporter: Optional[MetricsExporter] = None
     ):
+        if overflow_policy not in SUPPORTED_OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {SUPPORTED_OVERFLOW_POLICIES}"
+            )
+        
         self.log_file = Path(log_file)
         self.console_output = console_output
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.metrics_exporter = metrics_exporter
         
         # Ensure log directory exists
         self.log_file.parent.mkdir(exist_ok=True)
@@ -58,6 +90,18 @@ class AuditLogger:
         # Performance tracking
         self._start_times: Dict[str, float] = {}
         
+        # Queued mode: bounded queue drained by a dedicated writer thread
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        if queued:
+            self._queue = queue.Queue(maxsize=queue_size)
+            if self.metrics_exporter:
+                self.metrics_exporter.track_audit_queue(self._queue)
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="audit-writer", daemon=True
+            )
+            self._writer.start()
+        
     def _setup_logger(self, log_level: str) -> logging.Logger:
         """Setup JSON structured logger."""
         # Create logger
@@ -114,24 +158,19 @@ class AuditLogger:
             metadata: Additional metadata
         """
         try:
-            event = MessageEvent(
-                timestamp=datetime.utcnow().isoformat() + "Z",
-                event_type=self._determine_event_type(status),
-                topic=topic,
-                client_id=client_id,
-                schema_id=schema_id,
-                status=status,
-                reason=reason,
-                payload_size=payload_size,
-                processing_time_ms=processing_time_ms,
-                metadata=metadata or {}
-            )
-            
-            # Convert to dict and log
-            event_dict = asdict(event)
+            if self._queue is not None:
+                # Hot path: defer building and formatting the event to the writer
+                if self.logger.isEnabledFor(logging.INFO):
+                    self._enqueue((
+                        _MESSAGE_EVENT, time.time(), topic, schema_id, status, reason,
+                        client_id, payload_size, processing_time_ms, metadata
+                    ))
+                return
             
-            # Remove None values to keep logs clean
-            event_dict = {k: v for k, v in event_dict.items() if v is not None}
+            event_dict = self._build_message_event(
+                time.time(), topic, schema_id, status, reason,
+                client_id, payload_size, processing_time_ms, metadata
+            )
             
             # Log the event
             self.logger.info("message_event", extra=event_dict)
@@ -140,6 +179,182 @@ class AuditLogger:
             # Fallback logging - don't let audit logging break the main flow
             self.logger.error(f"Failed to log message event: {e}")
     
+    def _build_message_event(
+        self,
+        created: float,
+        topic: str,
+        schema_id: Optional[str],
+        status: str,
+        reason: Optional[str],
+        client_id: Optional[str],
+        payload_size: int,
+        processing_time_ms: Optional[float],
+        metadata: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the log fields of a message event."""
+        event = MessageEvent(
+            timestamp=datetime.utcfromtimestamp(created).isoformat() + "Z",
+            event_type=self._determine_event_type(status),
+            topic=topic,
+            client_id=client_id,
+            schema_id=schema_id,
+            status=status,
+            reason=reason,
+            payload_size=payload_size,
+            processing_time_ms=processing_time_ms,
+            metadata=metadata or {}
+        )
+        
+        # Convert to dict and remove None values to keep logs clean
+        return {k: v for k, v in asdict(event).items() if v is not None}
+    
+    def _log(self, level: int, msg: str, event_data: Dict[str, Any]):
+        """Emit an event directly or, in queued mode, hand it to the writer."""
+        if self._queue is None:
+            self.logger.log(level, msg, extra=event_data)
+        elif self.logger.isEnabledFor(level):
+            self._enqueue((_RECORD, time.time(), level, msg, event_data))
+    
+    def _enqueue(self, item: Tuple):
+        """Put an event on the audit queue, applying the overflow policy if full."""
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        
+        if self.overflow_policy == "drop_oldest":
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                # The writer cannot keep up at all; drop this event too
+                pass
+        
+        if self.metrics_exporter:
+            self.metrics_exporter.increment_audit_dropped(self.overflow_policy)
+    
+    def _writer_loop(self):
+        """Drain the audit queue in batches until close() is called."""
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            
+            # Collect until the batch is full or the flush interval elapses
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            
+            self._write_batch(batch)
+    
+    def _write_batch(self, batch: List[Tuple]):
+        """
+        Write a batch of queued events to every handler.
+        
+        Each handler gets the records its level and filters accept, formatted
+        with its own formatter. Stream handlers (the file and console ones)
+        receive them with one write(); any other handler emits them one by one.
+        """
+        start = time.perf_counter()
+        records = []
+        for item in batch:
+            try:
+                if item[0] == _MESSAGE_EVENT:
+                    created, level, msg = item[1], logging.INFO, "message_event"
+                    event_data = self._build_message_event(*item[1:])
+                else:
+                    _, created, level, msg, event_data = item
+                record = self.logger.makeRecord(
+                    self.logger.name, level, "(audit)", 0, msg, (), None, extra=event_data
+                )
+                record.created = created
+                records.append(record)
+            except Exception as e:
+                self.logger.error(f"Failed to build audit event: {e}")
+        
+        # Handlers sharing a formatter and terminator write the same text
+        formatted: Dict[Tuple[int, str], str] = {}
+        for handler in self.logger.handlers:
+            selected = [
+                record for record in records
+                if record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not selected:
+                continue
+            if not isinstance(handler, logging.StreamHandler) or handler.stream is None:
+                for record in selected:
+                    handler.acquire()
+                    try:
+                        handler.emit(record)
+                    finally:
+                        handler.release()
+                continue
+            
+            key = (id(handler.formatter), handler.terminator)
+            data = formatted.get(key) if len(selected) == len(records) else None
+            if data is None:
+                data = self._format_batch(handler, selected)
+                if len(selected) == len(records):
+                    formatted[key] = data
+            handler.acquire()
+            try:
+                handler.stream.write(data)
+                handler.flush()
+            except Exception:
+                for record in selected:
+                    handler.handleError(record)
+            finally:
+                handler.release()
+        
+        if self.metrics_exporter:
+            self.metrics_exporter.record_audit_batch_write(time.perf_counter() - start)
+    
+    @staticmethod
+    def _format_batch(handler: logging.StreamHandler, records: List[logging.LogRecord]) -> str:
+        """Text a stream handler would write for records, one emit() each."""
+        lines = []
+        for record in records:
+            try:
+                lines.append(handler.format(record) + handler.terminator)
+            except Exception:
+                handler.handleError(record)
+        return "".join(lines)
+    
+    def close(self, timeout: float = 5.0):
+        """
+        Write out queued events and stop the writer thread.
+        
+        A no-op unless the logger runs in queued mode.
+        """
+        if self._writer is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            self.logger.error("Audit queue still full on close; pending events may be lost")
+            return
+        self._writer.join(timeout)
+        self._writer = None
+    
     def _determine_event_type(self, status: str) -> str:
         """Determine event type based on status."""
         if status == "valid":
@@ -178,8 +393,8 @@ class AuditLogger:
             }
             
             # Log with appropriate level
-            log_method = getattr(self.logger, level.lower(), self.logger.info)
-            log_method("system_event", extra=event_data)
+            log_level = getattr(logging, level.upper(), logging.INFO)
+            self._log(log_level, "system_event", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log system event: {e}")
@@ -216,7 +431,7 @@ class AuditLogger:
                 "details": details or {}
             }
             
-            self.logger.debug("validation_detail", extra=event_data)
+            self._log(logging.DEBUG, "validation_detail", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log validation details: {e}")
@@ -249,7 +464,7 @@ class AuditLogger:
                 "metadata": metadata or {}
             }
             
-            self.logger.info("quarantine_event", extra=event_data)
+            self._log(logging.INFO, "quarantine_event", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log quarantine event: {e}")
@@ -271,7 +486,7 @@ class AuditLogger:
                 "metrics": metrics
             }
             
-            self.logger.info("performance_metrics", extra=event_data)
+            self._log(logging.INFO, "performance_metrics", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log performance metrics: {e}")
@@ -335,7 +550,7 @@ class AuditLogger:
                 "user": user
             }
             
-            self.logger.warning("configuration_change", extra=event_data)
+            self._log(logging.WARNING, "configuration_change", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log configuration change: {e}")
@@ -372,7 +587,7 @@ class AuditLogger:
             }
             
             # Log as warning for security events
-            self.logger.warning("security_event", extra=event_data)
+            self._log(logging.WARNING, "security_event", event_data)
             
         except Exception as e:
             self.logger.error(f"Failed to log security event: {e}")
@@ -458,6 +673,7 @@ if __name__ == "__main__":
             severity="high"
         )
         
+        audit_logger.close()
         print(f"Audit log written to: {audit_logger.get_log_file_path()}")
     
     # Run test
@@ -1,23 +1,49 @@
 from __future__ import annotations
 
+import dataclasses
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 import yaml
 
+from payload_codec import SUPPORTED_CODECS as SUPPORTED_PAYLOAD_CODECS
+from ruleset import CompiledRuleset, build_ruleset, compile_matchers
+from quarantine_partitions import SUPPORTED_PARTITION_PERIODS
+from segment_log import SUPPORTED_FSYNC_POLICIES
+from topic_matcher import (
+    ALLOW_TABLE,
+    SCHEMA_TABLE,
+    TopicDecision,
+    TopicDecisionCache,
+    TopicMatcher,
+)
+
 
 _LOGGER = logging.getLogger(__name__)
 
 
 SUPPORTED_SCHEMA_FORMATS = {"jsonschema", "protobuf"}
 
+SUPPORTED_PROTOBUF_ENCODINGS = {"auto", "binary", "json"}
+
+SUPPORTED_SCHEMA_ENGINES = {"interpreted", "compiled"}
+
+SUPPORTED_BACKPRESSURE_POLICIES = {"block", "drop_oldest", "drop_newest", "quarantine"}
+DEFAULT_BACKPRESSURE_POLICY = "drop_newest"
+
+DEFAULT_TOPIC_CACHE_SIZE = 100000
+
 
 @dataclass(frozen=True)
 class SchemaFileConfig:
     file: str
     format: str
+    # protobuf only: message type to validate (defaults to the first declared)
+    message: Optional[str] = None
+    # protobuf only: 'binary' wire format, 'json' legacy field check, or 'auto'
+    encoding: str = "auto"
 
 
 @dataclass(frozen=True)
@@ -25,15 +51,53 @@ class ProxyConfig:
     topic_patterns: List[str]
     schema_mappings: Dict[str, str]
     schema_files: Dict[str, SchemaFileConfig]
+    proxy_config: Dict[str, Any] = field(default_factory=dict)
+    backpressure_policies: Dict[str, str] = field(default_factory=dict)
+    default_backpressure_policy: str = DEFAULT_BACKPRESSURE_POLICY
+    schema_engine: str = "interpreted"
+    audit_log_config: Dict[str, Any] = field(default_factory=dict)
+    quarantine_config: Dict[str, Any] = field(default_factory=dict)
+    topic_cache_size: int = DEFAULT_TOPIC_CACHE_SIZE
+    # Absolute path of the compiled ruleset cache, or None for no disk cache
+    ruleset_cache: Optional[str] = None
+    # Set by load_config, from the ruleset when one is compiled; hot paths
+    # read prebuilt structures from it
+    ruleset: Optional[CompiledRuleset] = field(default=None, compare=False, repr=False)
+    topic_matcher: Optional[TopicMatcher] = field(default=None, compare=False, repr=False)
+    backpressure_matcher: Optional[TopicMatcher] = field(default=None, compare=False, repr=False)
+    topic_cache: Optional[TopicDecisionCache] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self):
+        # Matchers are left to load_config, so a cached ruleset's are reused
+        # instead of compiled again
+        if self.topic_cache is None:
+            object.__setattr__(self, "topic_cache", TopicDecisionCache(self.topic_cache_size))
+
+    def resolve_topic(self, topic: str) -> TopicDecision:
+        """
+        Return (allowed, reason, schema_id) for a topic.
+
+        Decisions are memoized in topic_cache; reason is empty when allowed.
+        """
+        decision = self.topic_cache.get(topic)
+        if decision is None:
+            result = self.topic_matcher.match(topic)
+            if result[ALLOW_TABLE] is None:
+                reason = f"Topic '{topic}' does not match any allowed pattern"
+                decision = (False, reason, result[SCHEMA_TABLE])
+            else:
+                decision = (True, "", result[SCHEMA_TABLE])
+            self.topic_cache.put(topic, decision)
+        return decision
     
     def get_schema_for_topic(self, topic: str) -> Optional[str]:
         """Find the schema ID for a given topic based on schema mappings."""
-        from utils import match_topic
-        
-        for pattern, schema_id in self.schema_mappings.items():
-            if match_topic(pattern, topic):
-                return schema_id
-        return None
+        return self.resolve_topic(topic)[2]
+
+    def get_backpressure_policy(self, topic: str) -> str:
+        """Find the policy applied to a topic when the ingest queue is full."""
+        policy = self.backpressure_matcher.match(topic)[0]
+        return policy if policy is not None else self.default_backpressure_policy
 
 
 def _validate_config_dict(cfg: dict, base_dir: Path) -> ProxyConfig:
@@ -71,9 +135,94 @@ def _validate_config_dict(cfg: dict, base_dir: Path) -> ProxyConfig:
             raise ValueError(
                 f"schema_files.{schema_id}.format must be one of {SUPPORTED_SCHEMA_FORMATS}"
             )
+        message = ent.get("message")
+        if message is not None and not isinstance(message, str):
+            raise ValueError(f"schema_files.{schema_id}.message must be a string")
+        encoding = ent.get("encoding", "auto")
+        if encoding not in SUPPORTED_PROTOBUF_ENCODINGS:
+            raise ValueError(
+                f"schema_files.{schema_id}.encoding must be one of {SUPPORTED_PROTOBUF_ENCODINGS}"
+            )
         # Normalize relative paths relative to config directory
         abs_path = str((base_dir / file_path).resolve())
-        schema_files[schema_id] = SchemaFileConfig(file=abs_path, format=fmt_lower)
+        schema_files[schema_id] = SchemaFileConfig(
+            file=abs_path, format=fmt_lower, message=message, encoding=encoding
+        )
+
+    proxy_config = cfg.get("proxy_config") or {}
+    if not isinstance(proxy_config, dict):
+        raise ValueError("proxy_config must be a mapping")
+
+    backpressure = cfg.get("backpressure") or {}
+    if not isinstance(backpressure, dict):
+        raise ValueError("backpressure must be a mapping")
+    default_policy = backpressure.get("default_policy", DEFAULT_BACKPRESSURE_POLICY)
+    if default_policy not in SUPPORTED_BACKPRESSURE_POLICIES:
+        raise ValueError(
+            f"backpressure.default_policy must be one of {SUPPORTED_BACKPRESSURE_POLICIES}"
+        )
+    backpressure_policies = backpressure.get("policies") or {}
+    if not isinstance(backpressure_policies, dict) or not all(
+        isinstance(k, str) and v in SUPPORTED_BACKPRESSURE_POLICIES
+        for k, v in backpressure_policies.items()
+    ):
+        raise ValueError(
+            "backpressure.policies must be a mapping of pattern -> "
+            f"one of {SUPPORTED_BACKPRESSURE_POLICIES}"
+        )
+
+    validation_config = cfg.get("validation_config") or {}
+    schema_validation = (
+        validation_config.get("schema_validation") if isinstance(validation_config, dict) else None
+    ) or {}
+    schema_engine = schema_validation.get("engine", "interpreted")
+    if schema_engine not in SUPPORTED_SCHEMA_ENGINES:
+        raise ValueError(
+            f"validation_config.schema_validation.engine must be one of {SUPPORTED_SCHEMA_ENGINES}"
+        )
+
+    logging_config = cfg.get("logging_config") or {}
+    audit_log_config = (
+        logging_config.get("audit_log") if isinstance(logging_config, dict) else None
+    ) or {}
+    if not isinstance(audit_log_config, dict):
+        raise ValueError("logging_config.audit_log must be a mapping")
+
+    quarantine_config = cfg.get("quarantine_config") or {}
+    if not isinstance(quarantine_config, dict):
+        raise ValueError("quarantine_config must be a mapping")
+    compression = quarantine_config.get("compression")
+    if compression is not None and compression not in SUPPORTED_PAYLOAD_CODECS:
+        raise ValueError(
+            f"quarantine_config.compression must be one of {SUPPORTED_PAYLOAD_CODECS} or unset"
+        )
+    segment_fsync = quarantine_config.get("segment_fsync", "segment")
+    if segment_fsync not in SUPPORTED_FSYNC_POLICIES:
+        raise ValueError(
+            f"quarantine_config.segment_fsync must be one of {SUPPORTED_FSYNC_POLICIES}"
+        )
+    partition_period = quarantine_config.get("partition_period", "day")
+    if partition_period not in SUPPORTED_PARTITION_PERIODS:
+        raise ValueError(
+            f"quarantine_config.partition_period must be one of {SUPPORTED_PARTITION_PERIODS}"
+        )
+
+    topic_validation = (
+        validation_config.get("topic_validation") if isinstance(validation_config, dict) else None
+    ) or {}
+    topic_cache_size = topic_validation.get("cache_size", DEFAULT_TOPIC_CACHE_SIZE)
+    if not isinstance(topic_cache_size, int) or topic_cache_size < 0:
+        raise ValueError(
+            "validation_config.topic_validation.cache_size must be a non-negative integer"
+        )
+
+    ruleset_cache = (
+        validation_config.get("ruleset_cache") if isinstance(validation_config, dict) else None
+    )
+    if ruleset_cache is not None:
+        if not isinstance(ruleset_cache, str) or not ruleset_cache:
+            raise ValueError("validation_config.ruleset_cache must be a file path")
+        ruleset_cache = str((base_dir / ruleset_cache).resolve())
 
     # Ensure mappings refer to known schema ids
     unknown = [sid for sid in schema_mappings.values() if sid not in schema_files]
@@ -86,21 +235,47 @@ def _validate_config_dict(cfg: dict, base_dir: Path) -> ProxyConfig:
         topic_patterns=topic_patterns,
         schema_mappings=schema_mappings,
         schema_files=schema_files,
+        proxy_config=proxy_config,
+        backpressure_policies=backpressure_policies,
+        default_backpressure_policy=default_policy,
+        schema_engine=schema_engine,
+        audit_log_config=audit_log_config,
+        quarantine_config=quarantine_config,
+        topic_cache_size=topic_cache_size,
+        ruleset_cache=ruleset_cache,
     )
 
 
-def load_config(path: str | Path) -> ProxyConfig:
+def load_config(path: str | Path, compile_rules: bool = True) -> ProxyConfig:
     """
     Load and validate the YAML configuration file.
     Returns a structured ProxyConfig object with normalized paths and formats.
+
+    With compile_rules the config carries a CompiledRuleset (matchers and
+    loaded schema validators), read from validation_config.ruleset_cache
+    when that cache is current.
     """
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f"Config not found: {path}")
-    with path.open("r", encoding="utf-8") as f:
-        raw = yaml.safe_load(f)
+    config_bytes = path.read_bytes()
+    # The C loader, when PyYAML was built with libyaml, parses several times faster
+    raw = yaml.load(config_bytes, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
     base_dir = path.parent
     config = _validate_config_dict(raw, base_dir)
+    if compile_rules:
+        ruleset = build_ruleset(config, config_bytes, config.ruleset_cache)
+        config = dataclasses.replace(
+            config,
+            ruleset=ruleset,
+            topic_matcher=ruleset.topic_matcher,
+            backpressure_matcher=ruleset.backpressure_matcher,
+        )
+    else:
+        topic_matcher, backpressure_matcher = compile_matchers(config)
+        config = dataclasses.replace(
+            config, topic_matcher=topic_matcher, backpressure_matcher=backpressure_matcher
+        )
     _LOGGER.info(
         "Loaded config: %d topic patterns, %d mappings, %d schemas",
         len(config.topic_patterns),
@@ -0,0 +1,121 @@
+"""
+Config Reloader Module
+
+Reloads rules.yaml while the proxy keeps running. A reload is triggered by
+SIGHUP, or by a change to the config file or any schema file it references
+when watching is enabled. Changes are found by polling file modification
+times, so no file-watch dependency is needed.
+
+The new config and its compiled ruleset are built on a worker thread and
+then handed to MQTTProxy.apply_config. If the new config fails to load,
+the error is logged and the running rules stay in force.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from config_loader import load_config
+from metrics_exporter import MetricsExporter
+from mqtt_proxy import MQTTProxy
+
+
+# path -> (mtime_ns, size), or None while the file is missing
+_FileState = Dict[str, Optional[Tuple[int, int]]]
+
+
+class ConfigReloader:
+    """Reloads the proxy's configuration on demand or when its files change."""
+
+    def __init__(
+        self,
+        config_path: str,
+        proxy: MQTTProxy,
+        metrics_exporter: Optional[MetricsExporter] = None,
+        poll_interval: float = 2.0
+    ):
+        """
+        Args:
+            config_path: Path of rules.yaml
+            proxy: Proxy that receives reloaded configs
+            metrics_exporter: Receives reload outcomes and durations
+            poll_interval: Seconds between file change checks in watch()
+        """
+        self.config_path = config_path
+        self.proxy = proxy
+        self.metrics_exporter = metrics_exporter
+        self.poll_interval = poll_interval
+
+        self.logger = logging.getLogger(__name__)
+
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._file_state: _FileState = {}
+
+    def _watched_files(self) -> List[str]:
+        files = [self.config_path]
+        files.extend(schema.file for schema in self.proxy.config.schema_files.values())
+        return files
+
+    def _read_file_state(self) -> _FileState:
+        state: _FileState = {}
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+                state[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                state[path] = None
+        return state
+
+    async def reload(self) -> bool:
+        """
+        Load the config file and apply it to the proxy.
+
+        Returns True if the new config is in force. Concurrent calls are
+        serialized.
+        """
+        async with self._lock:
+            start = time.perf_counter()
+            try:
+                # Parsing and compiling the ruleset stays off the event loop
+                config = await asyncio.to_thread(load_config, self.config_path)
+                await self.proxy.apply_config(config)
+            except Exception as e:
+                duration = time.perf_counter() - start
+                self.logger.error(f"Config reload failed, keeping current rules: {e}")
+                if self.metrics_exporter:
+                    self.metrics_exporter.record_config_reload("failed", duration)
+                return False
+
+            duration = time.perf_counter() - start
+            self._file_state = self._read_file_state()
+            if self.metrics_exporter:
+                if config.ruleset is not None:
+                    self.metrics_exporter.record_ruleset_build(config.ruleset.build_seconds)
+                self.metrics_exporter.record_config_reload("success", duration)
+            self.logger.info(f"Configuration reloaded in {duration * 1000:.1f} ms")
+            return True
+
+    def request_reload(self):
+        """Schedule a reload from a signal handler running on the event loop."""
+        self.logger.info("Configuration reload requested")
+        task = asyncio.get_running_loop().create_task(self.reload())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def watch(self):
+        """Reload whenever the config file or a referenced schema file changes."""
+        self._file_state = self._read_file_state()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            state = self._read_file_state()
+            if state == self._file_state:
+                continue
+            changed = [path for path, stat in state.items() if self._file_state.get(path) != stat]
+            # Record the change first so a config that fails to load is not
+            # retried on every poll, only after the next edit
+            self._file_state = state
+            self.logger.info(f"Configuration files changed: {', '.join(changed)}")
+            await self.reload()
@@ -12,9 +12,10 @@ import logging
 import signal
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
 from config_loader import load_config
+from config_reloader import ConfigReloader
 from mqtt_proxy import MQTTProxy
 from metrics_exporter import MetricsExporter
 from quarantine_store import QuarantineStore
@@ -31,6 +32,12 @@ class ProxyManager:
         self.metrics_exporter: Optional[MetricsExporter] = None
         self.quarantine_store: Optional[QuarantineStore] = None
         self.audit_logger: Optional[AuditLogger] = None
+        self.config_reloader: Optional[ConfigReloader] = None
+        self.watch_config = False
+        # Quarantine retention: (retention days, check interval seconds) or None
+        self.quarantine_retention: Optional[Tuple[int, float]] = None
+        # Seconds between quarantine size metric updates
+        self.quarantine_stats_interval = 5.0
         self.shutdown_event = asyncio.Event()
         
     async def initialize(self):
@@ -40,9 +47,35 @@ class ProxyManager:
             config = load_config(self.config_path)
             
             # Initialize components
-            self.quarantine_store = QuarantineStore()
-            self.audit_logger = AuditLogger()
             self.metrics_exporter = MetricsExporter()
+            if config.ruleset is not None:
+                self.metrics_exporter.record_ruleset_build(config.ruleset.build_seconds)
+            quarantine = config.quarantine_config
+            self.quarantine_store = QuarantineStore(
+                db_path=quarantine.get("database_path", "quarantine.sqlite3"),
+                quarantine_dir=quarantine.get("quarantine_directory", "quarantine"),
+                write_files=quarantine.get("write_files", True),
+                segment_max_bytes=quarantine.get("segment_max_bytes", 64 * 1024 * 1024),
+                segment_max_age_s=quarantine.get("segment_max_age_s", 3600.0),
+                segment_fsync=quarantine.get("segment_fsync", "segment"),
+                partition_period=quarantine.get("partition_period", "day"),
+                compression=quarantine.get("compression"),
+                compression_level=quarantine.get("compression_level"),
+                compression_dictionary_samples=quarantine.get("compression_dictionary_samples", 1000),
+                metrics_exporter=self.metrics_exporter
+            )
+            audit_log = config.audit_log_config
+            self.audit_logger = AuditLogger(
+                log_file=audit_log.get("file", "logs/audit.jsonl"),
+                console_output=audit_log.get("console_output", True),
+                log_level=audit_log.get("level", "INFO"),
+                queued=audit_log.get("queued", False),
+                queue_size=audit_log.get("queue_size", 10000),
+                batch_size=audit_log.get("batch_size", 256),
+                flush_interval_ms=audit_log.get("flush_interval_ms", 100),
+                overflow_policy=audit_log.get("overflow_policy", "drop_newest"),
+                metrics_exporter=self.metrics_exporter
+            )
             
             # Initialize MQTT proxy
             self.proxy = MQTTProxy(
@@ -53,6 +86,20 @@ class ProxyManager:
                 dry_run=self.dry_run
             )
             
+            self.config_reloader = ConfigReloader(
+                self.config_path,
+                self.proxy,
+                metrics_exporter=self.metrics_exporter,
+                poll_interval=config.proxy_config.get("config_reload_interval", 2.0)
+            )
+            self.watch_config = config.proxy_config.get("config_reload", False)
+            self.quarantine_stats_interval = quarantine.get("stats_interval_s", 5.0)
+            if quarantine.get("auto_cleanup", False):
+                self.quarantine_retention = (
+                    quarantine.get("retention_days", 30),
+                    quarantine.get("cleanup_interval_hours", 24) * 3600.0
+                )
+            
             logging.info("All components initialized successfully")
             
         except Exception as e:
@@ -69,17 +116,53 @@ class ProxyManager:
             await self.metrics_exporter.start()
             logging.info("Metrics exporter started")
             
-            # Start MQTT proxy
-            await self.proxy.start()
-            logging.info("MQTT proxy started")
+            # Start MQTT proxy; start() returns only once the proxy stops
+            proxy_task = asyncio.create_task(self.proxy.start())
+            shutdown_task = asyncio.create_task(self.shutdown_event.wait())
+            watch_task = None
+            if self.watch_config:
+                watch_task = asyncio.create_task(self.config_reloader.watch())
+                logging.info("Watching configuration files for changes")
+            retention_task = None
+            if self.quarantine_retention:
+                retention_task = asyncio.create_task(self.enforce_quarantine_retention())
+            stats_task = asyncio.create_task(self.export_quarantine_size())
             
-            # Wait for shutdown signal
-            await self.shutdown_event.wait()
+            try:
+                # Wait for shutdown signal
+                await asyncio.wait(
+                    [proxy_task, shutdown_task], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                shutdown_task.cancel()
+                if watch_task:
+                    watch_task.cancel()
+                if retention_task:
+                    retention_task.cancel()
+                stats_task.cancel()
+            if proxy_task.done():
+                proxy_task.result()
             
         except Exception as e:
             logging.error(f"Error during proxy operation: {e}")
             raise
     
+    async def enforce_quarantine_retention(self):
+        """Drop expired quarantine partitions now and then every check interval."""
+        retention_days, interval = self.quarantine_retention
+        while True:
+            await self.quarantine_store.cleanup_old_messages(retention_days)
+            await asyncio.sleep(interval)
+    
+    async def export_quarantine_size(self):
+        """Report the unprocessed quarantine backlog to the metrics exporter every interval."""
+        while True:
+            # Read from the store's running totals, so this stays cheap
+            stats = await self.quarantine_store.get_statistics()
+            if stats:
+                self.metrics_exporter.set_quarantine_size(stats['unprocessed_messages'])
+            await asyncio.sleep(self.quarantine_stats_interval)
+    
     async def shutdown(self):
         """Gracefully shutdown all components."""
         logging.info("Initiating graceful shutdown...")
@@ -88,12 +171,17 @@ class ProxyManager:
             await self.proxy.stop()
             logging.info("MQTT proxy stopped")
             
+        if self.audit_logger:
+            # Joins the writer thread, so keep it off the event loop
+            await asyncio.to_thread(self.audit_logger.close)
+            logging.info("Audit logger closed")
+            
         if self.metrics_exporter:
             await self.metrics_exporter.stop()
             logging.info("Metrics exporter stopped")
             
         if self.quarantine_store:
-            self.quarantine_store.close()
+            await self.quarantine_store.close()
             logging.info("Quarantine store closed")
             
         logging.info("Shutdown complete")
@@ -102,6 +190,11 @@ class ProxyManager:
         """Handle shutdown signals."""
         logging.info(f"Received signal {signum}, initiating shutdown...")
         self.shutdown_event.set()
+    
+    def reload_handler(self):
+        """Handle SIGHUP by reloading the configuration."""
+        if self.config_reloader:
+            self.config_reloader.request_reload()
 
 
 def setup_logging(verbose: bool = False):
@@ -128,6 +221,7 @@ Examples:
   %(prog)s --config custom_rules.yaml        # Use custom config
   %(prog)s --dry-run                         # Validate only, don't forward
   %(prog)s --verbose                         # Enable debug logging
+  kill -HUP <pid>                             # Reload rules.yaml without restarting
         """
     )
     
@@ -179,6 +273,8 @@ async def main():
     # Setup signal handlers
     for sig in [signal.SIGINT, signal.SIGTERM]:
         signal.signal(sig, manager.signal_handler)
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, manager.reload_handler)
     
     try:
         # Initialize and start
@@ -0,0 +1,71 @@
+"""
+Message Context Module
+
+Per-message state shared by the validation pipeline. The payload is decoded
+and parsed as JSON at most once, on first use, and every later stage
+(schema validation, audit logging, metrics) reuses the parsed object.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+from utils import parse_schema_header
+
+
+_UNPARSED = object()
+
+
+class MessageContext:
+    """Holds a message and its lazily parsed JSON payload."""
+
+    __slots__ = ("topic", "payload", "schema_id", "_json", "_json_error")
+
+    def __init__(self, topic: Optional[str], payload: bytes, schema_id: Optional[str] = None):
+        self.topic = topic
+        self.payload = payload
+        self.schema_id = schema_id
+        self._json: Any = _UNPARSED
+        self._json_error: Optional[Exception] = None
+
+    @property
+    def payload_size(self) -> int:
+        return len(self.payload)
+
+    @property
+    def is_parsed(self) -> bool:
+        """True once a JSON parse has been attempted."""
+        return self._json is not _UNPARSED
+
+    def json(self) -> Any:
+        """
+        Return the payload parsed as UTF-8 JSON.
+
+        The parse happens on the first call; later calls return the cached
+        object or re-raise the cached error.
+        """
+        if self._json is _UNPARSED:
+            try:
+                self._json = json.loads(self.payload.decode("utf-8"))
+            except ValueError as exc:  # includes UnicodeDecodeError and JSONDecodeError
+                self._json = None
+                self._json_error = exc
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    def audit_metadata(self) -> Dict[str, Any]:
+        """
+        Header fields for audit events, taken from the parsed payload.
+
+        Never triggers a parse; returns an empty dict if no stage parsed the
+        payload or it was not valid JSON.
+        """
+        if self._json is _UNPARSED or self._json_error is not None:
+            return {}
+        schema_id, device_id = parse_schema_header(self._json)
+        metadata = {}
+        if device_id is not None:
+            metadata["device_id"] = device_id
+        if schema_id is not None:
+            metadata["payload_schema_id"] = schema_id
+        return metadata
@@ -7,15 +7,41 @@ Exports metrics about message processing, validation, and quarantine statistics.
 
 import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional
 from dataclasses import dataclass
 from threading import Lock
+from queue import Queue
 import asyncio
 
 from prometheus_client import Counter, Histogram, Gauge, start_http_server, CollectorRegistry, REGISTRY
 from prometheus_client.core import GaugeMetricFamily, CounterMetricFamily, HistogramMetricFamily
 
 
+class _TopicCacheCollector:
+    """Reports topic decision cache statistics at scrape time."""
+    
+    def __init__(self, get_cache: Callable[[], Any]):
+        self.get_cache = get_cache
+    
+    def collect(self):
+        cache = self.get_cache()
+        if cache is None:
+            return
+        for name, documentation, value in (
+            ('mqtt_topic_cache_hits', 'Topic decision cache hits', cache.hits),
+            ('mqtt_topic_cache_misses', 'Topic decision cache misses', cache.misses),
+            ('mqtt_topic_cache_evictions', 'Topic decision cache LRU evictions', cache.evictions),
+        ):
+            yield CounterMetricFamily(name, documentation, value=value)
+        for name, documentation, value in (
+            ('mqtt_topic_cache_entries', 'Topics currently cached', len(cache)),
+            ('mqtt_topic_cache_capacity', 'Maximum number of cached topics', cache.capacity),
+            ('mqtt_topic_cache_bytes', 'Approximate memory used by the topic cache',
+             cache.memory_bytes),
+        ):
+            yield GaugeMetricFamily(name, documentation, value=value)
+
+
 @dataclass
 class MetricsConfig:
     """Configuration for metrics exporter."""
@@ -46,6 +72,12 @@ class MetricsExporter:
         # HTTP server handle
         self._http_server = None
         
+        # Received-message counter of this proxy instance
+        self._instance_received = None
+        
+        # Scrape-time collector for the topic decision cache
+        self._topic_cache_collector: Optional[_TopicCacheCollector] = None
+        
         # Custom registry for isolation
         self.registry = CollectorRegistry()
         
@@ -145,6 +177,146 @@ class MetricsExporter:
             registry=self.registry
         )
         
+        # Ingest queue between the MQTT network thread and validation workers
+        self.ingest_queue_depth = Gauge(
+            'mqtt_ingest_queue_depth',
+            'Number of received messages waiting for a validation worker',
+            registry=self.registry
+        )
+        
+        self.ingest_queue_wait = Histogram(
+            'mqtt_ingest_queue_wait_seconds',
+            'Time a message spends between receipt and pickup by a validation worker',
+            buckets=[0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+            registry=self.registry
+        )
+        
+        self.ingest_dropped = Counter(
+            'mqtt_ingest_dropped_total',
+            'Number of received messages dropped before validation',
+            ['reason'],  # 'drop_newest', 'drop_oldest', 'spill_full', 'not_running'
+            registry=self.registry
+        )
+        
+        self.backpressure_events = Counter(
+            'mqtt_backpressure_events_total',
+            'Number of times a backpressure policy was applied on a full ingest queue',
+            ['policy'],  # 'block', 'drop_oldest', 'drop_newest', 'quarantine'
+            registry=self.registry
+        )
+        
+        # Quarantine store write-behind flushes
+        self.quarantine_flush_latency = Histogram(
+            'mqtt_quarantine_flush_seconds',
+            'Time to write one batch of quarantined messages to the database',
+            buckets=[0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+            registry=self.registry
+        )
+        
+        self.quarantine_flush_rows = Histogram(
+            'mqtt_quarantine_flush_rows',
+            'Number of quarantined messages written per batch',
+            buckets=[1, 10, 50, 100, 250, 500, 1000, 5000, 10000],
+            registry=self.registry
+        )
+        
+        # Proxy instance (scale-out replicas)
+        self.instance_info = Gauge(
+            'mqtt_proxy_instance_info',
+            'Proxy instance identity; always 1',
+            ['instance_id', 'shared_group'],
+            registry=self.registry
+        )
+        
+        self.instance_messages_received = Counter(
+            'mqtt_instance_messages_received_total',
+            'Messages delivered by the broker to this proxy instance',
+            ['instance_id'],
+            registry=self.registry
+        )
+        
+        # Upstream publisher pool
+        self.publisher_inflight = Gauge(
+            'mqtt_publisher_inflight',
+            'Messages published and awaiting PUBACK, per upstream connection',
+            ['connection'],
+            registry=self.registry
+        )
+        
+        self.publish_latency = Histogram(
+            'mqtt_publish_latency_seconds',
+            'Time to hand a message to an upstream connection, including inflight window wait',
+            ['connection'],
+            buckets=[0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+            registry=self.registry
+        )
+        
+        self.puback_rtt = Histogram(
+            'mqtt_puback_rtt_seconds',
+            'Time from publishing a QoS 1 message upstream to receiving its PUBACK',
+            ['connection'],
+            buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0],
+            registry=self.registry
+        )
+        
+        # Queued audit logging
+        self.audit_queue_depth = Gauge(
+            'mqtt_audit_queue_depth',
+            'Number of audit events waiting for the audit writer thread',
+            registry=self.registry
+        )
+        
+        self.audit_events_dropped = Counter(
+            'mqtt_audit_events_dropped_total',
+            'Number of audit events dropped because the audit queue was full',
+            ['policy'],  # 'drop_newest', 'drop_oldest'
+            registry=self.registry
+        )
+        
+        self.audit_batch_write_latency = Histogram(
+            'mqtt_audit_batch_write_seconds',
+            'Time to format and write one batch of audit events',
+            buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5],
+            registry=self.registry
+        )
+        
+        # Multi-process validation
+        self.validation_batch_size = Histogram(
+            'mqtt_validation_batch_size',
+            'Number of payloads sent to a validation process in one batch',
+            buckets=[1, 2, 4, 8, 16, 32, 64, 128, 256, 512],
+            registry=self.registry
+        )
+        
+        self.validation_batch_latency = Histogram(
+            'mqtt_validation_batch_seconds',
+            'Round trip of one batch through a validation process',
+            buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5],
+            registry=self.registry
+        )
+        
+        # Configuration reloads
+        self.config_reloads = Counter(
+            'mqtt_config_reloads_total',
+            'Number of configuration reload attempts',
+            ['result'],  # 'success', 'failed'
+            registry=self.registry
+        )
+        
+        self.config_reload_duration = Histogram(
+            'mqtt_config_reload_seconds',
+            'Time from a reload trigger until the new rules are in force',
+            buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+            registry=self.registry
+        )
+        
+        self.ruleset_build_duration = Histogram(
+            'mqtt_ruleset_build_seconds',
+            'Time to build the compiled ruleset (matchers and schema validators) or load it from cache',
+            buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0],
+            registry=self.registry
+        )
+        
         self.logger.info("Prometheus metrics initialized")
     
     async def start(self):
@@ -251,6 +423,105 @@ class MetricsExporter:
         with self._lock:
             self.message_size.observe(size_bytes)
     
+    def track_ingest_queue(self, queues: List[asyncio.Queue]):
+        """Report the depth of the ingest queues, summed, at scrape time."""
+        self.ingest_queue_depth.set_function(lambda: sum(queue.qsize() for queue in queues))
+    
+    def record_ingest_wait(self, wait_seconds: float):
+        """Record time a message waited in the ingest queue."""
+        with self._lock:
+            self.ingest_queue_wait.observe(wait_seconds)
+    
+    def increment_ingest_dropped(self, reason: str):
+        """Increment ingest drop counter."""
+        with self._lock:
+            self.ingest_dropped.labels(reason=reason).inc()
+    
+    def increment_backpressure_events(self, policy: str):
+        """Increment backpressure policy counter."""
+        with self._lock:
+            self.backpressure_events.labels(policy=policy).inc()
+    
+    def record_quarantine_flush(self, latency_seconds: float, rows: int):
+        """Record one quarantine store batch flush."""
+        with self._lock:
+            self.quarantine_flush_latency.observe(latency_seconds)
+            self.quarantine_flush_rows.observe(rows)
+    
+    def set_instance_info(self, instance_id: str, shared_group: Optional[str]):
+        """Label this exporter with the proxy instance id and shared subscription group."""
+        with self._lock:
+            self.instance_info.labels(
+                instance_id=instance_id, shared_group=shared_group or ""
+            ).set(1)
+            self._instance_received = self.instance_messages_received.labels(
+                instance_id=instance_id
+            )
+    
+    def increment_instance_received(self):
+        """Count a message delivered to this proxy instance."""
+        if self._instance_received is not None:
+            with self._lock:
+                self._instance_received.inc()
+    
+    def set_publisher_inflight(self, connection: str, inflight: int):
+        """Set the number of unacknowledged messages on a publisher connection."""
+        self.publisher_inflight.labels(connection=connection).set(inflight)
+    
+    def record_publish_latency(self, connection: str, latency_seconds: float):
+        """Record time taken to hand a message to a publisher connection."""
+        with self._lock:
+            self.publish_latency.labels(connection=connection).observe(latency_seconds)
+    
+    def record_puback_rtt(self, connection: str, rtt_seconds: float):
+        """Record the PUBACK round trip of a published message."""
+        with self._lock:
+            self.puback_rtt.labels(connection=connection).observe(rtt_seconds)
+    
+    def track_topic_cache(self, get_cache: Callable[[], Any]):
+        """
+        Report topic decision cache statistics at scrape time.
+        
+        get_cache is called on every scrape so a cache replaced on config
+        reload is picked up.
+        """
+        if self._topic_cache_collector is None:
+            self._topic_cache_collector = _TopicCacheCollector(get_cache)
+            self.registry.register(self._topic_cache_collector)
+        else:
+            self._topic_cache_collector.get_cache = get_cache
+    
+    def track_audit_queue(self, audit_queue: Queue):
+        """Report the audit queue depth at scrape time."""
+        self.audit_queue_depth.set_function(audit_queue.qsize)
+    
+    def increment_audit_dropped(self, policy: str):
+        """Increment dropped audit event counter."""
+        with self._lock:
+            self.audit_events_dropped.labels(policy=policy).inc()
+    
+    def record_audit_batch_write(self, latency_seconds: float):
+        """Record time spent writing one batch of audit events."""
+        with self._lock:
+            self.audit_batch_write_latency.observe(latency_seconds)
+    
+    def record_ruleset_build(self, build_seconds: float):
+        """Record the time taken to build a compiled ruleset."""
+        with self._lock:
+            self.ruleset_build_duration.observe(build_seconds)
+    
+    def record_config_reload(self, result: str, duration_seconds: float):
+        """Record a configuration reload attempt and its duration."""
+        with self._lock:
+            self.config_reloads.labels(result=result).inc()
+            self.config_reload_duration.observe(duration_seconds)
+    
+    def record_validation_batch(self, size: int, latency_seconds: float):
+        """Record one batch validated by a worker process."""
+        with self._lock:
+            self.validation_batch_size.observe(size)
+            self.validation_batch_latency.observe(latency_seconds)
+    
     def _sanitize_label(self, label: str) -> str:
         """Sanitize label value for Prometheus."""
         # Replace problematic characters with underscores
@@ -6,11 +6,15 @@ validates, and forwards MQTT messages based on configured rules.
 """
 
 import asyncio
+import concurrent.futures
 import json
 import logging
 import os
+import socket
 import ssl
-from typing import Dict, Any, Optional, Tuple
+import time
+import zlib
+from typing import Callable, Dict, Any, List, NamedTuple, Optional, Set, Tuple
 from dataclasses import dataclass
 from contextlib import asynccontextmanager
 
@@ -18,11 +22,14 @@ import paho.mqtt.client as mqtt
 from paho.mqtt.client import MQTTMessage
 
 from config_loader import ProxyConfig as LoadedProxyConfig
+from message_context import MessageContext
 from topic_validator import TopicValidator
 from schema_validator import SchemaValidator
 from quarantine_store import QuarantineStore
 from audit_logger import AuditLogger
 from metrics_exporter import MetricsExporter
+from publisher_pool import PublisherPool
+from validation_pool import ValidationPool
 
 
 @dataclass
@@ -50,6 +57,40 @@ class ProxyConfig:
     client_id_prefix: str = "schema-proxy"
     max_message_size: int = 1024 * 1024  # 1MB
     validation_timeout: float = 5.0
+    message_queue_size: int = 1000
+    ingest_workers: int = 4
+    ingest_batch_size: int = 8
+    drain_timeout: float = 5.0
+    publisher_connections: int = 1
+    publisher_max_inflight: int = 100
+    # Scale-out mode: MQTTv5 shared subscriptions and per-instance client ids
+    shared_subscription_group: Optional[str] = None
+    instance_id: str = ""
+    # Schema validation in worker processes; 0 validates on the event loop
+    validation_processes: int = 0
+    validation_batch_size: int = 64
+    validation_batch_delay_ms: float = 1.0
+
+
+class _Rules(NamedTuple):
+    """Everything message processing reads from the configuration in force."""
+    config: LoadedProxyConfig
+    topic_validator: TopicValidator
+    schema_validator: SchemaValidator
+    validation_pool: Optional[ValidationPool] = None
+
+
+class _IngestQueue(asyncio.Queue):
+    """Bounded ingest queue that can evict its oldest item of a given kind."""
+    
+    def evict_oldest(self, predicate: Callable[[Tuple[MQTTMessage, float]], bool]):
+        """Remove and return the oldest queued item matching predicate, or None."""
+        for index, item in enumerate(self._queue):
+            if predicate(item):
+                del self._queue[index]
+                self.task_done()
+                return item
+        return None
 
 
 class MQTTProxy:
@@ -68,7 +109,6 @@ class MQTTProxy:
         metrics_exporter: MetricsExporter,
         dry_run: bool = False
     ):
-        self.config = config
         self.quarantine_store = quarantine_store
         self.audit_logger = audit_logger
         self.metrics_exporter = metrics_exporter
@@ -76,22 +116,37 @@ class MQTTProxy:
         
         self.logger = logging.getLogger(__name__)
         
-        # Initialize validators
-        self.topic_validator = TopicValidator(config)
-        self.schema_validator = SchemaValidator(config)
+        # Initialize validators; apply_config replaces them as one unit
+        self._rules = self._build_rules(config)
+        self.metrics_exporter.track_topic_cache(
+            lambda: getattr(self.config, "topic_cache", None)
+        )
         
         # MQTT clients
         self.subscriber_client: Optional[mqtt.Client] = None
-        self.publisher_client: Optional[mqtt.Client] = None
+        self.publisher_pool: Optional[PublisherPool] = None
         
         # Configuration
         self.broker_config = self._load_broker_config()
         self.proxy_config = self._load_proxy_config()
+        self.metrics_exporter.set_instance_info(
+            self.proxy_config.instance_id, self.proxy_config.shared_subscription_group
+        )
         
         # State
         self.is_running = False
         self.connected_upstream = False
         
+        # Ingest stage: paho network thread -> bounded queue per worker,
+        # picked by topic hash -> async workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ingest_queues: List[_IngestQueue] = []
+        self._spill_queue: Optional[asyncio.Queue] = None
+        self._ingest_workers: List[asyncio.Task] = []
+        # Hand-offs of 'block' messages waiting on the loop for queue space
+        self._pending_puts: Set[asyncio.Task] = set()
+        self._ingest_accepting = False
+        
     def _load_broker_config(self) -> BrokerConfig:
         """Load broker configuration from config and environment."""
         broker_cfg = self.config.broker_config if hasattr(self.config, 'broker_config') else {}
@@ -113,6 +168,14 @@ class MQTTProxy:
         """Load proxy configuration."""
         proxy_cfg = self.config.proxy_config if hasattr(self.config, 'proxy_config') else {}
         
+        group = proxy_cfg.get('shared_subscription_group')
+        if group is not None and (
+            not isinstance(group, str) or not group or any(c in group for c in '/+#')
+        ):
+            raise ValueError(
+                "shared_subscription_group must be a non-empty string without '/', '+' or '#'"
+            )
+        
         return ProxyConfig(
             listen_host=proxy_cfg.get('listen_host', '0.0.0.0'),
             listen_port=proxy_cfg.get('listen_port', 1884),
@@ -120,9 +183,61 @@ class MQTTProxy:
             upstream_port=proxy_cfg.get('upstream_port', self.broker_config.port),
             client_id_prefix=proxy_cfg.get('client_id_prefix', 'schema-proxy'),
             max_message_size=proxy_cfg.get('max_message_size', 1024 * 1024),
-            validation_timeout=proxy_cfg.get('validation_timeout', 5.0)
+            validation_timeout=proxy_cfg.get('validation_timeout', 5.0),
+            message_queue_size=proxy_cfg.get('message_queue_size', 1000),
+            ingest_workers=proxy_cfg.get('ingest_workers', 4),
+            ingest_batch_size=proxy_cfg.get('ingest_batch_size', 8),
+            drain_timeout=proxy_cfg.get('drain_timeout', 5.0),
+            publisher_connections=proxy_cfg.get('publisher_connections', 1),
+            publisher_max_inflight=proxy_cfg.get('publisher_max_inflight', 100),
+            shared_subscription_group=group,
+            instance_id=str(
+                proxy_cfg.get('instance_id')
+                or os.getenv('PROXY_INSTANCE_ID')
+                or f"{socket.gethostname()}-{os.getpid()}"
+            ),
+            validation_processes=proxy_cfg.get('validation_processes', 0),
+            validation_batch_size=proxy_cfg.get('validation_batch_size', 64),
+            validation_batch_delay_ms=proxy_cfg.get('validation_batch_delay_ms', 1.0)
         )
     
+    @staticmethod
+    def _build_rules(
+        config: LoadedProxyConfig, validation_pool: Optional[ValidationPool] = None
+    ) -> _Rules:
+        ruleset = getattr(config, "ruleset", None)
+        schema_validator = (
+            ruleset.schema_validator if ruleset is not None else SchemaValidator(config)
+        )
+        return _Rules(config, TopicValidator(config), schema_validator, validation_pool)
+    
+    @property
+    def config(self) -> LoadedProxyConfig:
+        return self._rules.config
+    
+    @property
+    def topic_validator(self) -> TopicValidator:
+        return self._rules.topic_validator
+    
+    @property
+    def schema_validator(self) -> SchemaValidator:
+        return self._rules.schema_validator
+    
+    @property
+    def validation_pool(self) -> Optional[ValidationPool]:
+        return self._rules.validation_pool
+    
+    @property
+    def scale_out(self) -> bool:
+        """True when replicas share subscriptions (MQTTv5, unique client ids)."""
+        return self.proxy_config.shared_subscription_group is not None
+    
+    def _client_id(self, role: str) -> str:
+        """Client id for a connection role; instance-unique in scale-out mode."""
+        if self.scale_out:
+            return f"{self.proxy_config.client_id_prefix}-{self.proxy_config.instance_id}-{role}"
+        return f"{self.proxy_config.client_id_prefix}-{role}"
+    
     async def start(self):
         """Start the MQTT proxy."""
         if self.is_running:
@@ -131,6 +246,13 @@ class MQTTProxy:
         try:
             self.logger.info("Starting MQTT Schema Governance Proxy...")
             
+            if self.proxy_config.validation_processes > 0:
+                pool = await self._start_validation_pool(self.schema_validator)
+                self._rules = self._rules._replace(validation_pool=pool)
+            
+            # Start validation workers before any message can arrive
+            self._start_ingest_workers()
+            
             # Initialize MQTT clients
             await self._setup_clients()
             
@@ -154,59 +276,118 @@ class MQTTProxy:
     
     async def stop(self):
         """Stop the MQTT proxy."""
-        if not self.is_running:
+        if not self.is_running and not self._ingest_workers:
             return
         
         self.logger.info("Stopping MQTT proxy...")
         self.is_running = False
+        # Release a network thread blocked by the 'block' backpressure policy
+        self._ingest_accepting = False
         
         if self.subscriber_client:
             self.subscriber_client.disconnect()
             self.subscriber_client.loop_stop()
         
-        if self.publisher_client:
-            self.publisher_client.disconnect()
-            self.publisher_client.loop_stop()
+        # Let workers finish queued messages while the publisher is still up
+        await self._stop_ingest_workers()
+        
+        pool = self.validation_pool
+        if pool:
+            self._rules = self._rules._replace(validation_pool=None)
+            await pool.stop()
+        
+        if self.publisher_pool:
+            await self.publisher_pool.drain(self.proxy_config.drain_timeout)
+            self.publisher_pool.disconnect()
         
         self.logger.info("MQTT proxy stopped")
     
+    async def apply_config(self, config: LoadedProxyConfig):
+        """
+        Switch to a reloaded configuration while running.
+        
+        Validators (and validation processes) for the new rules are ready
+        before the switch, which is a single assignment of self._rules.
+        Batches already being processed finish with the rules they started
+        with. Only topic patterns that were added or removed are subscribed
+        or unsubscribed. proxy_config changes need a restart.
+        """
+        old = self._rules
+        if config.proxy_config != old.config.proxy_config:
+            self.logger.warning("proxy_config changes take effect after a restart")
+        
+        rules = self._build_rules(config)
+        if old.validation_pool:
+            rules = rules._replace(
+                validation_pool=await self._start_validation_pool(rules.schema_validator)
+            )
+        self._rules = rules
+        
+        await self._update_subscriptions(old.config.topic_patterns, config.topic_patterns)
+        if old.validation_pool:
+            await old.validation_pool.stop()
+        self.logger.info(
+            f"Applied new configuration: {len(config.topic_patterns)} topic patterns, "
+            f"{len(config.schema_mappings)} mappings, {len(config.schema_files)} schemas"
+        )
+    
+    async def _start_validation_pool(self, schema_validator: SchemaValidator) -> ValidationPool:
+        pool = ValidationPool(
+            schema_validator,
+            self.proxy_config.validation_processes,
+            batch_size=self.proxy_config.validation_batch_size,
+            max_batch_delay_ms=self.proxy_config.validation_batch_delay_ms,
+            metrics_exporter=self.metrics_exporter
+        )
+        await pool.start()
+        return pool
+    
     async def _setup_clients(self):
         """Initialize MQTT clients for subscribing and publishing."""
         # Subscriber client (receives messages to validate)
-        self.subscriber_client = mqtt.Client(
-            client_id=f"{self.proxy_config.client_id_prefix}-subscriber",
-            clean_session=self.broker_config.clean_session
-        )
+        self.subscriber_client = self._create_client(self._client_id("subscriber"))
+        self.subscriber_client.on_connect = self._on_subscriber_connect
+        self.subscriber_client.on_message = self._on_message_received
+        self.subscriber_client.on_disconnect = self._on_subscriber_disconnect
         
-        # Publisher client (forwards valid messages)
-        self.publisher_client = mqtt.Client(
-            client_id=f"{self.proxy_config.client_id_prefix}-publisher",
-            clean_session=self.broker_config.clean_session
+        # Publisher connections (forward valid messages)
+        self.publisher_pool = PublisherPool(
+            self._create_publisher_client,
+            client_id=self._client_id("publisher"),
+            size=self.proxy_config.publisher_connections,
+            max_inflight=self.proxy_config.publisher_max_inflight,
+            metrics_exporter=self.metrics_exporter
         )
+    
+    def _create_client(self, client_id: str) -> mqtt.Client:
+        """Create an MQTT client with the broker's TLS and authentication settings."""
+        if self.scale_out:
+            # Shared subscriptions need MQTTv5; clean_session becomes clean_start on connect
+            client = mqtt.Client(client_id=client_id, protocol=mqtt.MQTTv5)
+        else:
+            client = mqtt.Client(
+                client_id=client_id,
+                clean_session=self.broker_config.clean_session
+            )
         
         # Configure TLS if enabled
         if self.broker_config.use_tls:
-            self._configure_tls(self.subscriber_client)
-            self._configure_tls(self.publisher_client)
+            self._configure_tls(client)
         
         # Configure authentication
         if self.broker_config.username and self.broker_config.password:
-            self.subscriber_client.username_pw_set(
+            client.username_pw_set(
                 self.broker_config.username,
                 self.broker_config.password
             )
-            self.publisher_client.username_pw_set(
-                self.broker_config.username,
-                self.broker_config.password
-            )
-        
-        # Set callbacks
-        self.subscriber_client.on_connect = self._on_subscriber_connect
-        self.subscriber_client.on_message = self._on_message_received
-        self.subscriber_client.on_disconnect = self._on_subscriber_disconnect
-        
-        self.publisher_client.on_connect = self._on_publisher_connect
-        self.publisher_client.on_disconnect = self._on_publisher_disconnect
+        return client
+    
+    def _create_publisher_client(self, client_id: str) -> mqtt.Client:
+        """Create one publisher pool connection."""
+        client = self._create_client(client_id)
+        client.on_connect = self._on_publisher_connect
+        client.on_disconnect = self._on_publisher_disconnect
+        return client
     
     def _configure_tls(self, client: mqtt.Client):
         """Configure TLS for MQTT client."""
@@ -231,27 +412,29 @@ class MQTTProxy:
             result = self.subscriber_client.connect(
                 self.broker_config.host,
                 self.broker_config.port,
-                self.broker_config.keepalive
+                self.broker_config.keepalive,
+                **self._connect_options()
             )
             
             if result != mqtt.MQTT_ERR_SUCCESS:
                 raise ConnectionError(f"Failed to connect subscriber: {mqtt.error_string(result)}")
             
-            # Connect publisher
-            self.publisher_client.loop_start()
-            result = self.publisher_client.connect(
+            # Connect publishers
+            self.publisher_pool.connect(
                 self.broker_config.host,
                 self.broker_config.port,
-                self.broker_config.keepalive
+                self.broker_config.keepalive,
+                **self._connect_options()
             )
             
-            if result != mqtt.MQTT_ERR_SUCCESS:
-                raise ConnectionError(f"Failed to connect publisher: {mqtt.error_string(result)}")
-            
-            # Wait for connections
-            await asyncio.sleep(1)
+            # Wait for connections; paho may only send CONNECT on the next
+            # iteration of a loop thread started before connect()
+            for _ in range(50):
+                if self.subscriber_client.is_connected() and self.publisher_pool.is_connected():
+                    break
+                await asyncio.sleep(0.1)
             
-            if not self.subscriber_client.is_connected() or not self.publisher_client.is_connected():
+            if not self.subscriber_client.is_connected() or not self.publisher_pool.is_connected():
                 raise ConnectionError("Failed to establish connection to upstream broker")
             
             self.connected_upstream = True
@@ -261,102 +444,381 @@ class MQTTProxy:
             self.logger.error(f"Failed to connect to upstream broker: {e}")
             raise
     
+    def _connect_options(self) -> Dict[str, Any]:
+        """Extra connect() arguments for the client protocol version."""
+        if self.scale_out:
+            return {"clean_start": self.broker_config.clean_session}
+        return {}
+    
     async def _subscribe_to_topics(self):
         """Subscribe to configured topic patterns."""
-        for pattern in self.config.topic_patterns:
-            result, mid = self.subscriber_client.subscribe(pattern, qos=1)
+        self._subscribe(self.config.topic_patterns)
+    
+    def _topic_filter(self, pattern: str) -> str:
+        # In scale-out mode the broker load-balances each pattern across the group
+        group = self.proxy_config.shared_subscription_group
+        return f"$share/{group}/{pattern}" if group else pattern
+    
+    def _subscribe(self, patterns: List[str]):
+        for pattern in patterns:
+            topic_filter = self._topic_filter(pattern)
+            result, mid = self.subscriber_client.subscribe(topic_filter, qos=1)
+            if result != mqtt.MQTT_ERR_SUCCESS:
+                self.logger.error(f"Failed to subscribe to {topic_filter}: {mqtt.error_string(result)}")
+            else:
+                self.logger.info(f"Subscribed to topic pattern: {topic_filter}")
+    
+    async def _update_subscriptions(self, old_patterns: List[str], new_patterns: List[str]):
+        """Subscribe to added patterns and unsubscribe from removed ones."""
+        if self.subscriber_client is None:
+            return
+        old_set, new_set = set(old_patterns), set(new_patterns)
+        self._subscribe([pattern for pattern in new_patterns if pattern not in old_set])
+        removed = [self._topic_filter(p) for p in old_patterns if p not in new_set]
+        if removed:
+            result, mid = self.subscriber_client.unsubscribe(removed)
             if result != mqtt.MQTT_ERR_SUCCESS:
-                self.logger.error(f"Failed to subscribe to {pattern}: {mqtt.error_string(result)}")
+                self.logger.error(f"Failed to unsubscribe from {removed}: {mqtt.error_string(result)}")
             else:
-                self.logger.info(f"Subscribed to topic pattern: {pattern}")
+                self.logger.info(f"Unsubscribed from topic patterns: {', '.join(removed)}")
     
-    def _on_subscriber_connect(self, client, userdata, flags, rc):
+    def _on_subscriber_connect(self, client, userdata, flags, rc, properties=None):
         """Callback for subscriber connection."""
         if rc == 0:
             self.logger.info("Subscriber connected to broker")
         else:
             self.logger.error(f"Subscriber connection failed with code {rc}")
     
-    def _on_subscriber_disconnect(self, client, userdata, rc):
+    def _on_subscriber_disconnect(self, client, userdata, rc, properties=None):
         """Callback for subscriber disconnection."""
         if rc != 0:
             self.logger.warning("Subscriber disconnected unexpectedly")
         else:
             self.logger.info("Subscriber disconnected")
     
-    def _on_publisher_connect(self, client, userdata, flags, rc):
+    def _on_publisher_connect(self, client, userdata, flags, rc, properties=None):
         """Callback for publisher connection."""
         if rc == 0:
             self.logger.info("Publisher connected to broker")
         else:
             self.logger.error(f"Publisher connection failed with code {rc}")
     
-    def _on_publisher_disconnect(self, client, userdata, rc):
+    def _on_publisher_disconnect(self, client, userdata, rc, properties=None):
         """Callback for publisher disconnection."""
         if rc != 0:
             self.logger.warning("Publisher disconnected unexpectedly")
         else:
             self.logger.info("Publisher disconnected")
     
-    def _on_message_received(self, client, userdata, message: MQTTMessage):
-        """Handle received MQTT message."""
-        try:
-            # Run validation in async context
-            asyncio.create_task(self._process_message(message))
-        except Exception as e:
-            self.logger.error(f"Error processing message: {e}")
-    
-    async def _process_message(self, message: MQTTMessage):
-        """Process and validate an MQTT message."""
-        topic = message.topic
-        payload = message.payload
+    def _start_ingest_workers(self):
+        """
+        Create the ingest queues and their validation workers.
         
-        try:
-            # Check message size
-            if len(payload) > self.proxy_config.max_message_size:
-                await self._handle_invalid_message(
-                    topic, payload, f"Message too large: {len(payload)} bytes"
+        Every worker drains its own queue, and a topic always hashes to the
+        same queue, so a topic's messages are processed and forwarded in the
+        order they arrived. message_queue_size is split between the queues.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._spill_queue = asyncio.Queue(maxsize=self.proxy_config.message_queue_size)
+        
+        worker_count = max(1, self.proxy_config.ingest_workers)
+        if self.validation_pool:
+            # Enough messages must be in flight at once to fill every process's batch
+            worker_count = max(
+                worker_count,
+                self.validation_pool.processes * self.validation_pool.batch_size
+            )
+        shard_size = max(1, -(-self.proxy_config.message_queue_size // worker_count))
+        self._ingest_queues = [_IngestQueue(maxsize=shard_size) for _ in range(worker_count)]
+        self.metrics_exporter.track_ingest_queue(self._ingest_queues)
+        self._ingest_workers = [
+            asyncio.create_task(self._ingest_worker(worker_id, queue))
+            for worker_id, queue in enumerate(self._ingest_queues)
+        ]
+        self._ingest_workers.append(asyncio.create_task(self._spill_worker()))
+        self._ingest_accepting = True
+        self.logger.info(
+            f"Started {worker_count} ingest workers "
+            f"(queue size {self.proxy_config.message_queue_size})"
+        )
+    
+    async def _stop_ingest_workers(self):
+        """Drain the ingest queues (bounded by drain_timeout) and stop workers."""
+        if self._ingest_queues and self._ingest_workers:
+            try:
+                await asyncio.wait_for(
+                    self._drain_ingest(), timeout=self.proxy_config.drain_timeout
                 )
+            except asyncio.TimeoutError:
+                self.logger.warning(
+                    f"Ingest queues not drained within {self.proxy_config.drain_timeout}s, "
+                    f"{self._ingest_depth() + len(self._pending_puts)} messages dropped"
+                )
+        
+        for put in self._pending_puts:
+            put.cancel()
+            self.metrics_exporter.increment_ingest_dropped("not_running")
+        await asyncio.gather(*self._pending_puts, return_exceptions=True)
+        self._pending_puts.clear()
+        for worker in self._ingest_workers:
+            worker.cancel()
+        await asyncio.gather(*self._ingest_workers, return_exceptions=True)
+        self._ingest_workers = []
+        self._loop = None
+    
+    async def _drain_ingest(self):
+        """Wait until pending hand-offs are queued and every queue is processed."""
+        if self._pending_puts:
+            # wait() rather than gather(): a timeout must not cancel the puts
+            # before _stop_ingest_workers counts them
+            await asyncio.wait(set(self._pending_puts))
+        await asyncio.gather(
+            *(queue.join() for queue in self._ingest_queues), self._spill_queue.join()
+        )
+    
+    def _ingest_depth(self) -> int:
+        """Messages waiting in all ingest queues."""
+        return sum(queue.qsize() for queue in self._ingest_queues)
+    
+    def _ingest_queue_for(self, topic: str) -> _IngestQueue:
+        """The ingest queue a topic's messages always go to."""
+        queues = self._ingest_queues
+        return queues[zlib.crc32(topic.encode('utf-8')) % len(queues)]
+    
+    async def _ingest_worker(self, worker_id: int, queue: _IngestQueue):
+        """
+        Drain one ingest queue into _process_messages.
+        
+        Besides the message it waited for, a worker takes whatever else is
+        already queued (up to ingest_batch_size), so batches only form under
+        load and never add waiting time.
+        """
+        batch_size = max(1, self.proxy_config.ingest_batch_size)
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                now = time.monotonic()
+                for _, received_at in batch:
+                    self.metrics_exporter.record_ingest_wait(now - received_at)
+                await self._process_messages([message for message, _ in batch])
+            except Exception as e:
+                self.logger.error(f"Ingest worker {worker_id} failed on {len(batch)} messages: {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+    
+    async def _spill_worker(self):
+        """Store messages spilled by the 'quarantine' backpressure policy."""
+        queue = self._spill_queue
+        while True:
+            message = await queue.get()
+            try:
+                await self._spill_to_quarantine(message.topic, message.payload)
+            except Exception as e:
+                self.logger.error(f"Failed to spill message on {message.topic}: {e}")
+            finally:
+                queue.task_done()
+    
+    async def _spill_to_quarantine(self, topic: str, payload: bytes):
+        """Quarantine an unvalidated message with reason 'overload'."""
+        await self.quarantine_store.store(topic, payload, "overload")
+        await self.audit_logger.log_message(
+            topic=topic,
+            schema_id=None,
+            status="quarantined",
+            reason="overload",
+            payload_size=len(payload)
+        )
+        self.metrics_exporter.increment_quarantine_count()
+    
+    def _enqueue_message(self, queue: _IngestQueue, message: MQTTMessage, received_at: float):
+        """
+        Put a received message on its topic's ingest queue (runs on the event loop).
+        
+        When the queue is full, the backpressure policy of the incoming
+        message's topic decides what happens. Whatever is dropped belongs to
+        a topic with that policy and is counted under it.
+        """
+        item = (message, received_at)
+        if not queue.full():
+            queue.put_nowait(item)
+            return
+        
+        policy = self.config.get_backpressure_policy(message.topic)
+        self.metrics_exporter.increment_backpressure_events(policy)
+        
+        if policy == "drop_oldest":
+            # Only messages of drop_oldest topics are evicted; when none is
+            # queued the incoming one is dropped instead
+            if queue.evict_oldest(self._drop_oldest_filter()) is not None:
+                queue.put_nowait(item)
+            self.metrics_exporter.increment_ingest_dropped("drop_oldest")
+        elif policy == "quarantine":
+            try:
+                self._spill_queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.metrics_exporter.increment_ingest_dropped("spill_full")
+        elif policy == "block":
+            # The queue filled up after the network thread checked it. Only the
+            # handful of hand-offs already in flight can land here, so wait for
+            # space on the loop rather than dropping.
+            put = asyncio.create_task(queue.put(item))
+            self._pending_puts.add(put)
+            put.add_done_callback(self._pending_puts.discard)
+        else:
+            self.metrics_exporter.increment_ingest_dropped("drop_newest")
+            self.logger.debug(f"Ingest queue full, dropping message on {message.topic}")
+    
+    def _drop_oldest_filter(self) -> Callable[[Tuple[MQTTMessage, float]], bool]:
+        """Predicate for queued items whose topic has the drop_oldest policy."""
+        policies: Dict[str, str] = {}
+        
+        def is_drop_oldest(item: Tuple[MQTTMessage, float]) -> bool:
+            topic = item[0].topic
+            policy = policies.get(topic)
+            if policy is None:
+                policy = policies[topic] = self.config.get_backpressure_policy(topic)
+            return policy == "drop_oldest"
+        
+        return is_drop_oldest
+    
+    def _enqueue_blocking(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        queue: _IngestQueue,
+        message: MQTTMessage,
+        received_at: float
+    ):
+        """
+        Block the paho network thread until the message fits in its ingest queue.
+        
+        While the network thread is blocked paho stops reading the socket, which
+        applies TCP backpressure to the broker.
+        """
+        self.metrics_exporter.increment_backpressure_events("block")
+        future = asyncio.run_coroutine_threadsafe(
+            queue.put((message, received_at)), loop
+        )
+        while True:
+            try:
+                future.result(timeout=0.5)
                 return
-            
-            # Validate topic
-            topic_valid, topic_reason = self.topic_validator.validate(topic)
-            
-            if not topic_valid:
-                await self._handle_invalid_message(topic, payload, f"Topic validation failed: {topic_reason}")
-                return
-            
-            # Get schema for topic
-            schema_id = self.config.get_schema_for_topic(topic)
-            if not schema_id:
-                await self._handle_invalid_message(topic, payload, "No schema mapping found for topic")
+            except concurrent.futures.TimeoutError:
+                if not self._ingest_accepting:
+                    future.cancel()
+                    self.metrics_exporter.increment_ingest_dropped("not_running")
+                    return
+            except Exception as e:
+                self.metrics_exporter.increment_ingest_dropped("not_running")
+                self.logger.error(f"Blocking hand-off failed: {e}")
                 return
-            
-            # Validate payload against schema
-            schema_valid, schema_reason = self.schema_validator.validate(schema_id, payload)
-            
-            if not schema_valid:
-                await self._handle_invalid_message(topic, payload, f"Schema validation failed: {schema_reason}")
+    
+    def _on_message_received(self, client, userdata, message: MQTTMessage):
+        """Handle received MQTT message (runs on the paho network thread)."""
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self._ingest_accepting:
+            self.metrics_exporter.increment_ingest_dropped("not_running")
+            return
+        received_at = time.monotonic()
+        self.metrics_exporter.increment_instance_received()
+        try:
+            topic = message.topic
+            queue = self._ingest_queue_for(topic)
+            # The policy is only looked up once the queue is saturated
+            if queue.full() and self.config.get_backpressure_policy(topic) == "block":
+                self._enqueue_blocking(loop, queue, message, received_at)
                 return
+            # Hand off to the event loop; asyncio objects are not thread-safe
+            loop.call_soon_threadsafe(self._enqueue_message, queue, message, received_at)
+        except RuntimeError as e:
+            self.metrics_exporter.increment_ingest_dropped("not_running")
+            self.logger.error(f"Error handing off message: {e}")
+    
+    async def _process_messages(self, messages: List[MQTTMessage]):
+        """
+        Process and validate a batch of MQTT messages.
+        
+        Size and topic checks run per message; payloads mapped to the same
+        schema are then validated together.
+        """
+        # The whole batch uses the rules in force when it started, even if a
+        # reload switches them meanwhile
+        rules = self._rules
+        by_schema: Dict[str, List[MessageContext]] = {}
+        for message in messages:
+            # Shared by every stage so the payload is parsed at most once
+            context = MessageContext(message.topic, message.payload)
+            try:
+                reason = self._check_message(rules, context)
+            except Exception as e:
+                self.logger.error(f"Error processing message for topic {context.topic}: {e}")
+                reason = f"Processing error: {str(e)}"
+            if reason:
+                await self._handle_invalid_message(context, reason)
+            else:
+                by_schema.setdefault(context.schema_id, []).append(context)
+        
+        for schema_id, contexts in by_schema.items():
+            try:
+                results = await self._validate_payloads(rules, schema_id, contexts)
+            except asyncio.TimeoutError:
+                results = [(False, None)] * len(contexts)
+                error = "Validation timeout"
+            except Exception as e:
+                self.logger.error(f"Error validating {len(contexts)} messages for {schema_id}: {e}")
+                results = [(False, None)] * len(contexts)
+                error = f"Processing error: {str(e)}"
             
-            # Message is valid - forward it
-            await self._handle_valid_message(topic, payload, schema_id)
-            
-        except asyncio.TimeoutError:
-            await self._handle_invalid_message(topic, payload, "Validation timeout")
-        except Exception as e:
-            self.logger.error(f"Error processing message for topic {topic}: {e}")
-            await self._handle_invalid_message(topic, payload, f"Processing error: {str(e)}")
+            for context, (schema_valid, schema_reason) in zip(contexts, results):
+                if schema_valid:
+                    # Message is valid - forward it
+                    await self._handle_valid_message(context)
+                elif schema_reason is None:
+                    await self._handle_invalid_message(context, error)
+                else:
+                    await self._handle_invalid_message(
+                        context, f"Schema validation failed: {schema_reason}"
+                    )
+    
+    def _check_message(self, rules: _Rules, context: MessageContext) -> Optional[str]:
+        """Run size and topic checks; returns the rejection reason, or None and sets schema_id."""
+        # Check message size
+        if len(context.payload) > self.proxy_config.max_message_size:
+            return f"Message too large: {len(context.payload)} bytes"
+        
+        # Validate topic and get schema for topic in one matcher walk
+        topic_valid, topic_reason, schema_id = rules.topic_validator.resolve(context.topic)
+        if not topic_valid:
+            return f"Topic validation failed: {topic_reason}"
+        if not schema_id:
+            return "No schema mapping found for topic"
+        context.schema_id = schema_id
+        return None
+    
+    async def _validate_payloads(
+        self, rules: _Rules, schema_id: str, contexts: List[MessageContext]
+    ) -> List[Tuple[bool, str]]:
+        """Validate payloads against one schema, in worker processes when enabled."""
+        if rules.validation_pool:
+            return await asyncio.gather(*(
+                rules.validation_pool.validate(schema_id, context.payload)
+                for context in contexts
+            ))
+        return rules.schema_validator.validate_batch(schema_id, contexts)
     
-    async def _handle_valid_message(self, topic: str, payload: bytes, schema_id: str):
+    async def _handle_valid_message(self, context: MessageContext):
         """Handle a valid message by forwarding it."""
+        topic = context.topic
         try:
             # Log successful validation
             await self.audit_logger.log_message(
                 topic=topic,
-                schema_id=schema_id,
+                schema_id=context.schema_id,
                 status="valid",
-                payload_size=len(payload)
+                payload_size=context.payload_size,
+                metadata=context.audit_metadata()
             )
             
             # Update metrics
@@ -364,9 +826,9 @@ class MQTTProxy:
             
             # Forward message if not in dry run mode
             if not self.dry_run:
-                result = self.publisher_client.publish(topic, payload, qos=1)
-                if result.rc != mqtt.MQTT_ERR_SUCCESS:
-                    self.logger.error(f"Failed to publish message to {topic}: {mqtt.error_string(result.rc)}")
+                rc = await self.publisher_pool.publish(topic, context.payload, qos=1)
+                if rc != mqtt.MQTT_ERR_SUCCESS:
+                    self.logger.error(f"Failed to publish message to {topic}: {mqtt.error_string(rc)}")
                 else:
                     self.logger.debug(f"Forwarded valid message to {topic}")
             else:
@@ -375,19 +837,21 @@ class MQTTProxy:
         except Exception as e:
             self.logger.error(f"Error handling valid message: {e}")
     
-    async def _handle_invalid_message(self, topic: str, payload: bytes, reason: str):
+    async def _handle_invalid_message(self, context: MessageContext, reason: str):
         """Handle an invalid message by quarantining it."""
+        topic = context.topic
         try:
             # Store in quarantine
-            await self.quarantine_store.store(topic, payload, reason)
+            await self.quarantine_store.store(topic, context.payload, reason)
             
             # Log rejection
             await self.audit_logger.log_message(
                 topic=topic,
-                schema_id=None,
+                schema_id=context.schema_id,
                 status="invalid",
                 reason=reason,
-                payload_size=len(payload)
+                payload_size=context.payload_size,
+                metadata=context.audit_metadata()
             )
             
             # Update metrics
@@ -0,0 +1,172 @@
+"""
+Payload Codec Module
+
+Optional compression of quarantined payloads. Supported codecs are zlib
+(standard library) and zstd (needs the zstandard package). Small JSON
+telemetry compresses poorly on its own, so the codec can collect samples of
+stored payloads and build a dictionary from them: a trained zstd dictionary,
+or a zlib preset dictionary made of representative samples. Dictionaries
+are numbered by the caller (the quarantine store keeps them in its
+database) and every compressed blob records the codec and dictionary it
+needs, so old blobs stay readable after a new dictionary is built.
+"""
+
+import logging
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for codec 'zstd'
+    zstandard = None
+
+
+SUPPORTED_CODECS = {"zlib", "zstd"}
+
+# zlib only looks back 32 KiB, so a larger preset dictionary is wasted
+_ZLIB_MAX_DICTIONARY = 32 * 1024
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class PayloadCodec:
+    """
+    Compresses and decompresses payloads, with optional dictionaries.
+
+    A codec of None stores payloads as-is but can still read blobs written
+    by an earlier configuration with compression.
+    """
+
+    def __init__(
+        self,
+        codec: Optional[str] = None,
+        level: Optional[int] = None,
+        dictionary_size: int = 16 * 1024,
+        dictionary_samples: int = 1000
+    ):
+        """
+        Args:
+            codec: 'zlib', 'zstd' or None for no compression
+            level: Compression level; None for the codec's default
+            dictionary_size: Target dictionary size in bytes
+            dictionary_samples: Payloads collected before a dictionary is
+                built; 0 disables dictionaries
+        """
+        if codec is not None and codec not in SUPPORTED_CODECS:
+            raise ValueError(f"Unsupported payload codec {codec!r}; use one of {sorted(SUPPORTED_CODECS)}")
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("Payload codec 'zstd' requires the zstandard package")
+        self.codec = codec
+        self.level = level
+        self.dictionary_size = dictionary_size
+        self.dictionary_samples = dictionary_samples
+
+        # Dictionary used for new blobs, and every known one for reading
+        self.dictionary_id: Optional[int] = None
+        self._dictionaries: Dict[Tuple[str, int], bytes] = {}
+        self._samples: List[bytes] = []
+
+        self._zlib_dictionary: Optional[bytes] = None
+        self._zstd_compressor = self._make_zstd_compressor(None) if codec == "zstd" else None
+        self._zstd_decompressors: Dict[Optional[int], "zstandard.ZstdDecompressor"] = {}
+
+    def _make_zstd_compressor(self, dictionary: Optional[bytes]) -> "zstandard.ZstdCompressor":
+        level = 3 if self.level is None else self.level
+        dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        return zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+
+    def install_dictionary(self, codec: str, dictionary_id: int, dictionary: bytes, current: bool = True):
+        """Register a stored dictionary; a current one is used for new blobs."""
+        self._dictionaries[(codec, dictionary_id)] = dictionary
+        if current and codec == self.codec:
+            self.dictionary_id = dictionary_id
+            if codec == "zstd":
+                self._zstd_compressor = self._make_zstd_compressor(dictionary)
+            else:
+                self._zlib_dictionary = dictionary
+            self._samples = []
+
+    def wants_samples(self) -> bool:
+        return self.codec is not None and self.dictionary_id is None and self.dictionary_samples > 0
+
+    def add_sample(self, payload: bytes):
+        """Collect a payload for dictionary training."""
+        if self.wants_samples() and len(self._samples) < self.dictionary_samples:
+            self._samples.append(payload)
+
+    def ready_to_train(self) -> bool:
+        return self.wants_samples() and len(self._samples) >= self.dictionary_samples
+
+    def train_dictionary(self) -> Optional[bytes]:
+        """
+        Build a dictionary from the collected samples.
+
+        Returns None if the samples do not yield a usable dictionary; sampling
+        then stops until the next restart.
+        """
+        samples, self._samples = self._samples, []
+        self.dictionary_samples = 0
+        if self.codec == "zstd":
+            try:
+                trained = zstandard.train_dictionary(self.dictionary_size, samples)
+            except zstandard.ZstdError as e:
+                _LOGGER.warning(f"Could not train zstd payload dictionary: {e}")
+                return None
+            return trained.as_bytes()
+
+        # zlib has no trainer: fill the preset dictionary with the most
+        # frequent distinct samples, most frequent last (closest to the data)
+        counts: Dict[bytes, int] = {}
+        for sample in samples:
+            counts[sample] = counts.get(sample, 0) + 1
+        dictionary = b""
+        for sample in sorted(counts, key=counts.get, reverse=True):
+            if len(dictionary) + len(sample) > min(self.dictionary_size, _ZLIB_MAX_DICTIONARY):
+                break
+            dictionary = sample + dictionary
+        return dictionary or None
+
+    def compress(self, payload: bytes) -> Tuple[Optional[str], Optional[int], bytes]:
+        """
+        Compress a payload.
+
+        Returns (codec, dictionary_id, blob). Payloads that do not shrink are
+        returned as-is with codec None.
+        """
+        if self.codec is None:
+            return None, None, payload
+        if self.codec == "zstd":
+            blob = self._zstd_compressor.compress(payload)
+        else:
+            level = -1 if self.level is None else self.level
+            if self._zlib_dictionary:
+                compressor = zlib.compressobj(level, zdict=self._zlib_dictionary)
+            else:
+                compressor = zlib.compressobj(level)
+            blob = compressor.compress(payload) + compressor.flush()
+        if len(blob) >= len(payload):
+            return None, None, payload
+        return self.codec, self.dictionary_id, blob
+
+    def decompress(self, codec: Optional[str], dictionary_id: Optional[int], blob: bytes) -> bytes:
+        """Restore a payload stored with compress()."""
+        if codec is None:
+            return blob
+        dictionary = None
+        if dictionary_id is not None:
+            dictionary = self._dictionaries.get((codec, dictionary_id))
+            if dictionary is None:
+                raise ValueError(f"Unknown {codec} payload dictionary {dictionary_id}")
+        if codec == "zlib":
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            return decompressor.decompress(blob) + decompressor.flush()
+        if codec == "zstd":
+            if zstandard is None:
+                raise ValueError("Reading zstd payloads requires the zstandard package")
+            decompressor = self._zstd_decompressors.get(dictionary_id)
+            if decompressor is None:
+                dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+                decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+                self._zstd_decompressors[dictionary_id] = decompressor
+            return decompressor.decompress(blob)
+        raise ValueError(f"Unknown payload codec {codec!r}")
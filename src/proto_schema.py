@@ -0,0 +1,462 @@
+"""
+Protobuf Schema Module
+
+Parses .proto files into lightweight message descriptors and validates
+binary protobuf payloads against them directly on the wire format.
+
+Validation streams over the payload with a varint/length-delimited decoder:
+it checks wire types against declared field types, UTF-8 in string fields,
+nested messages (recursively) and presence of fields labelled 'required',
+without building Python objects for the decoded message.
+"""
+
+import logging
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ProtoParseError(ValueError):
+    """Raised when a .proto file cannot be parsed."""
+    pass
+
+
+class ProtoDecodeError(ValueError):
+    """Raised when a payload is not a valid encoding of the expected message."""
+    pass
+
+
+# Wire types
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH = 2
+WIRE_FIXED32 = 5
+
+_SCALAR_WIRE_TYPES = {
+    "int32": WIRE_VARINT, "int64": WIRE_VARINT,
+    "uint32": WIRE_VARINT, "uint64": WIRE_VARINT,
+    "sint32": WIRE_VARINT, "sint64": WIRE_VARINT,
+    "bool": WIRE_VARINT,
+    "fixed64": WIRE_FIXED64, "sfixed64": WIRE_FIXED64, "double": WIRE_FIXED64,
+    "fixed32": WIRE_FIXED32, "sfixed32": WIRE_FIXED32, "float": WIRE_FIXED32,
+    "string": WIRE_LENGTH, "bytes": WIRE_LENGTH,
+}
+
+# Same recursion limit as the reference protobuf implementations
+MAX_NESTING_DEPTH = 100
+
+_INT64_SIGN = 1 << 63
+
+
+@dataclass
+class ProtoField:
+    """A field of a protobuf message."""
+    name: str
+    number: int
+    type_name: str
+    label: Optional[str] = None  # 'repeated', 'required', 'optional' or None
+    # Resolved after parsing: 'scalar', 'message', 'enum' or 'unknown'
+    kind: str = "unknown"
+    message: Optional["ProtoMessage"] = None
+    enum: Optional["ProtoEnum"] = None
+
+    @property
+    def repeated(self) -> bool:
+        return self.label == "repeated"
+
+
+@dataclass
+class ProtoEnum:
+    """A protobuf enum."""
+    full_name: str
+    values: Set[int] = field(default_factory=set)
+    closed: bool = False  # proto2 enums reject unknown values
+
+
+@dataclass
+class ProtoMessage:
+    """A protobuf message descriptor."""
+    full_name: str
+    fields: Dict[int, ProtoField] = field(default_factory=dict)
+    required: Set[int] = field(default_factory=set)
+
+    @property
+    def name(self) -> str:
+        return self.full_name.rsplit(".", 1)[-1]
+
+
+@dataclass
+class ProtoFile:
+    """All messages and enums declared in one .proto file."""
+    syntax: str = "proto2"
+    package: str = ""
+    messages: Dict[str, ProtoMessage] = field(default_factory=dict)
+    enums: Dict[str, ProtoEnum] = field(default_factory=dict)
+    # Top-level messages in declaration order
+    top_level: List[str] = field(default_factory=list)
+
+    def find_message(self, name: str) -> Optional[ProtoMessage]:
+        """Look up a message by full or package-relative name."""
+        if name in self.messages:
+            return self.messages[name]
+        if self.package:
+            return self.messages.get(f"{self.package}.{name}")
+        return None
+
+
+_TOKEN_RE = re.compile(
+    r'"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|[A-Za-z_.][A-Za-z0-9_.]*|-?\d[\w.+-]*|[{}\[\]<>=;,()-]'
+)
+_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+
+
+class _Parser:
+    """Recursive-descent parser for the subset of .proto needed for validation."""
+
+    def __init__(self, text: str):
+        self.tokens = _TOKEN_RE.findall(_COMMENT_RE.sub(" ", text))
+        self.pos = 0
+        self.file = ProtoFile()
+        # (scope, field) pairs whose type is resolved after parsing
+        self._pending: List[Tuple[str, ProtoField]] = []
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ProtoParseError("Unexpected end of file")
+        self.pos += 1
+        return token
+
+    def _expect(self, expected: str):
+        token = self._next()
+        if token != expected:
+            raise ProtoParseError(f"Expected '{expected}', got '{token}'")
+
+    def _skip_statement(self):
+        """Skip to the end of the current statement or braced block."""
+        depth = 0
+        while True:
+            token = self._next()
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth -= 1
+                if depth == 0:
+                    return
+            elif token == ";" and depth == 0:
+                return
+
+    def _skip_field_options(self):
+        if self._peek() == "[":
+            depth = 0
+            while True:
+                token = self._next()
+                if token == "[":
+                    depth += 1
+                elif token == "]":
+                    depth -= 1
+                    if depth == 0:
+                        break
+
+    def parse(self) -> ProtoFile:
+        while self._peek() is not None:
+            token = self._next()
+            if token == "syntax":
+                self._expect("=")
+                self.file.syntax = self._next().strip("'\"")
+                self._expect(";")
+            elif token == "package":
+                self.file.package = self._next()
+                self._expect(";")
+            elif token == "message":
+                name = self._message(self.file.package)
+                self.file.top_level.append(name)
+            elif token == "enum":
+                self._enum(self.file.package)
+            elif token == ";":
+                continue
+            else:
+                # import, option, service, extend
+                self._skip_statement()
+        self._resolve()
+        return self.file
+
+    @staticmethod
+    def _qualify(scope: str, name: str) -> str:
+        return f"{scope}.{name}" if scope else name
+
+    def _message(self, scope: str) -> str:
+        full_name = self._qualify(scope, self._next())
+        message = ProtoMessage(full_name=full_name)
+        self.file.messages[full_name] = message
+        self._expect("{")
+        self._message_body(message, inside_oneof=False)
+        return full_name
+
+    def _message_body(self, message: ProtoMessage, inside_oneof: bool):
+        while True:
+            token = self._next()
+            if token == "}":
+                return
+            if token == ";":
+                continue
+            if token == "message":
+                self._message(message.full_name)
+            elif token == "enum":
+                self._enum(message.full_name)
+            elif token == "oneof":
+                self._next()  # oneof name
+                self._expect("{")
+                self._message_body(message, inside_oneof=True)
+            elif token == "map":
+                self._map_field(message)
+            elif token in ("option", "reserved", "extensions", "extend"):
+                self._skip_statement()
+            elif token == "group":
+                raise ProtoParseError(f"Groups are not supported ({message.full_name})")
+            else:
+                self._field(message, token, inside_oneof)
+
+    def _field(self, message: ProtoMessage, token: str, inside_oneof: bool):
+        label = None
+        if token in ("repeated", "required", "optional"):
+            label = token
+            token = self._next()
+            if token == "group":
+                raise ProtoParseError(f"Groups are not supported ({message.full_name})")
+        type_name = token
+        name = self._next()
+        self._expect("=")
+        number = int(self._next(), 0)
+        self._skip_field_options()
+        self._expect(";")
+        proto_field = ProtoField(name=name, number=number, type_name=type_name, label=label)
+        self._add_field(message, proto_field)
+
+    def _map_field(self, message: ProtoMessage):
+        self._expect("<")
+        key_type = self._next()
+        self._expect(",")
+        value_type = self._next()
+        self._expect(">")
+        name = self._next()
+        self._expect("=")
+        number = int(self._next(), 0)
+        self._skip_field_options()
+        self._expect(";")
+        # A map is encoded as a repeated entry message {key = 1; value = 2}
+        entry_name = f"{message.full_name}.{name.title().replace('_', '')}Entry"
+        entry = ProtoMessage(full_name=entry_name)
+        self.file.messages[entry_name] = entry
+        self._add_field(entry, ProtoField(name="key", number=1, type_name=key_type))
+        self._add_field(entry, ProtoField(name="value", number=2, type_name=value_type))
+        self._add_field(
+            message,
+            ProtoField(name=name, number=number, type_name=entry_name, label="repeated"),
+            scope="",
+        )
+
+    def _add_field(self, message: ProtoMessage, proto_field: ProtoField, scope: Optional[str] = None):
+        if proto_field.number in message.fields:
+            raise ProtoParseError(
+                f"Duplicate field number {proto_field.number} in {message.full_name}"
+            )
+        message.fields[proto_field.number] = proto_field
+        if proto_field.label == "required":
+            message.required.add(proto_field.number)
+        self._pending.append((message.full_name if scope is None else scope, proto_field))
+
+    def _enum(self, scope: str):
+        full_name = self._qualify(scope, self._next())
+        enum = ProtoEnum(full_name=full_name)
+        self.file.enums[full_name] = enum
+        self._expect("{")
+        while True:
+            token = self._next()
+            if token == "}":
+                break
+            if token == ";":
+                continue
+            if token in ("option", "reserved"):
+                self._skip_statement()
+                continue
+            self._expect("=")
+            enum.values.add(int(self._next(), 0))
+            self._skip_field_options()
+            self._expect(";")
+
+    def _resolve(self):
+        closed = self.file.syntax == "proto2"
+        for enum in self.file.enums.values():
+            enum.closed = closed
+
+        for scope, proto_field in self._pending:
+            type_name = proto_field.type_name
+            if type_name in _SCALAR_WIRE_TYPES:
+                proto_field.kind = "scalar"
+                continue
+            target = self._lookup(scope, type_name)
+            if target in self.file.messages:
+                proto_field.kind = "message"
+                proto_field.message = self.file.messages[target]
+            elif target in self.file.enums:
+                proto_field.kind = "enum"
+                proto_field.enum = self.file.enums[target]
+            else:
+                # Most likely an imported type; accept any encoding for it
+                _LOGGER.warning("Unresolved protobuf type '%s' in %s", type_name, scope)
+
+    def _lookup(self, scope: str, type_name: str) -> Optional[str]:
+        """Resolve a type reference using protobuf's innermost-scope-first rules."""
+        if type_name.startswith("."):
+            return type_name[1:]
+        known = self.file.messages.keys() | self.file.enums.keys()
+        parts = scope.split(".") if scope else []
+        while True:
+            candidate = ".".join(parts + [type_name])
+            if candidate in known:
+                return candidate
+            if not parts:
+                return None
+            parts.pop()
+
+
+def parse_proto(text: str) -> ProtoFile:
+    """Parse .proto source text into descriptors."""
+    return _Parser(text).parse()
+
+
+def load_proto_file(path: str) -> ProtoFile:
+    """Parse a .proto file into descriptors."""
+    return parse_proto(Path(path).read_text(encoding="utf-8"))
+
+
+def _read_varint(buf: bytes, pos: int, end: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= end:
+            raise ProtoDecodeError(f"Truncated varint at offset {pos}")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift >= 70:
+            raise ProtoDecodeError(f"Varint too long at offset {pos}")
+
+
+def _check_packed(buf: bytes, pos: int, end: int, wire_type: int, path: str):
+    """Check a packed repeated scalar field contains whole elements."""
+    if wire_type == WIRE_VARINT:
+        while pos < end:
+            _, pos = _read_varint(buf, pos, end)
+    else:
+        size = 8 if wire_type == WIRE_FIXED64 else 4
+        if (end - pos) % size:
+            raise ProtoDecodeError(f"Field '{path}' has a truncated packed value")
+
+
+class ProtoValidator:
+    """Validates binary payloads against one message type."""
+
+    def __init__(self, message: ProtoMessage):
+        self.message = message
+
+    def validate(self, payload: bytes) -> Tuple[bool, str]:
+        """Return (is_valid, reason) for a binary payload."""
+        try:
+            self._validate_message(self.message, payload, 0, len(payload), "", 0)
+            return True, ""
+        except ProtoDecodeError as exc:
+            return False, str(exc)
+
+    def _validate_message(
+        self, message: ProtoMessage, buf: bytes, pos: int, end: int, prefix: str, depth: int
+    ):
+        if depth > MAX_NESTING_DEPTH:
+            raise ProtoDecodeError("Message nesting too deep")
+        fields = message.fields
+        seen_required: Optional[Set[int]] = set() if message.required else None
+
+        while pos < end:
+            key, pos = _read_varint(buf, pos, end)
+            number = key >> 3
+            wire_type = key & 7
+            if number == 0:
+                raise ProtoDecodeError(f"Invalid field number 0 at offset {pos}")
+
+            start = pos
+            if wire_type == WIRE_VARINT:
+                value, pos = _read_varint(buf, pos, end)
+            elif wire_type == WIRE_LENGTH:
+                length, start = _read_varint(buf, pos, end)
+                pos = start + length
+            elif wire_type == WIRE_FIXED64:
+                pos += 8
+            elif wire_type == WIRE_FIXED32:
+                pos += 4
+            else:
+                raise ProtoDecodeError(f"Unsupported wire type {wire_type} at offset {start}")
+            if pos > end:
+                raise ProtoDecodeError(f"Truncated field {number} at offset {start}")
+
+            proto_field = fields.get(number)
+            if proto_field is None:
+                # Unknown fields are allowed by protobuf
+                continue
+            if seen_required is not None and number in message.required:
+                seen_required.add(number)
+            if proto_field.kind == "unknown":
+                continue
+
+            path = prefix + proto_field.name
+            if proto_field.kind == "message":
+                if wire_type != WIRE_LENGTH:
+                    raise ProtoDecodeError(
+                        f"Field '{path}' has wire type {wire_type}, expected {WIRE_LENGTH}"
+                    )
+                self._validate_message(
+                    proto_field.message, buf, start, pos, path + ".", depth + 1
+                )
+                continue
+
+            expected = (
+                WIRE_VARINT if proto_field.kind == "enum"
+                else _SCALAR_WIRE_TYPES[proto_field.type_name]
+            )
+            if wire_type != expected:
+                # Repeated numeric fields may be packed into one length-delimited record
+                if wire_type == WIRE_LENGTH and proto_field.repeated and expected != WIRE_LENGTH:
+                    _check_packed(buf, start, pos, expected, path)
+                    continue
+                raise ProtoDecodeError(
+                    f"Field '{path}' has wire type {wire_type}, expected {expected}"
+                )
+            if proto_field.type_name == "string":
+                try:
+                    str(buf[start:pos], "utf-8")
+                except UnicodeDecodeError:
+                    raise ProtoDecodeError(f"Field '{path}' is not valid UTF-8") from None
+            elif proto_field.kind == "enum" and proto_field.enum.closed:
+                # Enum values are int32, sign-extended to 64 bits on the wire
+                if value >= _INT64_SIGN:
+                    value -= 1 << 64
+                if value not in proto_field.enum.values:
+                    raise ProtoDecodeError(f"Field '{path}' has unknown enum value {value}")
+
+        if pos != end:
+            raise ProtoDecodeError(f"Truncated message {message.full_name}")
+        if seen_required is not None and len(seen_required) != len(message.required):
+            missing = sorted(
+                prefix + message.fields[n].name for n in message.required - seen_required
+            )
+            raise ProtoDecodeError(f"Missing required fields: {', '.join(missing)}")
@@ -0,0 +1,195 @@
+"""
+Publisher Pool Module
+
+Spreads forwarded messages over several upstream MQTT connections. Each
+topic is pinned to one connection by hash, so a topic's messages reach the
+broker in the order they were published. The proxy keeps that order from
+receipt on by sharding its ingest workers by topic hash as well.
+Every connection has a bounded inflight window. publish() waits for a
+free slot. Slots are released when the broker's PUBACK arrives on the paho
+network thread and is handed back to the event loop. A dropped connection
+keeps its slots: paho resends the unacknowledged messages on reconnect.
+"""
+
+import asyncio
+import logging
+import time
+import zlib
+from typing import Callable, Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+
+from metrics_exporter import MetricsExporter
+
+
+class _PublisherConnection:
+    """One upstream client and its inflight window."""
+
+    def __init__(self, index: int, client: mqtt.Client, max_inflight: int):
+        self.index = index
+        self.label = str(index)
+        self.client = client
+        self.window = asyncio.Semaphore(max_inflight)
+        # mid -> time the message was handed to paho
+        self.inflight: Dict[int, float] = {}
+
+
+class PublisherPool:
+    """Pool of upstream publisher connections with topic-hash affinity."""
+
+    def __init__(
+        self,
+        client_factory: Callable[[str], mqtt.Client],
+        client_id: str,
+        size: int = 1,
+        max_inflight: int = 100,
+        metrics_exporter: Optional[MetricsExporter] = None
+    ):
+        """
+        Args:
+            client_factory: Builds a configured (TLS, auth, callbacks) client
+                for a client id
+            client_id: Client id; connections get a '-<n>' suffix when size > 1
+            size: Number of upstream connections
+            max_inflight: Unacknowledged QoS 1/2 messages allowed per connection
+            metrics_exporter: Receives inflight, publish latency and PUBACK RTT
+        """
+        self.size = max(1, size)
+        self.max_inflight = max(1, max_inflight)
+        self.metrics_exporter = metrics_exporter
+        self.logger = logging.getLogger(__name__)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._connections: List[_PublisherConnection] = []
+        for index in range(self.size):
+            conn_client_id = client_id if self.size == 1 else f"{client_id}-{index}"
+            client = client_factory(conn_client_id)
+            client.max_inflight_messages_set(self.max_inflight)
+            connection = _PublisherConnection(index, client, self.max_inflight)
+            self._install_callbacks(connection)
+            self._connections.append(connection)
+
+    def _install_callbacks(self, connection: _PublisherConnection):
+        client = connection.client
+        user_on_disconnect = client.on_disconnect
+
+        def on_publish(client, userdata, mid):
+            loop = self._loop
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self._on_ack, connection, mid)
+
+        # MQTTv5 clients pass an extra properties argument
+        def on_disconnect(client, userdata, rc, *properties):
+            loop = self._loop
+            if loop is not None and not loop.is_closed():
+                loop.call_soon_threadsafe(self._on_connection_lost, connection)
+            if user_on_disconnect is not None:
+                user_on_disconnect(client, userdata, rc, *properties)
+
+        client.on_publish = on_publish
+        client.on_disconnect = on_disconnect
+
+    def connect(self, host: str, port: int, keepalive: int, **options):
+        """Start every connection's network loop and connect it."""
+        self._loop = asyncio.get_running_loop()
+        for connection in self._connections:
+            connection.client.loop_start()
+            result = connection.client.connect(host, port, keepalive, **options)
+            if result != mqtt.MQTT_ERR_SUCCESS:
+                raise ConnectionError(
+                    f"Failed to connect publisher {connection.label}: {mqtt.error_string(result)}"
+                )
+
+    def is_connected(self) -> bool:
+        return all(connection.client.is_connected() for connection in self._connections)
+
+    def disconnect(self):
+        """Disconnect every connection and stop its network loop."""
+        for connection in self._connections:
+            connection.client.disconnect()
+            connection.client.loop_stop()
+            # A stopped client never resends its unacknowledged messages
+            self._release_inflight(connection)
+        self._loop = None
+
+    def connection_for(self, topic: str) -> _PublisherConnection:
+        """Connection a topic is pinned to."""
+        if self.size == 1:
+            return self._connections[0]
+        return self._connections[zlib.crc32(topic.encode("utf-8")) % self.size]
+
+    async def publish(self, topic: str, payload: bytes, qos: int = 1) -> int:
+        """
+        Publish on the topic's connection once its inflight window has room.
+
+        Returns the paho result code. Completion (PUBACK) is tracked in the
+        background; the window slot is freed when it arrives.
+        """
+        connection = self.connection_for(topic)
+        start = time.monotonic()
+        if qos:
+            await connection.window.acquire()
+
+        # No await between publish() and recording the mid: the PUBACK
+        # callback is scheduled on this loop and cannot run in between
+        info = connection.client.publish(topic, payload, qos=qos)
+        sent_at = time.monotonic()
+        if qos:
+            if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                connection.inflight[info.mid] = sent_at
+                self._report_inflight(connection)
+            else:
+                connection.window.release()
+
+        if self.metrics_exporter:
+            self.metrics_exporter.record_publish_latency(connection.label, sent_at - start)
+        return info.rc
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Wait until every connection's inflight messages are acknowledged.
+
+        Returns False if some are still unacknowledged after the timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while any(connection.inflight for connection in self._connections):
+            if time.monotonic() > deadline:
+                pending = sum(len(connection.inflight) for connection in self._connections)
+                self.logger.warning(f"{pending} published messages still unacknowledged")
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    def _on_ack(self, connection: _PublisherConnection, mid: int):
+        sent_at = connection.inflight.pop(mid, None)
+        if sent_at is None:
+            return
+        connection.window.release()
+        self._report_inflight(connection)
+        if self.metrics_exporter:
+            self.metrics_exporter.record_puback_rtt(connection.label, time.monotonic() - sent_at)
+
+    def _on_connection_lost(self, connection: _PublisherConnection):
+        """
+        Keep the window of a dropped connection held.
+
+        Paho keeps unacknowledged messages and resends them once it has
+        reconnected, so their slots are freed by the PUBACKs that follow.
+        """
+        if connection.inflight:
+            self.logger.warning(
+                f"Publisher {connection.label} disconnected with "
+                f"{len(connection.inflight)} unacknowledged messages; "
+                f"they are resent on reconnect"
+            )
+
+    def _release_inflight(self, connection: _PublisherConnection):
+        """Free every slot of a connection whose client is stopped."""
+        for _ in range(len(connection.inflight)):
+            connection.window.release()
+        connection.inflight.clear()
+        self._report_inflight(connection)
+
+    def _report_inflight(self, connection: _PublisherConnection):
+        if self.metrics_exporter:
+            self.metrics_exporter.set_publisher_inflight(connection.label, len(connection.inflight))
@@ -0,0 +1,185 @@
+"""
+Quarantine Partitions Module
+
+Time partitioning for the quarantine database. Every period (a day or an
+hour) gets its own pair of tables, quarantined_messages_<key> and
+quarantine_payloads_<key>, registered in quarantine_partitions with the
+period's bounds. Queries visit only the partitions that overlap their date
+range, and retention drops whole partitions instead of deleting rows.
+
+Message ids carry their partition key ("<key>:<content hash>"), so updates
+by id go straight to the right tables.
+
+Statistics are kept as running totals in quarantine_counters, updated in
+the same transactions as the messages they count.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+
+SUPPORTED_PARTITION_PERIODS = {"day", "hour"}
+
+_KEY_FORMATS = {"day": "%Y%m%d", "hour": "%Y%m%d%H"}
+_PERIOD_LENGTHS = {"day": timedelta(days=1), "hour": timedelta(hours=1)}
+
+# Separates the partition key from the content hash in message ids
+ID_SEPARATOR = ":"
+
+CREATE_PARTITION_REGISTRY = '''
+    CREATE TABLE IF NOT EXISTS quarantine_partitions (
+        key TEXT PRIMARY KEY,
+        start_at TIMESTAMP NOT NULL,
+        end_at TIMESTAMP NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Running totals: scalar counters have an empty key; 'reason', 'topic' and
+# 'hour' (last seen, "YYYY-MM-DDTHH") are counted per key
+CREATE_COUNTERS = '''
+    CREATE TABLE IF NOT EXISTS quarantine_counters (
+        scope TEXT NOT NULL,
+        key TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL,
+        PRIMARY KEY (scope, key)
+    )
+'''
+
+
+# Adds to a counter: (scope, key, delta)
+UPSERT_COUNTER = '''
+    INSERT INTO quarantine_counters (scope, key, value) VALUES (?, ?, ?)
+    ON CONFLICT(scope, key) DO UPDATE SET value = value + excluded.value
+'''
+
+
+@dataclass(frozen=True)
+class Partition:
+    """One period's message and payload tables."""
+    key: str
+    start: datetime
+    end: datetime
+
+    @property
+    def messages_table(self) -> str:
+        return f"quarantined_messages_{self.key}"
+
+    @property
+    def payloads_table(self) -> str:
+        return f"quarantine_payloads_{self.key}"
+
+    def ddl(self) -> List[str]:
+        """Statements that create this partition's tables and indexes."""
+        messages, payloads, key = self.messages_table, self.payloads_table, self.key
+        return [
+            # codec and dictionary_id are NULL for payloads stored uncompressed
+            f'''
+            CREATE TABLE IF NOT EXISTS {payloads} (
+                hash TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                codec TEXT NULL,
+                dictionary_id INTEGER NULL
+            )
+            ''',
+            # received_at is the first occurrence, last_seen_at the latest;
+            # compressed_size is the stored blob size
+            f'''
+            CREATE TABLE IF NOT EXISTS {messages} (
+                id TEXT PRIMARY KEY,
+                received_at TIMESTAMP NOT NULL,
+                last_seen_at TIMESTAMP NOT NULL,
+                topic TEXT NOT NULL,
+                payload_hash TEXT NOT NULL,
+                reason TEXT NOT NULL,
+                retry_count INTEGER DEFAULT 0,
+                processed BOOLEAN DEFAULT FALSE,
+                processed_at TIMESTAMP NULL,
+                metadata TEXT NULL,
+                payload_size INTEGER NOT NULL,
+                compressed_size INTEGER NULL,
+                occurrence_count INTEGER NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''',
+            # (received_at, id) is the keyset order of QuarantineStore.iter_messages
+            f'CREATE INDEX IF NOT EXISTS idx_{key}_received_at ON {messages}(received_at, id)',
+            f'CREATE INDEX IF NOT EXISTS idx_{key}_topic ON {messages}(topic)',
+            f'CREATE INDEX IF NOT EXISTS idx_{key}_processed ON {messages}(processed)',
+            f'CREATE INDEX IF NOT EXISTS idx_{key}_retry_count ON {messages}(retry_count)',
+        ]
+    
+    def counter_ddl(self, sign: int = 1) -> List[str]:
+        """
+        Statements that add (sign 1) or remove (sign -1) this partition's
+        totals in quarantine_counters, for rebuilding the counters or
+        dropping the partition. Hour buckets are not removed: they age out.
+        """
+        messages, payloads = self.messages_table, self.payloads_table
+        upsert = "ON CONFLICT(scope, key) DO UPDATE SET value = value + excluded.value"
+        # "WHERE true" keeps the ON CONFLICT from parsing as a join constraint
+        statements = [
+            f'''
+            INSERT INTO quarantine_counters (scope, key, value)
+            SELECT 'total', '', {sign} * COALESCE(SUM(occurrence_count), 0) FROM {messages} WHERE true
+            UNION ALL SELECT 'processed', '', {sign} * COALESCE(SUM(processed = TRUE), 0) FROM {messages} WHERE true
+            UNION ALL SELECT 'unprocessed', '', {sign} * COALESCE(SUM(processed = FALSE), 0) FROM {messages} WHERE true
+            UNION ALL SELECT 'payload_bytes', '', {sign} * COALESCE(SUM(payload_size), 0) FROM {messages} WHERE true
+            UNION ALL SELECT 'compressed_payload_bytes', '',
+                {sign} * COALESCE(SUM(COALESCE(compressed_size, payload_size)), 0) FROM {messages} WHERE true
+            UNION ALL SELECT 'stored_payloads', '', {sign} * COUNT(*) FROM {payloads} WHERE true
+            UNION ALL SELECT 'stored_payload_bytes', '', {sign} * COALESCE(SUM(LENGTH(payload)), 0) FROM {payloads} WHERE true
+            {upsert}
+            ''',
+            f'''
+            INSERT INTO quarantine_counters (scope, key, value)
+            SELECT 'reason', reason, {sign} * SUM(occurrence_count) FROM {messages} WHERE true GROUP BY reason
+            {upsert}
+            ''',
+            f'''
+            INSERT INTO quarantine_counters (scope, key, value)
+            SELECT 'topic', topic, {sign} * SUM(occurrence_count) FROM {messages} WHERE true GROUP BY topic
+            {upsert}
+            ''',
+        ]
+        if sign > 0:
+            statements.append(f'''
+            INSERT INTO quarantine_counters (scope, key, value)
+            SELECT 'hour', SUBSTR(last_seen_at, 1, 13), SUM(occurrence_count)
+            FROM {messages} WHERE true GROUP BY SUBSTR(last_seen_at, 1, 13)
+            {upsert}
+            ''')
+        return statements
+
+    def drop_ddl(self) -> List[str]:
+        """Statements that drop this partition's tables (and with them their indexes)."""
+        return [
+            f'DROP TABLE IF EXISTS {self.messages_table}',
+            f'DROP TABLE IF EXISTS {self.payloads_table}',
+        ]
+
+
+def partition_for(timestamp: datetime, period: str) -> Partition:
+    """Partition of the given period length that contains a timestamp."""
+    if period == "day":
+        start = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        start = timestamp.replace(minute=0, second=0, microsecond=0)
+    return Partition(start.strftime(_KEY_FORMATS[period]), start, start + _PERIOD_LENGTHS[period])
+
+
+def partition_from_row(key: str, start_at: str, end_at: str) -> Partition:
+    """Partition from a quarantine_partitions row."""
+    # Keys become table names; never trust anything but digits
+    if not key.isdigit():
+        raise ValueError(f"Invalid quarantine partition key {key!r}")
+    return Partition(key, datetime.fromisoformat(start_at), datetime.fromisoformat(end_at))
+
+
+def partition_key_of(message_id: str) -> Optional[str]:
+    """Partition key of a message id, or None for ids from before partitioning."""
+    key, separator, _ = message_id.partition(ID_SEPARATOR)
+    if separator and key.isdigit():
+        return key
+    return None
@@ -3,20 +3,138 @@ Quarantine Store Module
 
 This module handles storage and management of rejected MQTT messages.
 Messages that fail validation are stored for later analysis and potential replay.
+
+Storage is content-addressed. A payload blob is stored once per content
+hash (utils.generate_unique_id of topic and payload) in a payloads table.
+Each messages row is an occurrence of that content: it records when the
+content was first and last seen and how many times it arrived. Repeats of a
+payload that is already quarantined only bump the count.
+
+Both tables are partitioned by time (see quarantine_partitions): each day
+or hour has its own pair, queries visit only the partitions in their date
+range and retention drops expired partitions whole. Statistics are read
+from running totals that every write updates in its own transaction.
+
+Blobs can be compressed with zlib or zstd (see payload_codec), optionally
+with a dictionary trained from this database's own payloads. Reads
+decompress transparently.
+
+Large reads go through iter_messages(), an async generator that pages with
+keyset pagination on (received_at, id) and can resume from a cursor token.
+Replay runs checkpoint their cursor and stats in quarantine_replay_runs, in
+the same transaction as the message updates of each batch.
 """
 
+import base64
 import json
 import sqlite3
 import time
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import cached_property
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import logging
 import asyncio
 from dataclasses import dataclass, asdict
 import aiosqlite
 
+from metrics_exporter import MetricsExporter
+from payload_codec import PayloadCodec
+from quarantine_partitions import (
+    CREATE_COUNTERS,
+    CREATE_PARTITION_REGISTRY,
+    ID_SEPARATOR,
+    UPSERT_COUNTER,
+    Partition,
+    partition_for,
+    partition_from_row,
+    partition_key_of,
+)
+from segment_log import SegmentLog, encode_record
+from utils import generate_unique_id
+
+
+# Compression dictionaries; the newest one per codec is used for new blobs
+_CREATE_DICTIONARIES = '''
+    CREATE TABLE IF NOT EXISTS quarantine_dictionaries (
+        id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        dictionary BLOB NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# filters are the replay's selection (JSON), cursor the position after the
+# last committed batch and stats its running totals (JSON)
+_CREATE_REPLAY_RUNS = '''
+    CREATE TABLE IF NOT EXISTS quarantine_replay_runs (
+        id TEXT PRIMARY KEY,
+        status TEXT NOT NULL,
+        filters TEXT NOT NULL,
+        cursor TEXT NULL,
+        stats TEXT NOT NULL,
+        started_at TIMESTAMP NOT NULL,
+        updated_at TIMESTAMP NOT NULL,
+        finished_at TIMESTAMP NULL
+    )
+'''
+
+# Replay runs in this state are finished and cannot be resumed
+REPLAY_COMPLETED = "completed"
+
+# Occurrences joined with their payload blob
+_SELECT_MESSAGES = '''
+    SELECT m.*, p.payload, p.codec, p.dictionary_id FROM {messages} m
+    JOIN {payloads} p ON p.hash = m.payload_hash
+'''
+
+# Positions in a buffered occurrence row (a list, so repeats update it in
+# place); the payload and partition are not columns of the messages table
+(
+    _ROW_ID, _ROW_LAST_SEEN, _ROW_TOPIC, _ROW_HASH, _ROW_REASON,
+    _ROW_SIZE, _ROW_COUNT, _ROW_PAYLOAD, _ROW_PARTITION
+) = (0, 2, 3, 4, 5, 6, 8, 9, 10)
+
+# Counter deltas of a transaction: (scope, key) -> delta
+_Counters = Dict[Tuple[str, str], int]
+
+
+def _count(counters: _Counters, scope: str, value: int, key: str = ''):
+    counters[(scope, key)] = counters.get((scope, key), 0) + value
+
+
+# Ids bound per "id IN (...)" statement, well under SQLite's variable limit
+_ID_CHUNK = 500
+
+
+def _chunks(items: List[str], size: int = _ID_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _select_messages(partition: Partition) -> str:
+    return _SELECT_MESSAGES.format(
+        messages=partition.messages_table, payloads=partition.payloads_table
+    )
+
+
+def _encode_cursor(received_at: str, message_id: str, descending: bool) -> str:
+    """Opaque token for the position after a message."""
+    token = json.dumps([received_at, message_id, descending], separators=(',', ':'))
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor: str, descending: bool) -> Tuple[str, str]:
+    """(received_at, id) position from a cursor token."""
+    try:
+        received_at, message_id, token_descending = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid quarantine cursor: {cursor!r}") from e
+    if token_descending != descending:
+        raise ValueError("Quarantine cursor was created for the opposite sort order")
+    return received_at, message_id
+
 
 @dataclass
 class QuarantinedMessage:
@@ -30,14 +148,101 @@ class QuarantinedMessage:
     processed: bool = False
     processed_at: Optional[datetime] = None
     metadata: Optional[Dict[str, Any]] = None
+    # Times this payload arrived on this topic, and when it last did
+    occurrence_count: int = 1
+    last_seen_at: Optional[datetime] = None
+
+
+@dataclass
+class ReplayRun:
+    """Checkpoint of a replay run."""
+    id: str
+    status: str
+    filters: Dict[str, Any]
+    cursor: Optional[str]
+    stats: Dict[str, int]
+    started_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class QuarantineRecord:
+    """
+    A quarantined message streamed by QuarantineStore.iter_messages().
+    
+    Payload and metadata are decoded on first access, so filtering on topic,
+    reason or counts never decompresses or parses them. cursor resumes the
+    iteration after this message.
+    """
+    
+    def __init__(self, row: aiosqlite.Row, codec: PayloadCodec, descending: bool = False):
+        self._row = row
+        self._codec = codec
+        self.id: str = row['id']
+        self.topic: str = row['topic']
+        self.reason: str = row['reason']
+        self.retry_count: int = row['retry_count']
+        self.processed: bool = bool(row['processed'])
+        self.occurrence_count: int = row['occurrence_count']
+        self.payload_size: int = row['payload_size']
+        self.cursor = _encode_cursor(row['received_at'], self.id, descending)
+    
+    @cached_property
+    def received_at(self) -> datetime:
+        return datetime.fromisoformat(self._row['received_at'])
+    
+    @cached_property
+    def last_seen_at(self) -> datetime:
+        return datetime.fromisoformat(self._row['last_seen_at'])
+    
+    @cached_property
+    def processed_at(self) -> Optional[datetime]:
+        processed_at = self._row['processed_at']
+        return datetime.fromisoformat(processed_at) if processed_at else None
+    
+    @cached_property
+    def payload(self) -> bytes:
+        row = self._row
+        return self._codec.decompress(row['codec'], row['dictionary_id'], row['payload'])
+    
+    @cached_property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return json.loads(self._row['metadata']) if self._row['metadata'] else None
+    
+    def to_message(self) -> QuarantinedMessage:
+        return QuarantinedMessage(
+            id=self.id,
+            received_at=self.received_at,
+            topic=self.topic,
+            payload=self.payload,
+            reason=self.reason,
+            retry_count=self.retry_count,
+            processed=self.processed,
+            processed_at=self.processed_at,
+            metadata=self.metadata,
+            occurrence_count=self.occurrence_count,
+            last_seen_at=self.last_seen_at
+        )
 
 
 class QuarantineStore:
     """
     Manages storage of quarantined MQTT messages.
     
-    Uses SQLite for structured storage and optionally writes individual
-    files to a quarantine directory for backup and analysis.
+    Uses SQLite for structured storage and optionally appends every stored
+    occurrence to a segment log in the quarantine directory for backup and
+    analysis.
+    
+    A single long-lived connection in WAL mode is shared by all operations.
+    Inserts go through a write-behind buffer that is flushed with one
+    executemany() transaction every flush_interval_ms or flush_batch_size
+    rows, whichever comes first. Reads and updates flush the buffer first,
+    and close() performs a final durable flush.
+    
+    Message ids are "<partition key>:<content hash>", so a payload that is
+    resent while it is quarantined is merged into its buffered or stored
+    occurrence for the current period instead of being written again. A
+    repeat of a processed message reopens it.
     """
     
     def __init__(
@@ -45,18 +250,73 @@ class QuarantineStore:
         db_path: str = "quarantine.sqlite3",
         quarantine_dir: str = "quarantine",
         write_files: bool = True,
-        max_payload_size: int = 1024 * 1024  # 1MB
+        max_payload_size: int = 1024 * 1024,  # 1MB
+        flush_interval_ms: int = 50,
+        flush_batch_size: int = 500,
+        max_buffered_rows: int = 10000,
+        compression: Optional[str] = None,
+        compression_level: Optional[int] = None,
+        compression_dictionary_samples: int = 1000,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        segment_max_age_s: float = 3600.0,
+        segment_fsync: str = "segment",
+        partition_period: str = "day",
+        metrics_exporter: Optional[MetricsExporter] = None
     ):
+        """
+        Args:
+            write_files: Append stored messages to a segment log in
+                quarantine_dir
+            segment_max_bytes: Log segment size that triggers a rollover
+            segment_max_age_s: Log segment age that triggers a rollover
+            segment_fsync: 'batch', 'segment' or 'never'; see SegmentLog
+            compression: 'zlib' or 'zstd' to compress stored payloads, None to
+                store them as-is
+            compression_level: Codec compression level; None for its default
+            compression_dictionary_samples: Distinct payloads collected before
+                a compression dictionary is trained; 0 disables dictionaries
+            partition_period: 'day' or 'hour'; the period each partition covers
+        """
         self.db_path = db_path
         self.quarantine_dir = Path(quarantine_dir)
         self.write_files = write_files
         self.max_payload_size = max_payload_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch_size = flush_batch_size
+        self.max_buffered_rows = max_buffered_rows
+        self.partition_period = partition_period
+        self.metrics_exporter = metrics_exporter
         
         self.logger = logging.getLogger(__name__)
         
-        # Create quarantine directory if needed
+        # Also decodes blobs written under an earlier compression setting
+        self._codec = PayloadCodec(
+            compression,
+            level=compression_level,
+            dictionary_samples=compression_dictionary_samples
+        )
+        
+        # Persistent connection and write-behind buffer (created on first use)
+        self._db: Optional[aiosqlite.Connection] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        # message id -> buffered occurrence row, in arrival order
+        self._pending: Dict[str, List] = {}
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._closed = False
+        # Partitions this store has created or seen, by key
+        self._partitions: Dict[str, Partition] = {}
+        
+        # Backup log, written from the flush (creates the directory)
+        self._segment_log: Optional[SegmentLog] = None
         if self.write_files:
-            self.quarantine_dir.mkdir(exist_ok=True)
+            self._segment_log = SegmentLog(
+                str(self.quarantine_dir),
+                max_bytes=segment_max_bytes,
+                max_age_seconds=segment_max_age_s,
+                fsync=segment_fsync
+            )
         
         # Initialize database
         self._init_db()
@@ -67,42 +327,31 @@ class QuarantineStore:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS quarantined_messages (
-                    id TEXT PRIMARY KEY,
-                    received_at TIMESTAMP NOT NULL,
-                    topic TEXT NOT NULL,
-                    payload BLOB NOT NULL,
-                    reason TEXT NOT NULL,
-                    retry_count INTEGER DEFAULT 0,
-                    processed BOOLEAN DEFAULT FALSE,
-                    processed_at TIMESTAMP NULL,
-                    metadata TEXT NULL,
-                    payload_size INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # WAL lets readers proceed while the write-behind buffer is flushed;
+            # the journal mode is persistent in the database file
+            cursor.execute('PRAGMA journal_mode=WAL')
             
-            # Create indexes for better query performance
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_received_at 
-                ON quarantined_messages(received_at)
-            ''')
+            cursor.execute(CREATE_PARTITION_REGISTRY)
+            cursor.execute(_CREATE_DICTIONARIES)
+            cursor.execute(_CREATE_REPLAY_RUNS)
             
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_topic 
-                ON quarantined_messages(topic)
-            ''')
+            rebuild_counters = not self._table_columns(cursor, 'quarantine_counters')
+            cursor.execute(CREATE_COUNTERS)
             
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_processed 
-                ON quarantined_messages(processed)
-            ''')
+            # Databases from before partitioning have a single table pair
+            if self._table_columns(cursor, 'quarantined_messages'):
+                self._migrate_unpartitioned(conn)
+                rebuild_counters = True
             
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_retry_count 
-                ON quarantined_messages(retry_count)
-            ''')
+            if rebuild_counters:
+                cursor.execute('DELETE FROM quarantine_counters')
+                for row in cursor.execute('SELECT key, start_at, end_at FROM quarantine_partitions').fetchall():
+                    for statement in partition_from_row(*row).counter_ddl():
+                        cursor.execute(statement)
+            
+            # Older dictionaries stay readable; the newest becomes current
+            for row in cursor.execute('SELECT id, codec, dictionary FROM quarantine_dictionaries ORDER BY id'):
+                self._codec.install_dictionary(row[1], row[0], row[2])
             
             conn.commit()
             conn.close()
@@ -113,6 +362,334 @@ class QuarantineStore:
             self.logger.error(f"Failed to initialize quarantine database: {e}")
             raise
     
+    @staticmethod
+    def _table_columns(cursor: sqlite3.Cursor, table: str) -> set:
+        return {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+    
+    def _migrate_unpartitioned(self, conn: sqlite3.Connection):
+        """Move rows from the single-table layouts into time partitions."""
+        self.logger.info(f"Migrating quarantine database to time partitions: {self.db_path}")
+        cursor = conn.cursor()
+        columns = self._table_columns(cursor, 'quarantined_messages')
+        if 'payload_hash' in columns:
+            payload_columns = self._table_columns(cursor, 'quarantine_payloads')
+            compressed = 'codec' in payload_columns
+            old_rows = conn.execute(f'''
+                SELECT m.id, m.received_at, m.last_seen_at, m.topic, m.payload_hash, m.reason,
+                       m.retry_count, m.processed, m.processed_at, m.metadata, m.payload_size,
+                       {'m.compressed_size' if 'compressed_size' in columns else 'NULL'},
+                       m.occurrence_count, m.created_at, p.payload,
+                       {'p.codec, p.dictionary_id' if compressed else 'NULL, NULL'}
+                FROM quarantined_messages m
+                JOIN quarantine_payloads p ON p.hash = m.payload_hash
+            ''')
+        else:
+            # Payloads inline, one row per message
+            old_rows = conn.execute('''
+                SELECT id, received_at, received_at, topic, NULL, reason,
+                       retry_count, processed, processed_at, metadata, payload_size,
+                       NULL, 1, created_at, payload, NULL, NULL
+                FROM quarantined_messages
+            ''')
+        
+        # Old rows keep their ids; identical payloads share one blob per partition
+        created = set()
+        for row in old_rows:
+            partition = partition_for(datetime.fromisoformat(row[1]), self.partition_period)
+            if partition.key not in created:
+                for statement in partition.ddl():
+                    cursor.execute(statement)
+                cursor.execute(
+                    'INSERT OR IGNORE INTO quarantine_partitions (key, start_at, end_at) VALUES (?, ?, ?)',
+                    (partition.key, partition.start.isoformat(), partition.end.isoformat())
+                )
+                created.add(partition.key)
+            payload_hash = row[4] or generate_unique_id(row[3], row[14])
+            cursor.execute(
+                f'INSERT OR IGNORE INTO {partition.payloads_table} '
+                '(hash, payload, codec, dictionary_id) VALUES (?, ?, ?, ?)',
+                (payload_hash, row[14], row[15], row[16])
+            )
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO {partition.messages_table}
+                (id, received_at, last_seen_at, topic, payload_hash, reason, retry_count,
+                 processed, processed_at, metadata, payload_size, compressed_size,
+                 occurrence_count, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (*row[:4], payload_hash, *row[5:14]))
+        cursor.execute('DROP TABLE quarantined_messages')
+        cursor.execute('DROP TABLE IF EXISTS quarantine_payloads')
+    
+    async def _get_db(self) -> aiosqlite.Connection:
+        """Return the shared connection, opening it on first use."""
+        if self._db is not None:
+            return self._db
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._db is None:
+                db = await aiosqlite.connect(self.db_path)
+                db.row_factory = aiosqlite.Row
+                await db.execute('PRAGMA journal_mode=WAL')
+                await db.execute('PRAGMA synchronous=NORMAL')
+                self._write_lock = asyncio.Lock()
+                self._db = db
+                self.logger.debug(f"Opened quarantine database connection: {self.db_path}")
+        return self._db
+    
+    async def _ensure_partition(self, db: aiosqlite.Connection, partition: Partition):
+        """Create a partition's tables and register it, once per store."""
+        if partition.key in self._partitions:
+            return
+        for statement in partition.ddl():
+            await db.execute(statement)
+        await db.execute(
+            'INSERT OR IGNORE INTO quarantine_partitions (key, start_at, end_at) VALUES (?, ?, ?)',
+            (partition.key, partition.start.isoformat(), partition.end.isoformat())
+        )
+        self._partitions[partition.key] = partition
+    
+    async def _list_partitions(
+        self,
+        db: aiosqlite.Connection,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> List[Partition]:
+        """Registered partitions overlapping [start, end], oldest first."""
+        query = 'SELECT key, start_at, end_at FROM quarantine_partitions WHERE 1=1'
+        params = []
+        if start:
+            query += ' AND end_at > ?'
+            params.append(start.isoformat())
+        if end:
+            query += ' AND start_at <= ?'
+            params.append(end.isoformat())
+        query += ' ORDER BY start_at ASC, key ASC'
+        cursor = await db.execute(query, params)
+        return [partition_from_row(*row) for row in await cursor.fetchall()]
+    
+    async def _partitions_for_ids(
+        self, db: aiosqlite.Connection, message_ids: List[str]
+    ) -> List[Tuple[Partition, List[str]]]:
+        """Message ids grouped by partition; ids from before partitioning go to every partition."""
+        by_key: Dict[Optional[str], List[str]] = {}
+        for message_id in dict.fromkeys(message_ids):
+            by_key.setdefault(partition_key_of(message_id), []).append(message_id)
+        if not by_key:
+            return []
+        
+        partitions = {partition.key: partition for partition in await self._list_partitions(db)}
+        groups: List[Tuple[Partition, List[str]]] = []
+        for key, ids in by_key.items():
+            if key is None:
+                groups.extend((partition, ids) for partition in partitions.values())
+            elif key in partitions:
+                groups.append((partitions[key], ids))
+        return groups
+    
+    def _ensure_flusher(self):
+        """Start the background flush task on first insert."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_wakeup = asyncio.Event()
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def _flush_loop(self):
+        """Flush buffered inserts every flush_interval or when a batch is full."""
+        while not self._closed:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                self.logger.error(f"Failed to flush quarantined messages: {e}")
+    
+    async def flush(self):
+        """Write all buffered inserts in a single transaction."""
+        if not self._pending:
+            return
+        db = await self._get_db()
+        async with self._write_lock:
+            rows, self._pending = list(self._pending.values()), {}
+            if not rows:
+                return
+            start = time.perf_counter()
+            try:
+                if self._codec.ready_to_train():
+                    await self._train_dictionary(db)
+                # Compression runs off the event loop
+                encoded = await asyncio.to_thread(
+                    lambda: [self._codec.compress(row[_ROW_PAYLOAD]) for row in rows]
+                )
+                by_partition: Dict[Partition, List[Tuple[List, Tuple]]] = {}
+                for row, encoding in zip(rows, encoded):
+                    by_partition.setdefault(row[_ROW_PARTITION], []).append((row, encoding))
+                
+                counters: _Counters = {}
+                for partition, group in by_partition.items():
+                    await self._ensure_partition(db, partition)
+                    await self._count_inserts(db, partition, group, counters)
+                    # Blobs already stored for this hash are left untouched
+                    await db.executemany(f'''
+                        INSERT OR IGNORE INTO {partition.payloads_table}
+                        (hash, payload, codec, dictionary_id)
+                        VALUES (?, ?, ?, ?)
+                    ''', [
+                        (row[_ROW_HASH], blob, codec, dictionary_id)
+                        for row, (codec, dictionary_id, blob) in group
+                    ])
+                    await db.executemany(f'''
+                        INSERT INTO {partition.messages_table} 
+                        (id, received_at, last_seen_at, topic, payload_hash, reason,
+                         payload_size, metadata, occurrence_count, compressed_size)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET
+                            occurrence_count = occurrence_count + excluded.occurrence_count,
+                            last_seen_at = excluded.last_seen_at,
+                            reason = excluded.reason,
+                            processed = FALSE,
+                            processed_at = NULL
+                    ''', [
+                        (*row[:_ROW_PAYLOAD], len(blob))
+                        for row, (_, _, blob) in group
+                    ])
+                await self._apply_counters(db, counters)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                # Partitions created in the failed transaction are gone again
+                for partition in {row[_ROW_PARTITION] for row in rows}:
+                    self._partitions.pop(partition.key, None)
+                # Keep the rows for the next attempt, merged with any repeats
+                # buffered in the meantime
+                newer, self._pending = self._pending, {row[_ROW_ID]: row for row in rows}
+                for row in newer.values():
+                    self._buffer_row(row)
+                raise
+            latency = time.perf_counter() - start
+            
+            if self._segment_log is not None:
+                try:
+                    await asyncio.to_thread(self._append_to_log, rows)
+                except Exception as e:
+                    # Don't raise here - database storage is more important
+                    self.logger.error(f"Failed to append {len(rows)} messages to quarantine log: {e}")
+        
+        if self.metrics_exporter:
+            self.metrics_exporter.record_quarantine_flush(latency, len(rows))
+        self.logger.debug(f"Flushed {len(rows)} quarantined messages in {latency * 1000:.1f}ms")
+    
+    async def _count_inserts(
+        self,
+        db: aiosqlite.Connection,
+        partition: Partition,
+        group: List[Tuple[List, Tuple]],
+        counters: _Counters
+    ):
+        """Add the counter deltas of flushing rows into a partition, before they are written."""
+        # Rows already stored are repeats: they only add occurrences and may
+        # move them to a new reason or reopen a processed message
+        existing: Dict[str, Tuple[int, str, bool]] = {}
+        for chunk in _chunks([row[_ROW_ID] for row, _ in group]):
+            cursor = await db.execute(
+                f'SELECT id, occurrence_count, reason, processed FROM {partition.messages_table} '
+                f'WHERE id IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            existing.update((row[0], row[1:]) for row in await cursor.fetchall())
+        stored_hashes = set()
+        for chunk in _chunks(list({row[_ROW_HASH] for row, _ in group})):
+            cursor = await db.execute(
+                f'SELECT hash FROM {partition.payloads_table} '
+                f'WHERE hash IN ({", ".join("?" * len(chunk))})',
+                chunk
+            )
+            stored_hashes.update(row[0] for row in await cursor.fetchall())
+        
+        # Hot path: accumulate in locals, merge into counters once
+        total = new_rows = reopened = payload_bytes = compressed_bytes = 0
+        new_payloads = new_payload_bytes = 0
+        keyed: Dict[Tuple[str, str], int] = {}
+        for row, (_, _, blob) in group:
+            count = row[_ROW_COUNT]
+            total += count
+            key = ('topic', row[_ROW_TOPIC])
+            keyed[key] = keyed.get(key, 0) + count
+            key = ('hour', row[_ROW_LAST_SEEN][:13])
+            keyed[key] = keyed.get(key, 0) + count
+            key = ('reason', row[_ROW_REASON])
+            previous = existing.get(row[_ROW_ID])
+            if previous is None:
+                new_rows += 1
+                payload_bytes += row[_ROW_SIZE]
+                compressed_bytes += len(blob)
+                keyed[key] = keyed.get(key, 0) + count
+            else:
+                previous_count, previous_reason, previous_processed = previous
+                previous_key = ('reason', previous_reason)
+                keyed[previous_key] = keyed.get(previous_key, 0) - previous_count
+                keyed[key] = keyed.get(key, 0) + previous_count + count
+                reopened += bool(previous_processed)
+            if row[_ROW_HASH] not in stored_hashes:
+                stored_hashes.add(row[_ROW_HASH])
+                new_payloads += 1
+                new_payload_bytes += len(blob)
+        
+        for scope, delta in (
+            ('total', total),
+            ('unprocessed', new_rows + reopened),
+            ('processed', -reopened),
+            ('payload_bytes', payload_bytes),
+            ('compressed_payload_bytes', compressed_bytes),
+            ('stored_payloads', new_payloads),
+            ('stored_payload_bytes', new_payload_bytes),
+        ):
+            _count(counters, scope, delta)
+        for (scope, key), delta in keyed.items():
+            _count(counters, scope, delta, key)
+    
+    @staticmethod
+    async def _apply_counters(db: aiosqlite.Connection, counters: _Counters):
+        """Add counter deltas within the current transaction."""
+        await db.executemany(UPSERT_COUNTER, [
+            (scope, key, delta) for (scope, key), delta in counters.items() if delta
+        ])
+    
+    def _append_to_log(self, rows: List[List]):
+        """Write flushed occurrence rows to the segment log (runs in a worker thread)."""
+        self._segment_log.append([
+            (row[_ROW_ID], encode_record(
+                row[_ROW_ID],
+                received_at=row[1],
+                last_seen_at=row[_ROW_LAST_SEEN],
+                topic=row[3],
+                reason=row[_ROW_REASON],
+                payload=row[_ROW_PAYLOAD],
+                payload_size=row[6],
+                occurrence_count=row[_ROW_COUNT],
+                metadata=json.loads(row[7]) if row[7] else None
+            ))
+            for row in rows
+        ])
+    
+    async def _train_dictionary(self, db: aiosqlite.Connection):
+        """Train a compression dictionary from sampled payloads and make it current."""
+        codec = self._codec.codec
+        dictionary = await asyncio.to_thread(self._codec.train_dictionary)
+        if dictionary is None:
+            return
+        cursor = await db.execute(
+            'INSERT INTO quarantine_dictionaries (codec, dictionary) VALUES (?, ?)',
+            (codec, dictionary)
+        )
+        await db.commit()
+        self._codec.install_dictionary(codec, cursor.lastrowid, dictionary)
+        self.logger.info(
+            f"Trained {codec} payload dictionary {cursor.lastrowid} ({len(dictionary)} bytes)"
+        )
+    
     async def store(
         self,
         topic: str,
@@ -130,34 +707,34 @@ class QuarantineStore:
             metadata: Optional metadata dictionary
             
         Returns:
-            Unique message ID
+            Message ID; the partition key and the content hash of topic and
+            payload, so repeats of the same payload in a period share it
         """
-        # Generate unique ID
-        message_id = str(uuid.uuid4())
         received_at = datetime.utcnow()
+        partition = partition_for(received_at, self.partition_period)
+        # Hash the full payload so truncated payloads that differ stay apart
+        payload_hash = generate_unique_id(topic, payload)
+        message_id = f"{partition.key}{ID_SEPARATOR}{payload_hash}"
         
         # Check payload size
         if len(payload) > self.max_payload_size:
             self.logger.warning(f"Payload too large for storage: {len(payload)} bytes, truncating")
-            payload = payload[:self.max_payload_size]
             if metadata is None:
                 metadata = {}
             metadata['truncated'] = True
             metadata['original_size'] = len(payload)
+            payload = payload[:self.max_payload_size]
         
         try:
             # Store in database
-            await self._store_in_db(
-                message_id, received_at, topic, payload, reason, metadata
+            repeat = await self._store_in_db(
+                message_id, partition, payload_hash, received_at, topic, payload, reason, metadata
             )
             
-            # Write to file if enabled
-            if self.write_files:
-                await self._write_to_file(
-                    message_id, received_at, topic, payload, reason, metadata
-                )
-            
-            self.logger.info(f"Quarantined message {message_id}: {topic} - {reason}")
+            if repeat:
+                self.logger.debug(f"Repeat of quarantined message {message_id}: {topic} - {reason}")
+            else:
+                self.logger.info(f"Quarantined message {message_id}: {topic} - {reason}")
             return message_id
             
         except Exception as e:
@@ -167,125 +744,263 @@ class QuarantineStore:
     async def _store_in_db(
         self,
         message_id: str,
+        partition: Partition,
+        payload_hash: str,
         received_at: datetime,
         topic: str,
         payload: bytes,
         reason: str,
         metadata: Optional[Dict[str, Any]]
-    ):
-        """Store message in SQLite database."""
-        metadata_json = json.dumps(metadata) if metadata else None
+    ) -> bool:
+        """
+        Buffer message for the next batched insert into SQLite.
         
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute('''
-                INSERT INTO quarantined_messages 
-                (id, received_at, topic, payload, reason, payload_size, metadata)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                message_id,
-                received_at.isoformat(),
-                topic,
-                payload,
-                reason,
-                len(payload),
-                metadata_json
-            ))
-            await db.commit()
+        Returns True if it was merged into an occurrence already buffered.
+        """
+        if self._closed:
+            raise RuntimeError("Quarantine store is closed")
+        timestamp = received_at.isoformat()
+        repeat = self._buffer_row([
+            message_id,
+            timestamp,
+            timestamp,
+            topic,
+            payload_hash,
+            reason,
+            len(payload),
+            json.dumps(metadata) if metadata else None,
+            1,
+            payload,
+            partition
+        ])
+        if not repeat:
+            self._codec.add_sample(payload)
+        self._ensure_flusher()
+        
+        if len(self._pending) >= self.max_buffered_rows:
+            # The database is falling behind; flush inline to bound memory
+            await self.flush()
+        elif len(self._pending) >= self.flush_batch_size:
+            self._flush_wakeup.set()
+        return repeat
+    
+    def _buffer_row(self, row: List) -> bool:
+        """Add an occurrence row to the buffer; returns True if it merged into a buffered one."""
+        buffered = self._pending.get(row[_ROW_ID])
+        if buffered is None:
+            self._pending[row[_ROW_ID]] = row
+            return False
+        buffered[_ROW_COUNT] += row[_ROW_COUNT]
+        buffered[_ROW_LAST_SEEN] = row[_ROW_LAST_SEEN]
+        buffered[_ROW_REASON] = row[_ROW_REASON]
+        return True
     
-    async def _write_to_file(
+    async def iter_messages(
         self,
-        message_id: str,
-        received_at: datetime,
-        topic: str,
-        payload: bytes,
-        reason: str,
-        metadata: Optional[Dict[str, Any]]
-    ):
-        """Write quarantined message to individual file."""
-        try:
-            # Create filename with timestamp and ID
-            timestamp_str = received_at.strftime("%Y%m%d_%H%M%S")
-            filename = f"{timestamp_str}_{message_id}.json"
-            file_path = self.quarantine_dir / filename
-            
-            # Prepare file content
-            file_content = {
-                'id': message_id,
-                'received_at': received_at.isoformat(),
-                'topic': topic,
-                'reason': reason,
-                'payload_size': len(payload),
-                'metadata': metadata or {},
-                'payload_base64': payload.hex(),  # Store as hex for binary safety
-                'payload_text': self._safe_decode_payload(payload)
-            }
-            
-            # Write to file
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(file_content, f, indent=2, ensure_ascii=False)
+        processed: Optional[bool] = False,
+        topic_pattern: Optional[str] = None,
+        reason_pattern: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = False,
+        page_size: int = 500,
+        cursor: Optional[str] = None
+    ) -> AsyncIterator[QuarantineRecord]:
+        """
+        Stream quarantined messages in (received_at, id) order.
+        
+        Pages of page_size rows are fetched with keyset pagination, so
+        memory stays bounded and marking messages processed while iterating
+        never skips or repeats one. Pass a record's cursor to resume after
+        it, e.g. in a later run.
+        
+        Args:
+            processed: Only unprocessed (False) or processed (True) messages,
+                or both (None)
+            topic_pattern: SQL LIKE pattern for topic filtering
+            reason_pattern: SQL LIKE pattern for reason filtering
+            start_date: Start date for date range
+            end_date: End date for date range
+            descending: Newest first instead of oldest first
+            page_size: Rows fetched per query
+            cursor: Token from QuarantineRecord.cursor to resume after
             
-            self.logger.debug(f"Wrote quarantine file: {file_path}")
+        Raises:
+            ValueError: If the cursor is malformed or for the other direction
+        """
+        position = _decode_cursor(cursor, descending) if cursor else None
+        
+        conditions = ''
+        params: List[Any] = []
+        if processed is not None:
+            conditions += ' AND m.processed = ?'
+            params.append(processed)
+        if topic_pattern:
+            conditions += ' AND m.topic LIKE ?'
+            params.append(topic_pattern)
+        if reason_pattern:
+            conditions += ' AND m.reason LIKE ?'
+            params.append(reason_pattern)
+        if start_date:
+            conditions += ' AND m.received_at >= ?'
+            params.append(start_date.isoformat())
+        if end_date:
+            conditions += ' AND m.received_at <= ?'
+            params.append(end_date.isoformat())
+        order = 'DESC' if descending else 'ASC'
+        after = '<' if descending else '>'
+        
+        await self.flush()
+        db = await self._get_db()
+        partitions = await self._list_partitions(db, start_date, end_date)
+        if descending:
+            partitions.reverse()
+        
+        for partition in partitions:
+            # Partitions wholly before the cursor have nothing left to yield
+            if position is not None and (
+                partition.start.isoformat() > position[0] if descending
+                else partition.end.isoformat() <= position[0]
+            ):
+                continue
+            query = _select_messages(partition) + ' WHERE 1=1' + conditions
+            while True:
+                page_query, page_params = query, list(params)
+                if position is not None:
+                    page_query += f' AND (m.received_at, m.id) {after} (?, ?)'
+                    page_params.extend(position)
+                page_query += f' ORDER BY m.received_at {order}, m.id {order} LIMIT ?'
+                page_params.append(page_size)
+                
+                db_cursor = await db.execute(page_query, page_params)
+                rows = await db_cursor.fetchall()
+                for row in rows:
+                    yield QuarantineRecord(row, self._codec, descending)
+                if rows:
+                    position = (rows[-1]['received_at'], rows[-1]['id'])
+                if len(rows) < page_size:
+                    break
+    
+    async def get_by_ids(self, message_ids: List[str]) -> List[QuarantinedMessage]:
+        """
+        Get quarantined messages by ID.
+        
+        Ids are looked up by primary key in their partition, in chunks of
+        "id IN (...)" queries.
+        
+        Args:
+            message_ids: Message IDs to fetch
             
+        Returns:
+            List of the QuarantinedMessage objects found, in the order of
+            message_ids; missing ids are left out
+        """
+        try:
+            if not message_ids:
+                return []
+            await self.flush()
+            db = await self._get_db()
+            found: Dict[str, QuarantinedMessage] = {}
+            for partition, ids in await self._partitions_for_ids(db, message_ids):
+                for chunk in _chunks(ids):
+                    cursor = await db.execute(
+                        _select_messages(partition) + f' WHERE m.id IN ({", ".join("?" * len(chunk))})',
+                        chunk
+                    )
+                    for row in await cursor.fetchall():
+                        found[row['id']] = QuarantineRecord(row, self._codec).to_message()
+            return [found[message_id] for message_id in dict.fromkeys(message_ids) if message_id in found]
+        
         except Exception as e:
-            self.logger.error(f"Failed to write quarantine file for {message_id}: {e}")
-            # Don't raise here - database storage is more important
+            self.logger.error(f"Failed to get messages by id: {e}")
+            return []
     
-    def _safe_decode_payload(self, payload: bytes) -> Optional[str]:
-        """Safely decode payload to text for file storage."""
+    @staticmethod
+    async def _collect(records: AsyncIterator[QuarantineRecord], limit: int) -> List[QuarantinedMessage]:
+        """First limit records of a stream as QuarantinedMessage objects."""
+        messages: List[QuarantinedMessage] = []
         try:
-            return payload.decode('utf-8')
-        except UnicodeDecodeError:
-            try:
-                return payload.decode('latin-1')
-            except:
-                return None  # Binary data that can't be decoded
+            async for record in records:
+                messages.append(record.to_message())
+                if len(messages) >= limit:
+                    break
+        finally:
+            await records.aclose()
+        return messages
     
     async def get_unprocessed(self, limit: int = 100) -> List[QuarantinedMessage]:
         """
         Get unprocessed quarantined messages.
         
+        Use iter_messages() to walk large backlogs.
+        
         Args:
             limit: Maximum number of messages to return
             
         Returns:
-            List of QuarantinedMessage objects
+            List of QuarantinedMessage objects, oldest first
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                
-                cursor = await db.execute('''
-                    SELECT * FROM quarantined_messages 
-                    WHERE processed = FALSE 
-                    ORDER BY received_at ASC 
-                    LIMIT ?
-                ''', (limit,))
-                
-                rows = await cursor.fetchall()
-                
-                messages = []
-                for row in rows:
-                    metadata = json.loads(row['metadata']) if row['metadata'] else None
-                    
-                    message = QuarantinedMessage(
-                        id=row['id'],
-                        received_at=datetime.fromisoformat(row['received_at']),
-                        topic=row['topic'],
-                        payload=row['payload'],
-                        reason=row['reason'],
-                        retry_count=row['retry_count'],
-                        processed=bool(row['processed']),
-                        processed_at=datetime.fromisoformat(row['processed_at']) if row['processed_at'] else None,
-                        metadata=metadata
-                    )
-                    messages.append(message)
-                
-                return messages
+            return await self._collect(
+                self.iter_messages(processed=False, page_size=limit), limit
+            )
                 
         except Exception as e:
             self.logger.error(f"Failed to get unprocessed messages: {e}")
             return []
     
+    async def _apply_updates(
+        self,
+        db: aiosqlite.Connection,
+        message_ids: List[str],
+        assignments: str,
+        params: Tuple,
+        marks_processed: bool = False
+    ) -> int:
+        """
+        Run an UPDATE on messages in their partitions without committing;
+        returns the rows changed. Updates that mark messages processed move
+        the newly processed ones between the status counters.
+        """
+        changes = 0
+        newly_processed = 0
+        for partition, ids in await self._partitions_for_ids(db, message_ids):
+            for chunk in _chunks(ids):
+                placeholders = ", ".join("?" * len(chunk))
+                if marks_processed:
+                    cursor = await db.execute(
+                        f'SELECT COUNT(*) FROM {partition.messages_table} '
+                        f'WHERE processed = FALSE AND id IN ({placeholders})',
+                        chunk
+                    )
+                    newly_processed += (await cursor.fetchone())[0]
+                cursor = await db.execute(
+                    f'UPDATE {partition.messages_table} SET {assignments} WHERE id IN ({placeholders})',
+                    (*params, *chunk)
+                )
+                changes += cursor.rowcount
+        if newly_processed:
+            await self._apply_counters(db, {
+                ('processed', ''): newly_processed,
+                ('unprocessed', ''): -newly_processed,
+            })
+        return changes
+    
+    async def _update_messages(
+        self, message_ids: List[str], assignments: str, params: Tuple, marks_processed: bool = False
+    ) -> int:
+        """Apply an UPDATE to messages in one transaction; returns the rows changed."""
+        await self.flush()
+        db = await self._get_db()
+        async with self._write_lock:
+            try:
+                changes = await self._apply_updates(db, message_ids, assignments, params, marks_processed)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+        return changes
+    
     async def mark_processed(self, message_id: str) -> bool:
         """
         Mark a message as processed.
@@ -297,32 +1012,48 @@ class QuarantineStore:
             True if successful, False otherwise
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE quarantined_messages 
-                    SET processed = TRUE, processed_at = ? 
-                    WHERE id = ?
-                ''', (datetime.utcnow().isoformat(), message_id))
-                
-                await db.commit()
-                
-                # Check if update was successful
-                cursor = await db.execute(
-                    'SELECT changes()'
-                )
-                changes = await cursor.fetchone()
-                
-                if changes and changes[0] > 0:
-                    self.logger.debug(f"Marked message {message_id} as processed")
-                    return True
-                else:
-                    self.logger.warning(f"Message {message_id} not found for processing")
-                    return False
+            changes = await self._update_messages(
+                [message_id], 'processed = TRUE, processed_at = ?', (datetime.utcnow().isoformat(),),
+                marks_processed=True
+            )
+            
+            # Check if update was successful
+            if changes > 0:
+                self.logger.debug(f"Marked message {message_id} as processed")
+                return True
+            else:
+                self.logger.warning(f"Message {message_id} not found for processing")
+                return False
                     
         except Exception as e:
             self.logger.error(f"Failed to mark message {message_id} as processed: {e}")
             return False
     
+    async def mark_processed_batch(self, message_ids: List[str]) -> int:
+        """
+        Mark several messages as processed in one transaction.
+        
+        Args:
+            message_ids: Message IDs to mark as processed
+            
+        Returns:
+            Number of messages marked; 0 on failure
+        """
+        if not message_ids:
+            return 0
+        try:
+            changes = await self._update_messages(
+                message_ids, 'processed = TRUE, processed_at = ?', (datetime.utcnow().isoformat(),),
+                marks_processed=True
+            )
+            if changes < len(message_ids):
+                self.logger.warning(f"{len(message_ids) - changes} messages not found for processing")
+            return changes
+        
+        except Exception as e:
+            self.logger.error(f"Failed to mark {len(message_ids)} messages as processed: {e}")
+            return 0
+    
     async def increment_retry_count(self, message_id: str) -> bool:
         """
         Increment retry count for a message.
@@ -334,88 +1065,309 @@ class QuarantineStore:
             True if successful, False otherwise
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute('''
-                    UPDATE quarantined_messages 
-                    SET retry_count = retry_count + 1 
-                    WHERE id = ?
-                ''', (message_id,))
-                
-                await db.commit()
-                return True
+            await self._update_messages([message_id], 'retry_count = retry_count + 1', ())
+            return True
                 
         except Exception as e:
             self.logger.error(f"Failed to increment retry count for {message_id}: {e}")
             return False
     
+    async def increment_retry_count_batch(self, message_ids: List[str]) -> int:
+        """
+        Increment the retry count of several messages in one transaction.
+        
+        Args:
+            message_ids: Message IDs to increment retry count
+            
+        Returns:
+            Number of messages updated; 0 on failure
+        """
+        if not message_ids:
+            return 0
+        try:
+            return await self._update_messages(message_ids, 'retry_count = retry_count + 1', ())
+        
+        except Exception as e:
+            self.logger.error(f"Failed to increment retry count for {len(message_ids)} messages: {e}")
+            return 0
+    
+    @staticmethod
+    def _row_to_replay_run(row: aiosqlite.Row) -> ReplayRun:
+        return ReplayRun(
+            id=row['id'],
+            status=row['status'],
+            filters=json.loads(row['filters']),
+            cursor=row['cursor'],
+            stats=json.loads(row['stats']),
+            started_at=datetime.fromisoformat(row['started_at']),
+            updated_at=datetime.fromisoformat(row['updated_at']),
+            finished_at=datetime.fromisoformat(row['finished_at']) if row['finished_at'] else None
+        )
+    
+    async def create_replay_run(self, filters: Dict[str, Any], stats: Dict[str, int]) -> ReplayRun:
+        """
+        Record the start of a replay run.
+        
+        Args:
+            filters: The run's message selection, kept for resuming it
+            stats: Initial statistics
+            
+        Returns:
+            The new ReplayRun
+        """
+        now = datetime.utcnow()
+        run = ReplayRun(
+            id=uuid.uuid4().hex,
+            status="running",
+            filters=filters,
+            cursor=None,
+            stats=dict(stats),
+            started_at=now,
+            updated_at=now
+        )
+        db = await self._get_db()
+        async with self._write_lock:
+            await db.execute('''
+                INSERT INTO quarantine_replay_runs
+                (id, status, filters, cursor, stats, started_at, updated_at)
+                VALUES (?, ?, ?, NULL, ?, ?, ?)
+            ''', (run.id, run.status, json.dumps(filters), json.dumps(run.stats),
+                  now.isoformat(), now.isoformat()))
+            await db.commit()
+        return run
+    
+    async def get_replay_run(self, run_id: Optional[str] = None) -> Optional[ReplayRun]:
+        """
+        Get a replay run by id, or the latest unfinished one.
+        
+        Args:
+            run_id: Run ID; None for the most recently updated run that has
+                not completed
+            
+        Returns:
+            The ReplayRun, or None if there is none
+        """
+        db = await self._get_db()
+        if run_id is None:
+            cursor = await db.execute('''
+                SELECT * FROM quarantine_replay_runs WHERE status != ?
+                ORDER BY updated_at DESC LIMIT 1
+            ''', (REPLAY_COMPLETED,))
+        else:
+            cursor = await db.execute('SELECT * FROM quarantine_replay_runs WHERE id = ?', (run_id,))
+        row = await cursor.fetchone()
+        return self._row_to_replay_run(row) if row else None
+    
+    async def commit_replay_batch(
+        self,
+        run_id: str,
+        cursor: Optional[str],
+        stats: Dict[str, int],
+        processed_ids: List[str],
+        retry_ids: List[str]
+    ) -> bool:
+        """
+        Commit a replayed batch together with the run's checkpoint.
+        
+        Marking messages processed, incrementing retry counts and advancing
+        the run's cursor happen in one transaction, so a resumed run neither
+        repeats nor loses a batch's updates.
+        
+        Args:
+            run_id: Replay run ID
+            cursor: Position after the batch's last message
+            stats: The run's statistics after the batch
+            processed_ids: Message IDs to mark as processed
+            retry_ids: Message IDs to increment retry count
+            
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            await self.flush()
+            db = await self._get_db()
+            now = datetime.utcnow().isoformat()
+            async with self._write_lock:
+                try:
+                    await self._apply_updates(
+                        db, processed_ids, 'processed = TRUE, processed_at = ?', (now,),
+                        marks_processed=True
+                    )
+                    await self._apply_updates(db, retry_ids, 'retry_count = retry_count + 1', ())
+                    await db.execute('''
+                        UPDATE quarantine_replay_runs
+                        SET cursor = COALESCE(?, cursor), stats = ?, updated_at = ?
+                        WHERE id = ?
+                    ''', (cursor, json.dumps(stats), now, run_id))
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+            return True
+        
+        except Exception as e:
+            self.logger.error(f"Failed to commit replay batch of run {run_id}: {e}")
+            return False
+    
+    async def finish_replay_run(self, run_id: str, status: str, stats: Optional[Dict[str, int]] = None):
+        """
+        Record the end of a replay run.
+        
+        Args:
+            run_id: Replay run ID
+            status: REPLAY_COMPLETED, or e.g. 'interrupted'/'failed' to allow
+                resuming it
+            stats: The run's final statistics; None keeps those of the last
+                committed batch
+        """
+        db = await self._get_db()
+        now = datetime.utcnow().isoformat()
+        async with self._write_lock:
+            await db.execute('''
+                UPDATE quarantine_replay_runs
+                SET status = ?, stats = COALESCE(?, stats), updated_at = ?,
+                    finished_at = CASE WHEN ? = ? THEN ? ELSE NULL END
+                WHERE id = ?
+            ''', (status, json.dumps(stats) if stats is not None else None, now,
+                  status, REPLAY_COMPLETED, now, run_id))
+            await db.commit()
+    
     async def get_statistics(self) -> Dict[str, Any]:
-        """Get quarantine statistics."""
+        """
+        Get quarantine statistics.
+        
+        Reads the running totals in quarantine_counters, so the cost does
+        not grow with the number of messages. messages_last_24h has
+        hour granularity.
+        """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                stats = {}
-                
-                # Total messages
-                cursor = await db.execute('SELECT COUNT(*) FROM quarantined_messages')
-                result = await cursor.fetchone()
-                stats['total_messages'] = result[0] if result else 0
-                
-                # Processed messages
-                cursor = await db.execute('SELECT COUNT(*) FROM quarantined_messages WHERE processed = TRUE')
-                result = await cursor.fetchone()
-                stats['processed_messages'] = result[0] if result else 0
-                
-                # Unprocessed messages
-                cursor = await db.execute('SELECT COUNT(*) FROM quarantined_messages WHERE processed = FALSE')
-                result = await cursor.fetchone()
-                stats['unprocessed_messages'] = result[0] if result else 0
-                
-                # Messages by reason
-                cursor = await db.execute('''
-                    SELECT reason, COUNT(*) as count 
-                    FROM quarantined_messages 
-                    GROUP BY reason 
-                    ORDER BY count DESC
-                ''')
-                rows = await cursor.fetchall()
-                stats['messages_by_reason'] = {row[0]: row[1] for row in rows}
-                
-                # Recent activity (last 24 hours)
-                cursor = await db.execute('''
-                    SELECT COUNT(*) FROM quarantined_messages 
-                    WHERE received_at > datetime('now', '-1 day')
-                ''')
-                result = await cursor.fetchone()
-                stats['messages_last_24h'] = result[0] if result else 0
-                
-                return stats
+            await self.flush()
+            db = await self._get_db()
+            counters = {
+                'total': 0,
+                'processed': 0,
+                'unprocessed': 0,
+                'payload_bytes': 0,
+                'compressed_payload_bytes': 0,
+                'stored_payloads': 0,
+                'stored_payload_bytes': 0,
+            }
+            cursor = await db.execute(
+                f"SELECT scope, value FROM quarantine_counters "
+                f"WHERE key = '' AND scope IN ({', '.join('?' * len(counters))})",
+                list(counters)
+            )
+            counters.update(await cursor.fetchall())
+            
+            day_ago_hour = (datetime.utcnow() - timedelta(days=1)).isoformat()[:13]
+            cursor = await db.execute(
+                "SELECT COALESCE(SUM(value), 0) FROM quarantine_counters WHERE scope = 'hour' AND key >= ?",
+                (day_ago_hour,)
+            )
+            messages_last_24h = (await cursor.fetchone())[0]
+            
+            # Messages by reason
+            cursor = await db.execute(
+                "SELECT key, value FROM quarantine_counters WHERE scope = 'reason' AND value > 0"
+            )
+            by_reason = dict(await cursor.fetchall())
+            
+            cursor = await db.execute('SELECT COUNT(*) FROM quarantine_partitions')
+            partitions = (await cursor.fetchone())[0]
+            
+            return {
+                'partitions': partitions,
+                'total_messages': counters['total'],
+                'unique_messages': counters['processed'] + counters['unprocessed'],
+                'stored_payloads': counters['stored_payloads'],
+                'stored_payload_bytes': counters['stored_payload_bytes'],
+                'payload_bytes': counters['payload_bytes'],
+                'compressed_payload_bytes': counters['compressed_payload_bytes'],
+                'processed_messages': counters['processed'],
+                'unprocessed_messages': counters['unprocessed'],
+                'messages_last_24h': messages_last_24h,
+                'compression_ratio': (
+                    counters['payload_bytes'] / counters['compressed_payload_bytes']
+                    if counters['compressed_payload_bytes'] else 1.0
+                ),
+                'messages_by_reason': dict(
+                    sorted(by_reason.items(), key=lambda item: item[1], reverse=True)
+                ),
+            }
                 
         except Exception as e:
             self.logger.error(f"Failed to get statistics: {e}")
             return {}
     
+    async def get_topic_counts(self, limit: int = 10) -> Dict[str, int]:
+        """
+        Get the topics with the most quarantined messages.
+        
+        Args:
+            limit: Maximum number of topics to return
+            
+        Returns:
+            Dictionary of topic to message count, largest first
+        """
+        try:
+            await self.flush()
+            db = await self._get_db()
+            cursor = await db.execute('''
+                SELECT key, value FROM quarantine_counters
+                WHERE scope = 'topic' AND value > 0
+                ORDER BY value DESC LIMIT ?
+            ''', (limit,))
+            return dict(await cursor.fetchall())
+        
+        except Exception as e:
+            self.logger.error(f"Failed to get topic counts: {e}")
+            return {}
+    
     async def cleanup_old_messages(self, days_old: int = 30) -> int:
         """
-        Clean up old processed messages.
+        Drop partitions that ended more than days_old days ago.
+        
+        Retention is per partition: expired partitions are dropped whole,
+        including messages that were never processed, without touching
+        newer partitions.
         
         Args:
-            days_old: Delete processed messages older than this many days
+            days_old: Retention period in days
             
         Returns:
             Number of messages deleted
         """
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                cursor = await db.execute('''
-                    DELETE FROM quarantined_messages 
-                    WHERE processed = TRUE 
-                    AND processed_at < datetime('now', '-{} days')
-                '''.format(days_old))
-                
+            await self.flush()
+            db = await self._get_db()
+            cutoff = datetime.utcnow() - timedelta(days=days_old)
+            deleted_count = 0
+            async with self._write_lock:
+                cursor = await db.execute(
+                    'SELECT key, start_at, end_at FROM quarantine_partitions WHERE end_at <= ?',
+                    (cutoff.isoformat(),)
+                )
+                expired = [partition_from_row(*row) for row in await cursor.fetchall()]
+                for partition in expired:
+                    cursor = await db.execute(
+                        f'SELECT COALESCE(SUM(occurrence_count), 0) FROM {partition.messages_table}'
+                    )
+                    deleted_count += (await cursor.fetchone())[0]
+                    for statement in partition.counter_ddl(-1) + partition.drop_ddl():
+                        await db.execute(statement)
+                    await db.execute('DELETE FROM quarantine_partitions WHERE key = ?', (partition.key,))
+                    self._partitions.pop(partition.key, None)
+                await db.execute(
+                    "DELETE FROM quarantine_counters WHERE value = 0 OR (scope = 'hour' AND key < ?)",
+                    (cutoff.isoformat()[:13],)
+                )
                 await db.commit()
-                deleted_count = cursor.rowcount
-                
-                self.logger.info(f"Cleaned up {deleted_count} old quarantined messages")
-                return deleted_count
+            
+            self.logger.info(
+                f"Cleaned up {deleted_count} old quarantined messages "
+                f"({len(expired)} partitions dropped)"
+            )
+            return deleted_count
                 
         except Exception as e:
             self.logger.error(f"Failed to cleanup old messages: {e}")
@@ -432,6 +1384,9 @@ class QuarantineStore:
         """
         Search quarantined messages with filters.
         
+        Only partitions overlapping the date range are queried. Use
+        iter_messages() to walk large result sets.
+        
         Args:
             topic_pattern: SQL LIKE pattern for topic filtering
             reason_pattern: SQL LIKE pattern for reason filtering
@@ -440,62 +1395,53 @@ class QuarantineStore:
             limit: Maximum number of results
             
         Returns:
-            List of matching QuarantinedMessage objects
+            List of matching QuarantinedMessage objects, newest first
         """
         try:
-            query = 'SELECT * FROM quarantined_messages WHERE 1=1'
-            params = []
-            
-            if topic_pattern:
-                query += ' AND topic LIKE ?'
-                params.append(topic_pattern)
-            
-            if reason_pattern:
-                query += ' AND reason LIKE ?'
-                params.append(reason_pattern)
-            
-            if start_date:
-                query += ' AND received_at >= ?'
-                params.append(start_date.isoformat())
-            
-            if end_date:
-                query += ' AND received_at <= ?'
-                params.append(end_date.isoformat())
-            
-            query += ' ORDER BY received_at DESC LIMIT ?'
-            params.append(limit)
-            
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
-                cursor = await db.execute(query, params)
-                rows = await cursor.fetchall()
-                
-                messages = []
-                for row in rows:
-                    metadata = json.loads(row['metadata']) if row['metadata'] else None
-                    
-                    message = QuarantinedMessage(
-                        id=row['id'],
-                        received_at=datetime.fromisoformat(row['received_at']),
-                        topic=row['topic'],
-                        payload=row['payload'],
-                        reason=row['reason'],
-                        retry_count=row['retry_count'],
-                        processed=bool(row['processed']),
-                        processed_at=datetime.fromisoformat(row['processed_at']) if row['processed_at'] else None,
-                        metadata=metadata
-                    )
-                    messages.append(message)
-                
-                return messages
+            return await self._collect(
+                self.iter_messages(
+                    processed=None,
+                    topic_pattern=topic_pattern,
+                    reason_pattern=reason_pattern,
+                    start_date=start_date,
+                    end_date=end_date,
+                    descending=True,
+                    page_size=limit
+                ),
+                limit
+            )
                 
         except Exception as e:
             self.logger.error(f"Failed to search messages: {e}")
             return []
     
-    def close(self):
-        """Close database connections and cleanup."""
-        # Async cleanup would be called here if needed
+    async def close(self):
+        """Flush buffered inserts durably and close the database connection."""
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_wakeup.set()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        
+        try:
+            if self._pending:
+                db = await self._get_db()
+                # Make the final batch durable despite synchronous=NORMAL
+                await db.execute('PRAGMA synchronous=FULL')
+                await self.flush()
+        except Exception as e:
+            self.logger.error(f"Failed to flush quarantine store on close: {e}")
+        
+        if self._segment_log is not None:
+            try:
+                await asyncio.to_thread(self._segment_log.close)
+            except Exception as e:
+                self.logger.error(f"Failed to close quarantine log: {e}")
+        
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+        
         self.logger.info("Quarantine store closed")
 
 
@@ -529,7 +1475,7 @@ if __name__ == "__main__":
         stats = await store.get_statistics()
         print(f"Statistics: {stats}")
         
-        store.close()
+        await store.close()
     
     # Run test
     asyncio.run(test_quarantine_store())
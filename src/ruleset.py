@@ -0,0 +1,153 @@
+"""
+Ruleset Module
+
+A CompiledRuleset is an immutable snapshot of everything the hot path
+reads: the topic matcher (allow and schema tables), the backpressure
+matcher and a SchemaValidator with every schema already loaded. It is built
+once, when the config is loaded. A config change produces a new ruleset
+rather than modifying an existing one.
+
+Rulesets can be cached on disk for fast restarts. A cache file starts with
+a fingerprint of rules.yaml, every schema file and the schema engine, and
+is only used while that fingerprint still matches.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from schema_validator import SchemaValidator
+from topic_matcher import TopicMatcher, compile_topic_rules
+
+if TYPE_CHECKING:
+    from config_loader import ProxyConfig
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Bump when the pickled layout of the ruleset or its parts changes
+RULESET_CACHE_VERSION = 2
+
+
+@dataclass(frozen=True)
+class CompiledRuleset:
+    fingerprint: str
+    topic_matcher: TopicMatcher
+    backpressure_matcher: TopicMatcher
+    schema_validator: SchemaValidator
+    # Wall time to compile (or load from cache) this ruleset
+    build_seconds: float = 0.0
+    from_cache: bool = False
+
+
+def ruleset_fingerprint(config_bytes: bytes, config: ProxyConfig) -> str:
+    """Hash of everything a ruleset is built from."""
+    digest = hashlib.sha256()
+    digest.update(
+        f"{RULESET_CACHE_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:"
+        f"{config.schema_engine}\0".encode("utf-8")
+    )
+    digest.update(config_bytes)
+    for schema_id in sorted(config.schema_files):
+        path = config.schema_files[schema_id].file
+        digest.update(f"\0{schema_id}\0{path}\0".encode("utf-8"))
+        try:
+            digest.update(Path(path).read_bytes())
+        except OSError:
+            digest.update(b"<missing>")
+    return digest.hexdigest()
+
+
+def compile_matchers(config: ProxyConfig) -> Tuple[TopicMatcher, TopicMatcher]:
+    """Compile the topic matcher and the backpressure matcher of a config."""
+    return (
+        compile_topic_rules(config.topic_patterns, config.schema_mappings),
+        TopicMatcher([list(config.backpressure_policies.items())]),
+    )
+
+
+def compile_ruleset(config: ProxyConfig, fingerprint: str = "") -> CompiledRuleset:
+    """Build a ruleset from a config, loading every configured schema."""
+    start = time.perf_counter()
+    topic_matcher, backpressure_matcher = compile_matchers(config)
+    validator = SchemaValidator(config)
+    validator.preload()
+    return CompiledRuleset(
+        fingerprint=fingerprint,
+        topic_matcher=topic_matcher,
+        backpressure_matcher=backpressure_matcher,
+        schema_validator=validator,
+        build_seconds=time.perf_counter() - start,
+    )
+
+
+def load_cached_ruleset(cache_path: str, fingerprint: str) -> Optional[CompiledRuleset]:
+    """Return the cached ruleset if the cache file matches the fingerprint, else None."""
+    try:
+        with open(cache_path, "rb") as f:
+            # The fingerprint line is checked before unpickling the rest
+            if f.readline().rstrip(b"\n") != fingerprint.encode("ascii"):
+                return None
+            ruleset = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:  # noqa: BLE001
+        _LOGGER.warning("Ignoring unreadable ruleset cache %s: %s", cache_path, exc)
+        return None
+    if not isinstance(ruleset, CompiledRuleset):
+        return None
+    return ruleset
+
+
+def save_ruleset(cache_path: str, ruleset: CompiledRuleset):
+    """Write a ruleset to the cache file atomically."""
+    path = Path(cache_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(ruleset.fingerprint.encode("ascii") + b"\n")
+        pickle.dump(ruleset, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def build_ruleset(
+    config: ProxyConfig, config_bytes: bytes, cache_path: Optional[str] = None
+) -> CompiledRuleset:
+    """
+    Return the ruleset for a config, from the disk cache when it is current.
+
+    A fresh build is written back to the cache. Cache failures are logged and
+    never fail the load.
+    """
+    start = time.perf_counter()
+    fingerprint = ruleset_fingerprint(config_bytes, config)
+    if cache_path:
+        cached = load_cached_ruleset(cache_path, fingerprint)
+        if cached is not None:
+            ruleset = dataclasses.replace(
+                cached, build_seconds=time.perf_counter() - start, from_cache=True
+            )
+            _LOGGER.info(
+                "Loaded compiled ruleset from %s in %.1f ms",
+                cache_path, ruleset.build_seconds * 1000,
+            )
+            return ruleset
+
+    ruleset = compile_ruleset(config, fingerprint)
+    if cache_path:
+        try:
+            save_ruleset(cache_path, ruleset)
+        except Exception as exc:  # noqa: BLE001
+            _LOGGER.warning("Could not write ruleset cache %s: %s", cache_path, exc)
+    ruleset = dataclasses.replace(ruleset, build_seconds=time.perf_counter() - start)
+    _LOGGER.info("Compiled ruleset in %.1f ms", ruleset.build_seconds * 1000)
+    return ruleset
@@ -0,0 +1,294 @@
+"""
+Schema Compiler Module
+
+Turns a JSON Schema (Draft 7) into a specialised Python validation function,
+in the spirit of fastjsonschema. The generated function only answers
+"valid or not"; SchemaValidator asks the interpreted Draft7Validator for the
+error message when a payload fails, so reasons are identical across engines.
+
+Keywords the compiler does not understand are delegated to a Draft7Validator
+built for that subschema. Schemas using $ref are not compiled at all, since
+references must be resolved against the root schema.
+"""
+
+import hashlib
+import logging
+import marshal
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from jsonschema import Draft7Validator
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Keywords without validation semantics (format is not asserted, matching
+# Draft7Validator without a format checker)
+_ANNOTATIONS = {
+    "$schema", "$id", "$comment", "title", "description", "default",
+    "examples", "format", "definitions", "readOnly", "writeOnly",
+}
+
+_COMPILED_KEYWORDS = {
+    "type", "enum", "const",
+    "minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum",
+    "minLength", "maxLength", "pattern",
+    "properties", "required", "additionalProperties",
+    "minProperties", "maxProperties",
+    "items", "minItems", "maxItems",
+}
+
+_TYPE_CHECKS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "integer": (
+        "((isinstance({v}, int) and not isinstance({v}, bool))"
+        " or (isinstance({v}, float) and {v}.is_integer()))"
+    ),
+}
+
+_IS_NUMBER = _TYPE_CHECKS["number"]
+
+
+class SchemaCompileError(Exception):
+    """Raised when a schema cannot be compiled and must be interpreted."""
+    pass
+
+
+def _contains_ref(node: Any) -> bool:
+    if isinstance(node, dict):
+        return "$ref" in node or any(_contains_ref(v) for v in node.values())
+    if isinstance(node, list):
+        return any(_contains_ref(v) for v in node)
+    return False
+
+
+def _is_plain_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class _CodeGenerator:
+    """Emits the body of a validation function for one schema."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self.namespace: Dict[str, Any] = {}
+        self._counter = 0
+        self.fallbacks = 0
+
+    def _name(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def _constant(self, prefix: str, value: Any) -> str:
+        name = self._name(prefix)
+        self.namespace[name] = value
+        return name
+
+    def _emit(self, indent: int, line: str):
+        self.lines.append("    " * indent + line)
+
+    def _fallback(self, schema: Any, var: str, indent: int):
+        is_valid = self._constant("_fallback", Draft7Validator(schema).is_valid)
+        self._emit(indent, f"if not {is_valid}({var}): return False")
+        self.fallbacks += 1
+
+    def schema(self, schema: Any, var: str, indent: int):
+        if schema is True or schema == {}:
+            return
+        if schema is False:
+            self._emit(indent, "return False")
+            return
+        if not isinstance(schema, dict):
+            raise SchemaCompileError(f"Unsupported schema node: {schema!r}")
+
+        unknown = set(schema) - _COMPILED_KEYWORDS - _ANNOTATIONS
+        if unknown or not self._compilable_values(schema):
+            # Interpret the whole subschema so keyword interactions are kept
+            self._fallback(schema, var, indent)
+            return
+
+        if "type" in schema:
+            self._type(schema["type"], var, indent)
+        if "enum" in schema:
+            members = self._constant("_enum", frozenset(schema["enum"]))
+            self._emit(indent, f"if not (isinstance({var}, str) and {var} in {members}): return False")
+        if "const" in schema:
+            self._emit(indent, f"if not (isinstance({var}, str) and {var} == {schema['const']!r}): return False")
+        self._numeric(schema, var, indent)
+        self._string(schema, var, indent)
+        self._object(schema, var, indent)
+        self._array(schema, var, indent)
+
+    @staticmethod
+    def _compilable_values(schema: Dict[str, Any]) -> bool:
+        """Check keyword values are in the subset the generator handles exactly."""
+        types = schema.get("type")
+        if types is not None:
+            type_list = types if isinstance(types, list) else [types]
+            if not type_list or not all(t in _TYPE_CHECKS for t in type_list):
+                return False
+        # enum/const comparisons are only generated for strings; other JSON
+        # values have bool/int equality corner cases best left to jsonschema
+        if "enum" in schema and not (
+            isinstance(schema["enum"], list) and all(isinstance(e, str) for e in schema["enum"])
+        ):
+            return False
+        if "const" in schema and not isinstance(schema["const"], str):
+            return False
+        for keyword in ("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum"):
+            if keyword in schema and not _is_plain_number(schema[keyword]):
+                return False
+        for keyword in ("minLength", "maxLength", "minProperties", "maxProperties",
+                        "minItems", "maxItems"):
+            if keyword in schema and not (
+                isinstance(schema[keyword], int) and not isinstance(schema[keyword], bool)
+            ):
+                return False
+        if "pattern" in schema and not isinstance(schema["pattern"], str):
+            return False
+        if "properties" in schema and not isinstance(schema["properties"], dict):
+            return False
+        if "required" in schema and not (
+            isinstance(schema["required"], list)
+            and all(isinstance(r, str) for r in schema["required"])
+        ):
+            return False
+        if "additionalProperties" in schema and not isinstance(
+            schema["additionalProperties"], (bool, dict)
+        ):
+            return False
+        # Tuple-form items is not compiled
+        if "items" in schema and not isinstance(schema["items"], (bool, dict)):
+            return False
+        return True
+
+    def _type(self, types: Any, var: str, indent: int):
+        type_list = types if isinstance(types, list) else [types]
+        checks = " or ".join(_TYPE_CHECKS[t].format(v=var) for t in type_list)
+        self._emit(indent, f"if not ({checks}): return False")
+
+    def _numeric(self, schema: Dict[str, Any], var: str, indent: int):
+        bounds = [
+            ("minimum", "<"), ("maximum", ">"),
+            ("exclusiveMinimum", "<="), ("exclusiveMaximum", ">="),
+        ]
+        checks = [(kw, op) for kw, op in bounds if kw in schema]
+        if not checks:
+            return
+        self._emit(indent, f"if {_IS_NUMBER.format(v=var)}:")
+        for keyword, op in checks:
+            self._emit(indent + 1, f"if {var} {op} {schema[keyword]!r}: return False")
+
+    def _string(self, schema: Dict[str, Any], var: str, indent: int):
+        if not any(k in schema for k in ("minLength", "maxLength", "pattern")):
+            return
+        self._emit(indent, f"if isinstance({var}, str):")
+        if "minLength" in schema:
+            self._emit(indent + 1, f"if len({var}) < {schema['minLength']}: return False")
+        if "maxLength" in schema:
+            self._emit(indent + 1, f"if len({var}) > {schema['maxLength']}: return False")
+        if "pattern" in schema:
+            regex = self._constant("_pattern", re.compile(schema["pattern"]))
+            self._emit(indent + 1, f"if {regex}.search({var}) is None: return False")
+
+    def _object(self, schema: Dict[str, Any], var: str, indent: int):
+        keywords = ("properties", "required", "additionalProperties",
+                    "minProperties", "maxProperties")
+        if not any(k in schema for k in keywords):
+            return
+        self._emit(indent, f"if isinstance({var}, dict):")
+        inner = indent + 1
+        self._emit(inner, "pass")
+        for key in schema.get("required", []):
+            self._emit(inner, f"if {key!r} not in {var}: return False")
+        if "minProperties" in schema:
+            self._emit(inner, f"if len({var}) < {schema['minProperties']}: return False")
+        if "maxProperties" in schema:
+            self._emit(inner, f"if len({var}) > {schema['maxProperties']}: return False")
+
+        properties = schema.get("properties", {})
+        for key, subschema in properties.items():
+            if subschema is True or subschema == {}:
+                continue
+            child = self._name("v")
+            self._emit(inner, f"if {key!r} in {var}:")
+            self._emit(inner + 1, f"{child} = {var}[{key!r}]")
+            self.schema(subschema, child, inner + 1)
+
+        additional = schema.get("additionalProperties", True)
+        if additional is True or additional == {}:
+            return
+        known = self._constant("_known", frozenset(properties))
+        if additional is False:
+            self._emit(inner, f"if not {known}.issuperset({var}): return False")
+            return
+        key_var = self._name("k")
+        child = self._name("v")
+        self._emit(inner, f"for {key_var}, {child} in {var}.items():")
+        self._emit(inner + 1, f"if {key_var} not in {known}:")
+        self.schema(additional, child, inner + 2)
+
+    def _array(self, schema: Dict[str, Any], var: str, indent: int):
+        if not any(k in schema for k in ("items", "minItems", "maxItems")):
+            return
+        self._emit(indent, f"if isinstance({var}, list):")
+        inner = indent + 1
+        self._emit(inner, "pass")
+        if "minItems" in schema:
+            self._emit(inner, f"if len({var}) < {schema['minItems']}: return False")
+        if "maxItems" in schema:
+            self._emit(inner, f"if len({var}) > {schema['maxItems']}: return False")
+        items = schema.get("items", True)
+        if items is True or items == {}:
+            return
+        child = self._name("v")
+        self._emit(inner, f"for {child} in {var}:")
+        self.schema(items, child, inner + 1)
+
+
+def compile_schema(
+    schema: Any, code_cache: Optional[Dict[str, bytes]] = None
+) -> Callable[[Any], bool]:
+    """
+    Compile a JSON Schema into a function returning True if an instance is valid.
+
+    Raises SchemaCompileError if the schema cannot be compiled; callers should
+    then use Draft7Validator directly.
+
+    code_cache maps a hash of the generated source to its marshalled code
+    object. Byte-compiling the source is most of the cost, so a cache
+    carried across restarts (see ruleset) skips it.
+    """
+    if _contains_ref(schema):
+        raise SchemaCompileError("Schemas using $ref are not compiled")
+
+    generator = _CodeGenerator()
+    generator.schema(schema, "v0", 1)
+    source = "\n".join(["def validate(v0):"] + generator.lines + ["    return True"])
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    cached = code_cache.get(key) if code_cache is not None else None
+    if cached is not None:
+        code = marshal.loads(cached)
+    else:
+        try:
+            code = compile(source, "<compiled-schema>", "exec")
+        except (SyntaxError, RecursionError) as exc:
+            # e.g. arrays nested deeper than Python's static block limit
+            raise SchemaCompileError(f"Generated validator does not compile: {exc}") from exc
+        if code_cache is not None:
+            code_cache[key] = marshal.dumps(code)
+
+    namespace = dict(generator.namespace)
+    exec(code, namespace)  # noqa: S102 - source is generated from the schema above
+    _LOGGER.debug(
+        "Compiled schema into %d lines (%d interpreted subschemas)",
+        len(generator.lines),
+        generator.fallbacks,
+    )
+    return namespace["validate"]
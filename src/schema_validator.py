@@ -1,13 +1,36 @@
 import json
 import logging
 from pathlib import Path
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 from jsonschema import Draft7Validator, ValidationError
 
+from message_context import MessageContext
+from proto_schema import ProtoValidator, load_proto_file
+from schema_compiler import SchemaCompileError, compile_schema
+
 
 _LOGGER = logging.getLogger(__name__)
 
+ValidationResult = Tuple[bool, str]
+
+# Per-schema check with the validators and format branch already resolved
+_Checker = Callable[[MessageContext], ValidationResult]
+
+
+def _looks_like_json(payload: bytes) -> bool:
+    """
+    True if the first non-whitespace byte opens a JSON object.
+
+    Binary protobuf can start the same way (0x0A is the tag of field 1 as
+    length-delimited, 0x7B a length of 123), so this only decides whether a
+    JSON attempt is worthwhile, never that a payload is not protobuf.
+    """
+    for byte in payload:
+        if byte not in b" \t\r\n":
+            return byte == 0x7B  # '{'
+    return False
+
 
 class SchemaValidationError(Exception):
     """Exception raised when schema validation fails."""
@@ -19,21 +42,70 @@ class SchemaValidator:
     Validate payloads against configured schemas.
     Supports JSON Schema (validated via jsonschema) and a simplified Protobuf validation
     that checks for presence and basic types of fields using a lightweight rule-set.
+
+    JSON Schemas are checked by one of two engines:
+      - 'interpreted': jsonschema.Draft7Validator
+      - 'compiled': a generated Python function per schema (see schema_compiler),
+        with Draft7Validator used for error messages and uncompilable schemas
     """
 
-    def __init__(self, config):
+    def __init__(self, config, engine: Optional[str] = None):
         """
         config: LoadedProxyConfig object with schema files configuration
+        engine: 'interpreted' or 'compiled'; defaults to config.schema_engine
         """
         # Convert config.schema_files to the expected format
         self.schema_files = {}
         for schema_id, schema_file_config in config.schema_files.items():
             self.schema_files[schema_id] = {
                 'file': schema_file_config.file,
-                'format': schema_file_config.format
+                'format': schema_file_config.format,
+                'message': getattr(schema_file_config, 'message', None),
+                'encoding': getattr(schema_file_config, 'encoding', 'auto')
             }
+        self.engine = engine or getattr(config, "schema_engine", "interpreted")
+        if self.engine not in ("interpreted", "compiled"):
+            raise ValueError(f"Unknown schema engine: {self.engine}")
         self._json_validators: Dict[str, Draft7Validator] = {}
+        self._compiled_validators: Dict[str, Optional[Callable[[Any], bool]]] = {}
         self._protobuf_rules: Dict[str, Dict[str, str]] = {}
+        self._protobuf_validators: Dict[str, ProtoValidator] = {}
+        self._checkers: Dict[str, _Checker] = {}
+        # Marshalled code of compiled schemas; pickled along with the validator
+        self._code_cache: Dict[str, bytes] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Validators and generated functions do not pickle; keep the loaded
+        # schema documents and rebuild from them in __setstate__
+        state = self.__dict__.copy()
+        state["_json_validators"] = {
+            schema_id: validator.schema for schema_id, validator in self._json_validators.items()
+        }
+        state["_compiled_validators"] = {}
+        state["_checkers"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]):
+        schemas = state.pop("_json_validators")
+        self.__dict__.update(state)
+        self._json_validators = {}
+        for schema_id, schema_obj in schemas.items():
+            self._install_json_schema(schema_id, schema_obj)
+
+    def preload(self):
+        """Load (and compile) every configured schema now rather than on first use."""
+        for schema_id, cfg in self.schema_files.items():
+            try:
+                if cfg["format"] == "jsonschema":
+                    self._load_json_schema(schema_id)
+                elif cfg["format"] == "protobuf":
+                    encoding = cfg.get("encoding", "auto")
+                    if encoding != "json":
+                        self._load_protobuf_validator(schema_id)
+                    if encoding != "binary":
+                        self._load_protobuf_rules(schema_id)
+            except Exception as exc:  # noqa: BLE001
+                _LOGGER.warning("Could not preload schema %s: %s", schema_id, exc)
 
     def _load_json_schema(self, schema_id: str) -> Draft7Validator:
         if schema_id in self._json_validators:
@@ -46,8 +118,38 @@ class SchemaValidator:
             raise FileNotFoundError(f"Schema file not found: {path}")
         with path.open("r", encoding="utf-8") as f:
             schema_obj = json.load(f)
+        return self._install_json_schema(schema_id, schema_obj)
+
+    def _install_json_schema(self, schema_id: str, schema_obj: Any) -> Draft7Validator:
         validator = Draft7Validator(schema_obj)
         self._json_validators[schema_id] = validator
+        if self.engine == "compiled":
+            try:
+                self._compiled_validators[schema_id] = compile_schema(
+                    schema_obj, self._code_cache
+                )
+            except SchemaCompileError as exc:
+                _LOGGER.info("Schema %s not compiled, using Draft7Validator: %s", schema_id, exc)
+                self._compiled_validators[schema_id] = None
+        return validator
+
+    def _load_protobuf_validator(self, schema_id: str) -> ProtoValidator:
+        """Parse the .proto file into descriptors for binary wire-format validation."""
+        if schema_id in self._protobuf_validators:
+            return self._protobuf_validators[schema_id]
+        cfg = self.schema_files.get(schema_id)
+        if not cfg:
+            raise FileNotFoundError(f"Schema id not configured: {schema_id}")
+        path = Path(cfg["file"]).resolve()
+        if not path.exists():
+            raise FileNotFoundError(f"Protobuf schema file not found: {path}")
+        proto_file = load_proto_file(str(path))
+        message_name = cfg.get("message") or (proto_file.top_level[0] if proto_file.top_level else None)
+        message = proto_file.find_message(message_name) if message_name else None
+        if message is None:
+            raise ValueError(f"Protobuf message '{message_name}' not found in {path}")
+        validator = ProtoValidator(message)
+        self._protobuf_validators[schema_id] = validator
         return validator
 
     def _load_protobuf_rules(self, schema_id: str) -> Dict[str, str]:
@@ -82,46 +184,124 @@ class SchemaValidator:
         self._protobuf_rules[schema_id] = rules
         return rules
 
-    def validate(self, schema_id: str, payload_bytes: bytes) -> Tuple[bool, str]:
-        cfg = self.schema_files.get(schema_id)
-        if not cfg:
-            return False, f"Unknown schema id: {schema_id}"
-        fmt = cfg.get("format", "jsonschema").lower()
-        try:
+    def _get_checker(self, schema_id: str) -> Optional[_Checker]:
+        """Return the cached check for a schema, building it on first use; None if unknown."""
+        checker = self._checkers.get(schema_id)
+        if checker is None:
+            cfg = self.schema_files.get(schema_id)
+            if not cfg:
+                return None
+            fmt = cfg.get("format", "jsonschema").lower()
             if fmt == "jsonschema":
-                validator = self._load_json_schema(schema_id)
-                try:
-                    payload_obj = json.loads(payload_bytes.decode("utf-8"))
-                except Exception as exc:  # noqa: BLE001
-                    return False, f"Invalid JSON: {exc}"
-                try:
-                    validator.validate(payload_obj)
-                    return True, ""
-                except ValidationError as ve:
-                    return False, f"JSON Schema validation failed: {ve.message}"
+                checker = self._json_schema_checker(schema_id)
             elif fmt == "protobuf":
-                # Assume payload is JSON for governance purposes; validate required fields/types
-                try:
-                    payload_obj = json.loads(payload_bytes.decode("utf-8"))
-                except Exception as exc:  # noqa: BLE001
-                    return False, f"Invalid JSON for protobuf payload: {exc}"
-                rules = self._load_protobuf_rules(schema_id)
-                missing = [k for k in rules.keys() if k not in payload_obj]
-                if missing:
-                    return False, f"Missing fields for protobuf payload: {', '.join(missing)}"
-                for field, expected in rules.items():
-                    val = payload_obj.get(field)
-                    if expected == "string" and not isinstance(val, str):
-                        return False, f"Field '{field}' expected string"
-                    if expected == "number" and not isinstance(val, (int, float)):
-                        return False, f"Field '{field}' expected number"
-                return True, ""
+                checker = self._protobuf_checker(schema_id, cfg.get("encoding", "auto"))
             else:
-                return False, f"Unsupported schema format: {fmt}"
+                reason = f"Unsupported schema format: {fmt}"
+                checker = lambda context: (False, reason)  # noqa: E731
+            self._checkers[schema_id] = checker
+        return checker
+
+    def _json_schema_checker(self, schema_id: str) -> _Checker:
+        validator = self._load_json_schema(schema_id)
+        compiled = self._compiled_validators.get(schema_id)
+
+        def check(context: MessageContext) -> ValidationResult:
+            try:
+                payload_obj = context.json()
+            except ValueError as exc:
+                return False, f"Invalid JSON: {exc}"
+            if compiled is not None and compiled(payload_obj):
+                return True, ""
+            # Interpreted path; also produces the error message for the compiled engine
+            try:
+                validator.validate(payload_obj)
+                return True, ""
+            except ValidationError as ve:
+                return False, f"JSON Schema validation failed: {ve.message}"
+
+        return check
+
+    def _protobuf_checker(self, schema_id: str, encoding: str) -> _Checker:
+        # 'auto' decodes as binary first and falls back to JSON only when that
+        # fails, so each loader runs on first need
+        def check(context: MessageContext) -> ValidationResult:
+            if encoding != "json":
+                valid, reason = self._load_protobuf_validator(schema_id).validate(
+                    context.payload
+                )
+                if valid:
+                    return True, ""
+                if encoding == "binary" or not _looks_like_json(context.payload):
+                    return False, f"Protobuf validation failed: {reason}"
+            # JSON fallback: validate required fields/types of JSON-encoded telemetry
+            try:
+                payload_obj = context.json()
+            except ValueError as exc:
+                return False, f"Invalid JSON for protobuf payload: {exc}"
+            rules = self._load_protobuf_rules(schema_id)
+            missing = [k for k in rules.keys() if k not in payload_obj]
+            if missing:
+                return False, f"Missing fields for protobuf payload: {', '.join(missing)}"
+            for field, expected in rules.items():
+                val = payload_obj.get(field)
+                if expected == "string" and not isinstance(val, str):
+                    return False, f"Field '{field}' expected string"
+                if expected == "number" and not isinstance(val, (int, float)):
+                    return False, f"Field '{field}' expected number"
+            return True, ""
+
+        return check
+
+    def validate(
+        self, schema_id: str, payload: Union[bytes, MessageContext]
+    ) -> ValidationResult:
+        """
+        Validate a payload against a configured schema.
+
+        payload may be raw bytes or a MessageContext; with a context the JSON
+        parse result is cached on it and shared with later stages.
+        """
+        context = payload if isinstance(payload, MessageContext) else MessageContext(None, payload)
+        try:
+            checker = self._get_checker(schema_id)
+            if checker is None:
+                return False, f"Unknown schema id: {schema_id}"
+            return checker(context)
         except FileNotFoundError as fnf:
             return False, str(fnf)
         except Exception as exc:  # noqa: BLE001
             _LOGGER.exception("Unexpected schema validation error")
             return False, f"Schema validation error: {exc}"
 
+    def validate_batch(
+        self, schema_id: str, payloads: Sequence[Union[bytes, MessageContext]]
+    ) -> List[ValidationResult]:
+        """
+        Validate several payloads against one schema.
+
+        Schema lookup, loading and the format branch happen once for the
+        whole batch. Returns one (is_valid, reason) per payload, in order.
+        """
+        try:
+            checker = self._get_checker(schema_id)
+        except FileNotFoundError as fnf:
+            return [(False, str(fnf))] * len(payloads)
+        except Exception as exc:  # noqa: BLE001
+            _LOGGER.exception("Unexpected schema validation error")
+            return [(False, f"Schema validation error: {exc}")] * len(payloads)
+        if checker is None:
+            return [(False, f"Unknown schema id: {schema_id}")] * len(payloads)
 
+        results: List[ValidationResult] = []
+        append = results.append
+        for payload in payloads:
+            context = payload if isinstance(payload, MessageContext) else MessageContext(None, payload)
+            try:
+                append(checker(context))
+            except FileNotFoundError as fnf:
+                append((False, str(fnf)))
+            except Exception as exc:  # noqa: BLE001
+                _LOGGER.exception("Unexpected schema validation error")
+                append((False, f"Schema validation error: {exc}"))
+        return results
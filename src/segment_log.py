@@ -0,0 +1,329 @@
+"""
+Segment Log Module
+
+Append-only backup log of quarantined messages. It replaces the old layout
+of one JSON file per message.
+
+Records are appended to numbered segment files. Each record is framed as:
+
+    length (4 bytes) | crc32 (4 bytes) | header length (4 bytes) | header | payload
+
+All integers are big-endian. The header is compact JSON with the message
+id, timestamps, topic, reason, sizes, occurrence count and metadata. The
+payload follows as raw bytes. The crc32 covers everything after the crc,
+so a torn write at the end of a segment is detected and ignored by
+readers.
+
+A segment is closed and a new one started when it reaches max_bytes or has
+been open for max_age_seconds. Next to every segment, an index file holds
+one fixed-size (message id, offset) entry per record. Readers can seek to a
+message without scanning.
+
+Writes are synchronous. The quarantine store calls append() from a worker
+thread during its batched flush.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+
+SUPPORTED_FSYNC_POLICIES = {"batch", "segment", "never"}
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+# length, crc32 of the rest, header length
+_FRAME = struct.Struct(">III")
+# sha1 message id (raw digest) and record offset
+_INDEX_ENTRY = struct.Struct(">20sQ")
+
+
+@dataclass
+class LogRecord:
+    """One quarantined message read back from the segment log."""
+    id: str
+    received_at: datetime
+    last_seen_at: datetime
+    topic: str
+    reason: str
+    payload: bytes
+    payload_size: int
+    occurrence_count: int = 1
+    metadata: Optional[Dict[str, Any]] = None
+    # Where the record was read from
+    segment: int = 0
+    offset: int = 0
+
+
+def encode_record(
+    message_id: str,
+    received_at: str,
+    last_seen_at: str,
+    topic: str,
+    reason: str,
+    payload: bytes,
+    payload_size: int,
+    occurrence_count: int = 1,
+    metadata: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Frame one record for appending to a segment."""
+    header = json.dumps({
+        'id': message_id,
+        'received_at': received_at,
+        'last_seen_at': last_seen_at,
+        'topic': topic,
+        'reason': reason,
+        'payload_size': payload_size,
+        'occurrence_count': occurrence_count,
+        'metadata': metadata,
+    }, separators=(',', ':')).encode('utf-8')
+    header_length = struct.pack(">I", len(header))
+    crc = zlib.crc32(payload, zlib.crc32(header, zlib.crc32(header_length)))
+    return struct.pack(">II", 4 + len(header) + len(payload), crc) + header_length + header + payload
+
+
+def _index_key(message_id: str) -> bytes:
+    """
+    20-byte index key of a message id.
+
+    Ids are "<partition key>:<sha1 hex>" and are hashed whole, since the same
+    digest recurs in every partition the message lands in. Bare sha1 hex ids,
+    written before partitioning, are used as-is.
+    """
+    if len(message_id) == 40:
+        try:
+            return bytes.fromhex(message_id)
+        except ValueError:
+            pass
+    return hashlib.sha1(message_id.encode('utf-8')).digest()
+
+
+class SegmentLog:
+    """Writer side of the segment log."""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_age_seconds: float = 3600.0,
+        fsync: str = "segment"
+    ):
+        """
+        Args:
+            directory: Directory holding the segment and index files
+            max_bytes: Segment size that triggers a rollover
+            max_age_seconds: Segment age that triggers a rollover
+            fsync: 'batch' to fsync after every append(), 'segment' to fsync
+                once when a segment is closed, 'never' to leave it to the OS
+        """
+        if fsync not in SUPPORTED_FSYNC_POLICIES:
+            raise ValueError(f"Unsupported fsync policy {fsync!r}; use one of {sorted(SUPPORTED_FSYNC_POLICIES)}")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.fsync = fsync
+
+        self.logger = logging.getLogger(__name__)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._segment_number = 0
+        self._segment = None
+        self._index = None
+        self._segment_size = 0
+        self._segment_opened = 0.0
+
+    def _segment_path(self, number: int) -> Path:
+        return self.directory / f"{number:010d}{SEGMENT_SUFFIX}"
+
+    def _open_next_segment(self):
+        """Start a new segment after the highest existing one."""
+        existing = segment_numbers(self.directory)
+        self._segment_number = max(existing[-1] if existing else 0, self._segment_number) + 1
+        path = self._segment_path(self._segment_number)
+        self._segment = open(path, 'ab')
+        self._index = open(path.with_suffix(INDEX_SUFFIX), 'ab')
+        self._segment_size = 0
+        self._segment_opened = time.monotonic()
+        self.logger.debug(f"Opened quarantine log segment {path}")
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        self._segment.flush()
+        self._index.flush()
+        if self.fsync != "never":
+            os.fsync(self._segment.fileno())
+            os.fsync(self._index.fileno())
+        self._segment.close()
+        self._index.close()
+        self._segment = None
+        self._index = None
+
+    def append(self, records: List[Tuple[str, bytes]]):
+        """
+        Append framed records (message id, encode_record() output).
+
+        Rolls over before the batch when the current segment is full or too
+        old, so a batch never spans two segments.
+        """
+        if not records:
+            return
+        if self._segment is not None and (
+            self._segment_size >= self.max_bytes
+            or time.monotonic() - self._segment_opened >= self.max_age_seconds
+        ):
+            self._close_segment()
+        if self._segment is None:
+            self._open_next_segment()
+
+        offset = self._segment_size
+        entries = []
+        for message_id, record in records:
+            entries.append(_INDEX_ENTRY.pack(_index_key(message_id), offset))
+            offset += len(record)
+        self._segment.write(b"".join(record for _, record in records))
+        self._index.write(b"".join(entries))
+        self._segment_size = offset
+
+        self._segment.flush()
+        self._index.flush()
+        if self.fsync == "batch":
+            os.fsync(self._segment.fileno())
+            os.fsync(self._index.fileno())
+
+    def close(self):
+        """Close (and per the fsync policy, sync) the open segment."""
+        self._close_segment()
+
+
+def segment_numbers(directory: Union[str, Path]) -> List[int]:
+    """Numbers of the segments in a directory, oldest first."""
+    numbers = []
+    for path in Path(directory).glob(f"*{SEGMENT_SUFFIX}"):
+        try:
+            numbers.append(int(path.stem))
+        except ValueError:
+            continue
+    return sorted(numbers)
+
+
+class SegmentLogReader:
+    """Streams records from a segment log or seeks to one by message id."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.logger = logging.getLogger(__name__)
+        # index key -> (segment, offset), loaded on first lookup
+        self._index: Optional[Dict[bytes, Tuple[int, int]]] = None
+
+    def _segment_path(self, number: int) -> Path:
+        return self.directory / f"{number:010d}{SEGMENT_SUFFIX}"
+
+    def segments(self) -> List[int]:
+        return segment_numbers(self.directory)
+
+    def scan(self, start_segment: int = 0, start_offset: int = 0) -> Iterator[LogRecord]:
+        """Yield records in log order, starting at a segment and offset."""
+        for number in self.segments():
+            if number < start_segment:
+                continue
+            offset = start_offset if number == start_segment else 0
+            yield from self._read_segment(number, offset)
+
+    def _read_segment(self, number: int, offset: int) -> Iterator[LogRecord]:
+        path = self._segment_path(number)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                record = self._read_record(f, number, offset)
+                if record is None:
+                    return
+                yield record
+                offset = f.tell()
+
+    def _read_record(self, f, segment: int, offset: int) -> Optional[LogRecord]:
+        """Read the record at the file position; None at the end or on a torn record."""
+        frame = f.read(_FRAME.size)
+        if len(frame) < _FRAME.size:
+            return None
+        length, crc, header_length = _FRAME.unpack(frame)
+        body = f.read(length - 4)
+        if len(body) < length - 4 or zlib.crc32(body, zlib.crc32(frame[8:])) != crc:
+            self.logger.warning(f"Stopping at incomplete record in segment {segment} at offset {offset}")
+            return None
+        header = json.loads(body[:header_length])
+        return LogRecord(
+            id=header['id'],
+            received_at=datetime.fromisoformat(header['received_at']),
+            last_seen_at=datetime.fromisoformat(header['last_seen_at']),
+            topic=header['topic'],
+            reason=header['reason'],
+            payload=body[header_length:],
+            payload_size=header['payload_size'],
+            occurrence_count=header['occurrence_count'],
+            metadata=header['metadata'],
+            segment=segment,
+            offset=offset,
+        )
+
+    def _load_index(self) -> Dict[bytes, Tuple[int, int]]:
+        index: Dict[bytes, Tuple[int, int]] = {}
+        for number in self.segments():
+            data = self._segment_path(number).with_suffix(INDEX_SUFFIX).read_bytes()
+            usable = len(data) - len(data) % _INDEX_ENTRY.size
+            # Later entries win: the newest record of a message
+            for key, offset in _INDEX_ENTRY.iter_unpack(data[:usable]):
+                index[key] = (number, offset)
+        return index
+
+    def seek(self, segment: int, offset: int) -> Optional[LogRecord]:
+        """Read the record at a known position."""
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return self._read_record(f, segment, offset)
+
+    def get(self, message_id: str) -> Optional[LogRecord]:
+        """Newest record of a message, found through the index."""
+        if self._index is None:
+            self._index = self._load_index()
+        position = self._index.get(_index_key(message_id))
+        if position is None:
+            return None
+        record = self.seek(*position)
+        if record is None or record.id != message_id:
+            return None
+        return record
+
+
+if __name__ == "__main__":
+    # Dump a segment log as JSON lines
+    import sys
+
+    for entry in SegmentLogReader(sys.argv[1] if len(sys.argv) > 1 else "quarantine").scan():
+        try:
+            payload_text = entry.payload.decode('utf-8')
+        except UnicodeDecodeError:
+            payload_text = None
+        print(json.dumps({
+            'id': entry.id,
+            'received_at': entry.received_at.isoformat(),
+            'last_seen_at': entry.last_seen_at.isoformat(),
+            'topic': entry.topic,
+            'reason': entry.reason,
+            'payload_size': entry.payload_size,
+            'occurrence_count': entry.occurrence_count,
+            'metadata': entry.metadata or {},
+            'payload_hex': entry.payload.hex(),
+            'payload_text': payload_text,
+            'segment': entry.segment,
+            'offset': entry.offset,
+        }, ensure_ascii=False))
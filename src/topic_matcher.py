@@ -0,0 +1,254 @@
+"""
+Topic Matcher Module
+
+This module compiles MQTT topic patterns into a level-by-level trie so that
+a topic can be resolved against every configured rule table in one walk.
+Walk cost tracks topic depth rather than the number of configured patterns.
+"""
+
+import logging
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils import compile_regex
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+# Rule table indexes used by ProxyConfig
+ALLOW_TABLE = 0
+SCHEMA_TABLE = 1
+
+# (rule order within its table, value)
+_Entry = Tuple[int, Any]
+
+# (allowed, reason, schema_id) as returned by ProxyConfig.resolve_topic
+TopicDecision = Tuple[bool, str, Optional[str]]
+
+# Approximate per-entry cost of the OrderedDict (hash slot, key/value
+# pointers and the linked-list node used for LRU order)
+_CACHE_ENTRY_OVERHEAD = 104
+
+
+class _TrieNode:
+    """Single topic level in the pattern trie."""
+
+    __slots__ = ("children", "plus", "terminal", "hash_terminal")
+
+    def __init__(self, table_count: int):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.plus: Optional["_TrieNode"] = None
+        # First entry per table that ends exactly at this node
+        self.terminal: List[Optional[_Entry]] = [None] * table_count
+        # First entry per table with a trailing '#' at this node
+        self.hash_terminal: List[Optional[_Entry]] = [None] * table_count
+
+
+def is_trie_pattern(pattern: str) -> bool:
+    """
+    Return True if the pattern can be compiled into the trie.
+
+    Regex rules and wildcards that do not occupy a whole level
+    (e.g. 'a+b' or a non-trailing '#') are matched via regex fallback instead.
+    """
+    if pattern.startswith("regex:"):
+        return False
+    levels = pattern.split("/")
+    last = len(levels) - 1
+    for index, level in enumerate(levels):
+        if "#" in level:
+            if level != "#" or index != last:
+                return False
+        elif "+" in level and level != "+":
+            return False
+    return True
+
+
+class TopicMatcher:
+    """
+    Compiled matcher for one or more ordered rule tables.
+
+    Each table is an ordered sequence of (pattern, value) pairs. For every
+    table, match() returns the value of the first pattern (in table order)
+    that matches the topic, or None, preserving the first-match semantics
+    of utils.match_topic.
+    """
+
+    def __init__(self, tables: Sequence[Iterable[Tuple[str, Any]]]):
+        self._table_count = len(tables)
+        self._root = _TrieNode(self._table_count)
+        # Per table, regex fallbacks sorted by rule order
+        self._regex_rules: List[List[Tuple[int, re.Pattern[str], Any]]] = [
+            [] for _ in range(self._table_count)
+        ]
+        self.pattern_count = 0
+
+        for table_index, rules in enumerate(tables):
+            for order, (pattern, value) in enumerate(rules):
+                self._add(table_index, order, pattern, value)
+                self.pattern_count += 1
+
+        _LOGGER.debug(
+            "Compiled topic matcher: %d patterns, %d regex fallbacks",
+            self.pattern_count,
+            sum(len(r) for r in self._regex_rules),
+        )
+
+    def _add(self, table_index: int, order: int, pattern: str, value: Any):
+        if not is_trie_pattern(pattern):
+            self._regex_rules[table_index].append((order, compile_regex(pattern), value))
+            return
+
+        node = self._root
+        levels = pattern.split("/")
+        for level in levels:
+            if level == "#":
+                # '#' is always the last level here
+                if node.hash_terminal[table_index] is None:
+                    node.hash_terminal[table_index] = (order, value)
+                return
+            if level == "+":
+                if node.plus is None:
+                    node.plus = _TrieNode(self._table_count)
+                node = node.plus
+            else:
+                child = node.children.get(level)
+                if child is None:
+                    child = node.children[level] = _TrieNode(self._table_count)
+                node = child
+        if node.terminal[table_index] is None:
+            node.terminal[table_index] = (order, value)
+
+    @staticmethod
+    def _offer(best: List[Optional[_Entry]], entries: List[Optional[_Entry]]):
+        for index, entry in enumerate(entries):
+            if entry is not None:
+                current = best[index]
+                if current is None or entry[0] < current[0]:
+                    best[index] = entry
+
+    def match(self, topic: str) -> Tuple[Optional[Any], ...]:
+        """
+        Resolve a topic against every rule table in a single walk.
+
+        Returns a tuple with one value per table (None if no rule matched).
+        """
+        best: List[Optional[_Entry]] = [None] * self._table_count
+        levels = topic.split("/")
+        depth_limit = len(levels)
+
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            # Trailing '#' matches one or more remaining levels
+            if depth < depth_limit:
+                self._offer(best, node.hash_terminal)
+            else:
+                self._offer(best, node.terminal)
+                continue
+            level = levels[depth]
+            child = node.children.get(level)
+            if child is not None:
+                stack.append((child, depth + 1))
+            # '+' matches exactly one non-empty level
+            if node.plus is not None and level:
+                stack.append((node.plus, depth + 1))
+
+        for table_index, regex_rules in enumerate(self._regex_rules):
+            for order, regex, value in regex_rules:
+                current = best[table_index]
+                if current is not None and current[0] < order:
+                    break
+                if regex.match(topic) is not None:
+                    best[table_index] = (order, value)
+                    break
+
+        return tuple(entry[1] if entry is not None else None for entry in best)
+
+
+def compile_topic_rules(
+    topic_patterns: Iterable[str], schema_mappings: Dict[str, str]
+) -> TopicMatcher:
+    """
+    Build the matcher used by ProxyConfig.
+
+    The ALLOW_TABLE maps each allowed pattern to itself and the SCHEMA_TABLE
+    maps mapping patterns to schema ids.
+    """
+    return TopicMatcher(
+        [
+            [(pattern, pattern) for pattern in topic_patterns],
+            list(schema_mappings.items()),
+        ]
+    )
+
+
+class TopicDecisionCache:
+    """
+    Bounded LRU cache of topic -> TopicDecision.
+
+    Decisions depend only on the topic string and the compiled rules, so a
+    cache belongs to one ProxyConfig and is dropped with it on reload.
+    A capacity of 0 disables caching. Safe to share between threads.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, TopicDecision]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate memory held by cached keys, decisions and dict entries."""
+        return self._memory_bytes
+
+    @staticmethod
+    def _entry_size(topic: str, decision: TopicDecision) -> int:
+        # schema ids are shared with the config and not counted
+        size = _CACHE_ENTRY_OVERHEAD + sys.getsizeof(topic) + sys.getsizeof(decision)
+        if decision[1]:
+            size += sys.getsizeof(decision[1])
+        return size
+
+    def get(self, topic: str) -> Optional[TopicDecision]:
+        """Return the cached decision for a topic, or None on a miss."""
+        with self._lock:
+            decision = self._entries.get(topic)
+            if decision is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(topic)
+            self.hits += 1
+            return decision
+
+    def put(self, topic: str, decision: TopicDecision):
+        """Cache a decision, evicting least recently used entries over capacity."""
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            if topic in self._entries:
+                self._entries.move_to_end(topic)
+                return
+            self._entries[topic] = decision
+            self._memory_bytes += self._entry_size(topic, decision)
+            while len(self._entries) > self.capacity:
+                old_topic, old_decision = self._entries.popitem(last=False)
+                self._memory_bytes -= self._entry_size(old_topic, old_decision)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached decisions; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
@@ -1,5 +1,5 @@
 import logging
-from typing import Iterable, List, Tuple, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 from utils import match_topic
 
@@ -16,7 +16,25 @@ class TopicValidator:
     
     def validate(self, topic: str, client_id: str = "") -> Tuple[bool, str]:
         """Validate topic for a client."""
-        return validate_topic_for_client(client_id, topic, self.config.topic_patterns)
+        if not hasattr(self.config, "resolve_topic"):
+            return validate_topic_for_client(client_id, topic, self.config.topic_patterns)
+        is_valid, reason, _ = self.resolve(topic)
+        return is_valid, reason
+
+    def resolve(self, topic: str) -> Tuple[bool, str, Optional[str]]:
+        """
+        Validate a topic and look up its schema id in one (cached) lookup.
+
+        Returns (is_valid, reason, schema_id). schema_id is None if no
+        schema mapping matches, even when the topic itself is allowed.
+        """
+        if not hasattr(self.config, "resolve_topic"):
+            is_valid, reason = validate_topic(topic, self.config.topic_patterns)
+            return is_valid, reason, self.config.get_schema_for_topic(topic)
+        decision = self.config.resolve_topic(topic)
+        if not decision[0]:
+            _LOGGER.info(decision[1])
+        return decision
 
 
 def validate_topic(topic: str, rules: Iterable[str]) -> Tuple[bool, str]:
@@ -2,6 +2,7 @@ import hashlib
 import json
 import logging
 import re
+from functools import lru_cache
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional, Tuple
 
@@ -69,13 +70,10 @@ def match_topic(pattern: str, topic: str) -> bool:
     - If pattern starts with 'regex:' it is treated as a raw regex after the prefix
     - Otherwise, treat it as MQTT wildcard pattern
     """
-    if pattern.startswith("regex:"):
-        regex = pattern[len("regex:") :]
-    else:
-        regex = wildcard_to_regex(pattern)
-    return re.match(regex, topic) is not None
+    return compile_regex(pattern).match(topic) is not None
 
 
+@lru_cache(maxsize=4096)
 def compile_regex(pattern: str) -> re.Pattern[str]:
     """Compile a regex or wildcard pattern into a regex Pattern."""
     if pattern.startswith("regex:"):
@@ -0,0 +1,172 @@
+"""
+Validation Pool Module
+
+Optional multi-process schema validation. Each worker process receives a
+pickled copy of the proxy's SchemaValidator once, in its initializer, and
+makes sure every configured schema is loaded. The event loop gathers
+validation requests into batches and ships each batch to a worker over the
+executor's pipe as (schema_id, payload) pairs. The worker answers with one
+compact entry per payload: None when valid, otherwise the failure reason.
+Parsing and validation then run on other cores, away from the proxy's GIL.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from metrics_exporter import MetricsExporter
+from schema_validator import SchemaValidator
+
+
+_LOGGER = logging.getLogger(__name__)
+
+# Per-process validator, built by _init_worker
+_worker_validator: Optional[SchemaValidator] = None
+
+
+def _init_worker(validator: SchemaValidator):
+    """Install and warm the worker's SchemaValidator (runs once per process)."""
+    global _worker_validator
+    _worker_validator = validator
+    _worker_validator.preload()
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _validate_batch(batch: List[Tuple[str, bytes]]) -> List[Optional[str]]:
+    """Validate a batch in a worker; None marks a valid payload, else the reason."""
+    positions: Dict[str, List[int]] = {}
+    for index, (schema_id, _) in enumerate(batch):
+        positions.setdefault(schema_id, []).append(index)
+    results: List[Optional[str]] = [None] * len(batch)
+    for schema_id, indexes in positions.items():
+        checked = _worker_validator.validate_batch(schema_id, [batch[i][1] for i in indexes])
+        for index, (ok, reason) in zip(indexes, checked):
+            if not ok:
+                results[index] = reason
+    return results
+
+
+class ValidationPool:
+    """Batches validation requests onto a pool of worker processes."""
+
+    def __init__(
+        self,
+        schema_validator: SchemaValidator,
+        processes: int,
+        batch_size: int = 64,
+        max_batch_delay_ms: float = 1.0,
+        metrics_exporter: Optional[MetricsExporter] = None
+    ):
+        """
+        Args:
+            schema_validator: Validator copied into every worker
+            processes: Number of worker processes
+            batch_size: Payloads sent to a worker at once
+            max_batch_delay_ms: Longest a partial batch waits before it is sent
+            metrics_exporter: Receives batch sizes and round-trip times
+        """
+        self.schema_validator = schema_validator
+        self.processes = max(1, processes)
+        self.batch_size = max(1, batch_size)
+        self.max_batch_delay = max_batch_delay_ms / 1000.0
+        self.metrics_exporter = metrics_exporter
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._pending: List[Tuple[str, bytes, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def start(self):
+        """Start the worker processes and wait until all have preloaded their schemas."""
+        self._loop = asyncio.get_running_loop()
+        # spawn: forking a process that runs paho and writer threads can
+        # copy locks in a held state
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.schema_validator,),
+        )
+        pids = await asyncio.gather(*(
+            self._loop.run_in_executor(self._executor, _worker_ready)
+            for _ in range(self.processes)
+        ))
+        _LOGGER.info(
+            f"Started {self.processes} validation processes "
+            f"({len(set(pids))} ready, batch size {self.batch_size})"
+        )
+
+    async def stop(self):
+        """Send any partial batch and shut the workers down."""
+        if self._executor is None:
+            return
+        if self._pending:
+            self._flush()
+        executor, self._executor = self._executor, None
+        await asyncio.to_thread(executor.shutdown, wait=True)
+        self._loop = None
+
+    async def validate(self, schema_id: str, payload: bytes) -> Tuple[bool, str]:
+        """Validate one payload in a worker process; returns (is_valid, reason)."""
+        if self._executor is None:
+            # Stopped, e.g. replaced on config reload: finish stragglers here
+            # with the same validator the workers had
+            return self.schema_validator.validate(schema_id, payload)
+        future = self._loop.create_future()
+        self._pending.append((schema_id, payload, future))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = self._loop.call_later(self.max_batch_delay, self._flush)
+        return await future
+
+    def _flush(self):
+        """Submit the pending requests as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        futures = [future for _, _, future in batch]
+        try:
+            submitted = self._executor.submit(
+                _validate_batch, [(schema_id, payload) for schema_id, payload, _ in batch]
+            )
+        except Exception as exc:  # noqa: BLE001 - e.g. BrokenProcessPool
+            self._fail(futures, exc)
+            return
+        started = time.monotonic()
+        submitted.add_done_callback(
+            lambda done: self._loop.call_soon_threadsafe(self._resolve, futures, done, started)
+        )
+
+    def _resolve(
+        self,
+        futures: List[asyncio.Future],
+        done: concurrent.futures.Future,
+        started: float
+    ):
+        exc = done.exception()
+        if exc is not None:
+            self._fail(futures, exc)
+            return
+        if self.metrics_exporter:
+            self.metrics_exporter.record_validation_batch(len(futures), time.monotonic() - started)
+        for future, reason in zip(futures, done.result()):
+            if not future.done():
+                future.set_result((True, "") if reason is None else (False, reason))
+
+    @staticmethod
+    def _fail(futures: List[asyncio.Future], exc: BaseException):
+        _LOGGER.error(f"Validation worker batch failed: {exc}")
+        for future in futures:
+            if not future.done():
+                future.set_result((False, f"Schema validation error: {exc}"))
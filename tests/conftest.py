@@ -0,0 +1,7 @@
+"""Shared test setup: the proxy modules import each other from src/."""
+
+import sys
+from pathlib import Path
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
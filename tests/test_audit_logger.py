@@ -0,0 +1,37 @@
+"""Tests for the queued audit writer."""
+
+import json
+import logging
+
+from audit_logger import AuditLogger
+
+
+class ListHandler(logging.Handler):
+    """Handler without a stream, like socket or queue handlers."""
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+def test_batches_reach_every_handler_through_its_own_settings(tmp_path):
+    audit = AuditLogger(str(tmp_path / "audit.jsonl"), console_output=False, queued=True)
+    warnings = ListHandler(logging.WARNING)
+    warnings.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+    audit.logger.addHandler(warnings)
+    filtered = ListHandler()
+    filtered.addFilter(lambda record: record.getMessage() != "skipped")
+    audit.logger.addHandler(filtered)
+
+    audit._log(logging.INFO, "info", {"topic": "a"})
+    audit._log(logging.WARNING, "warning", {"topic": "b"})
+    audit._log(logging.INFO, "skipped", {"topic": "c"})
+    audit.close()
+
+    lines = (tmp_path / "audit.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["info", "warning", "skipped"]
+    assert warnings.messages == ["WARNING warning"]
+    assert filtered.messages == ["info", "warning"]
@@ -0,0 +1,177 @@
+"""Tests for .proto parsing and wire-format validation."""
+
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+from config_loader import SchemaFileConfig
+from proto_schema import MAX_NESTING_DEPTH, ProtoValidator, parse_proto
+from schema_validator import SchemaValidator
+
+
+PROTO2 = """
+syntax = "proto2";
+package telemetry;
+
+enum Unit { UNKNOWN = -1; CELSIUS = 0; FAHRENHEIT = 1; }
+
+message Reading {
+  required string sensor_id = 1;
+  optional double value = 2;
+  optional Unit unit = 3;
+  repeated int32 samples = 4;
+  repeated fixed32 checksums = 5;
+  optional Location location = 6;
+  map<string, int64> counters = 7;
+  oneof source {
+    string gateway = 8;
+    bytes raw = 9;
+  }
+
+  message Location {
+    required float lat = 1;
+    required float lon = 2;
+  }
+}
+
+message Node {
+  optional Node child = 1;
+}
+"""
+
+PROTO3 = """
+syntax = "proto3";
+enum State { OFF = 0; ON = 1; }
+message Status { State state = 1; string name = 2; }
+"""
+
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def key(number, wire_type):
+    return varint(number << 3 | wire_type)
+
+
+def length_delimited(number, data):
+    return key(number, 2) + varint(len(data)) + data
+
+
+def location(lat=1.5, lon=2.5):
+    return key(1, 5) + struct.pack("<f", lat) + key(2, 5) + struct.pack("<f", lon)
+
+
+def reading(*fields):
+    return length_delimited(1, b"sensor-1") + b"".join(fields)
+
+
+@pytest.fixture(scope="module")
+def proto2():
+    return parse_proto(PROTO2)
+
+
+@pytest.fixture(scope="module")
+def validator(proto2):
+    return ProtoValidator(proto2.find_message("Reading"))
+
+
+@pytest.fixture
+def auto_validator(tmp_path):
+    """SchemaValidator for Reading with encoding 'auto'."""
+    path = tmp_path / "reading.proto"
+    path.write_text(PROTO2, encoding="utf-8")
+    schema = SchemaFileConfig(file=str(path), format="protobuf", message="Reading")
+    config = SimpleNamespace(schema_files={"reading": schema}, schema_engine="interpreted")
+    return SchemaValidator(config)
+
+
+def test_valid_payload_with_every_field_kind(validator):
+    payload = reading(
+        key(2, 1) + struct.pack("<d", 21.5),
+        key(3, 0) + varint(1),
+        key(4, 0) + varint(7),
+        # Packed repeated fields
+        length_delimited(4, varint(1) + varint(300) + varint(2 ** 40)),
+        length_delimited(5, struct.pack("<II", 1, 2)),
+        length_delimited(6, location()),
+        length_delimited(7, length_delimited(1, b"restarts") + key(2, 0) + varint(3)),
+        length_delimited(8, "gw-ü".encode("utf-8")),
+    )
+    assert validator.validate(payload) == (True, "")
+
+
+def test_unknown_fields_are_allowed(validator):
+    assert validator.validate(reading(key(99, 0) + varint(5), length_delimited(100, b"\xff")))[0]
+
+
+@pytest.mark.parametrize("payload, reason", [
+    (b"", "Missing required fields: sensor_id"),
+    (reading(key(2, 0) + varint(1)), "Field 'value' has wire type 0, expected 1"),
+    (reading(length_delimited(6, key(1, 5) + struct.pack("<f", 1.0))),
+     "Missing required fields: location.lon"),
+    (reading(length_delimited(6, key(1, 0) + varint(1))),
+     "Field 'location.lat' has wire type 0, expected 5"),
+    (reading(length_delimited(8, b"\xff\xfe")), "Field 'gateway' is not valid UTF-8"),
+    (reading(key(3, 0) + varint(7)), "Field 'unit' has unknown enum value 7"),
+    (reading(length_delimited(5, b"\x01\x02\x03")), "Field 'checksums' has a truncated packed value"),
+    (reading(key(2, 1) + b"\x00\x00"), "Truncated field 2 at offset"),
+    (reading(b"\x10\xff"), "Truncated varint at offset"),
+    (reading(key(0, 0) + varint(1)), "Invalid field number 0"),
+    (reading(key(4, 3)), "Unsupported wire type 3"),
+])
+def test_invalid_payloads_are_rejected(validator, payload, reason):
+    valid, message = validator.validate(payload)
+    assert not valid
+    assert message.startswith(reason)
+
+
+def test_nesting_depth_is_limited(proto2):
+    validator = ProtoValidator(proto2.find_message("telemetry.Node"))
+    payload = b""
+    for _ in range(MAX_NESTING_DEPTH):
+        payload = length_delimited(1, payload)
+    assert validator.validate(payload) == (True, "")
+    assert validator.validate(length_delimited(1, payload)) == (False, "Message nesting too deep")
+
+
+def test_negative_enum_values_are_sign_extended(validator):
+    assert validator.validate(reading(key(3, 0) + varint((1 << 64) - 1))) == (True, "")
+    valid, reason = validator.validate(reading(key(3, 0) + varint((1 << 64) - 2)))
+    assert not valid
+    assert reason == "Field 'unit' has unknown enum value -2"
+
+
+def test_proto3_enums_are_open():
+    validator = ProtoValidator(parse_proto(PROTO3).find_message("Status"))
+    assert validator.validate(key(1, 0) + varint(42) + length_delimited(2, b"pump")) == (True, "")
+
+
+@pytest.mark.parametrize("payload", [
+    # Tag of field 1 as length-delimited, then a length of 123: "\n{"
+    length_delimited(1, b"s" * 123),
+    # Whitespace bytes, then a string that starts with '{'
+    length_delimited(1, b"{" + b"s" * 31),
+])
+def test_auto_encoding_decodes_binary_that_looks_like_json(auto_validator, payload):
+    assert payload.lstrip(b" \t\r\n").startswith(b"{")
+    assert auto_validator.validate("reading", payload) == (True, "")
+
+
+def test_auto_encoding_falls_back_to_json(auto_validator):
+    assert auto_validator.validate("reading", b'{"gateway": "gw-1"}') == (True, "")
+    assert auto_validator.validate("reading", b'{"sensor_id": "s-1"}') == (
+        False, "Missing fields for protobuf payload: gateway"
+    )
+    valid, reason = auto_validator.validate("reading", b"\x01")
+    assert not valid
+    assert reason.startswith("Protobuf validation failed")
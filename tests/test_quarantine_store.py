@@ -0,0 +1,255 @@
+"""Tests for the quarantine store."""
+
+import asyncio
+import sqlite3
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import quarantine_store
+from quarantine_partitions import partition_from_row
+from quarantine_store import QuarantineStore
+
+
+class Clock(datetime):
+    """Stands in for datetime in quarantine_store so tests choose utcnow()."""
+
+    current = datetime(2024, 1, 1, 12, 0)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.current
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    monkeypatch.setattr(quarantine_store, "datetime", Clock)
+    monkeypatch.setattr(Clock, "current", datetime(2024, 1, 1, 12, 0))
+    return Clock
+
+
+@pytest.fixture
+def tmp_store(tmp_path, clock):
+    """Opens a store on a fresh database; each test runs in one event loop."""
+
+    @asynccontextmanager
+    async def opened():
+        store = QuarantineStore(
+            str(tmp_path / "quarantine.sqlite3"),
+            str(tmp_path / "quarantine"),
+            write_files=False,
+            compression="zlib",
+        )
+        try:
+            yield store
+        finally:
+            await store.close()
+
+    return opened
+
+
+def recount(db_path):
+    """Counters recomputed from the partitions with COUNT(*) and GROUP BY, zeros left out."""
+    expected = {}
+
+    def add(scope, value, key=""):
+        expected[(scope, key)] = expected.get((scope, key), 0) + value
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT key, start_at, end_at FROM quarantine_partitions").fetchall()
+        for partition in (partition_from_row(*row) for row in rows):
+            messages = partition.messages_table
+            total, processed, unprocessed, payload_bytes, compressed = conn.execute(f"""
+                SELECT SUM(occurrence_count), SUM(processed), SUM(NOT processed),
+                       SUM(payload_size), SUM(COALESCE(compressed_size, payload_size))
+                FROM {messages}
+            """).fetchone()
+            add("total", total or 0)
+            add("processed", processed or 0)
+            add("unprocessed", unprocessed or 0)
+            add("payload_bytes", payload_bytes or 0)
+            add("compressed_payload_bytes", compressed or 0)
+            stored, stored_bytes = conn.execute(
+                f"SELECT COUNT(*), SUM(LENGTH(payload)) FROM {partition.payloads_table}"
+            ).fetchone()
+            add("stored_payloads", stored)
+            add("stored_payload_bytes", stored_bytes or 0)
+            for scope in ("reason", "topic"):
+                for key, count in conn.execute(
+                    f"SELECT {scope}, SUM(occurrence_count) FROM {messages} GROUP BY {scope}"
+                ):
+                    add(scope, count, key)
+    finally:
+        conn.close()
+    return {key: value for key, value in expected.items() if value}
+
+
+def counters(db_path, scopes_excluded=("hour",)):
+    """Non-zero running totals, as stored."""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT scope, key, value FROM quarantine_counters").fetchall()
+    finally:
+        conn.close()
+    return {
+        (scope, key): value for scope, key, value in rows
+        if value and scope not in scopes_excluded
+    }
+
+
+async def collect(store, **kwargs):
+    return [record async for record in store.iter_messages(**kwargs)]
+
+
+async def fill(store, clock, days=3, per_day=5):
+    """Store per_day messages on each of several days; messages of a day share a timestamp."""
+    for day in range(days):
+        clock.current = datetime(2024, 1, 1, 12, 0) + timedelta(days=day)
+        for index in range(per_day):
+            await store.store(f"sensors/{index}", f"{day}-{index}".encode(), "bad")
+
+
+def test_iteration_is_keyset_ordered_across_partitions(tmp_store, clock):
+    async def scenario():
+        async with tmp_store() as store:
+            await fill(store, clock)
+            return (
+                await collect(store, page_size=2),
+                await collect(store, page_size=2, descending=True),
+            )
+
+    ascending, descending = asyncio.run(scenario())
+    keys = [(record.received_at, record.id) for record in ascending]
+    assert len(keys) == 15
+    assert keys == sorted(keys)
+    # Several partitions are visited
+    assert len({record.id.split(":")[0] for record in ascending}) == 3
+    assert [record.id for record in descending] == [record.id for record in reversed(ascending)]
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_cursor_resumes_after_its_record(tmp_store, clock, descending):
+    async def scenario():
+        async with tmp_store() as store:
+            await fill(store, clock)
+            records = await collect(store, descending=descending)
+            resumed = [
+                await collect(store, descending=descending, page_size=3, cursor=record.cursor)
+                for record in records
+            ]
+            return records, resumed
+
+    records, resumed = asyncio.run(scenario())
+    ids = [record.id for record in records]
+    for position, rest in enumerate(resumed):
+        assert [record.id for record in rest] == ids[position + 1:]
+
+
+def test_marking_processed_while_iterating_neither_skips_nor_repeats(tmp_store, clock):
+    async def scenario():
+        async with tmp_store() as store:
+            await fill(store, clock)
+            seen = []
+            async for record in store.iter_messages(processed=False, page_size=2):
+                seen.append(record.id)
+                await store.mark_processed(record.id)
+            return seen, await collect(store, processed=False)
+
+    seen, left = asyncio.run(scenario())
+    assert len(seen) == len(set(seen)) == 15
+    assert left == []
+
+
+def test_cursor_is_tied_to_sort_order(tmp_store, clock):
+    async def scenario():
+        async with tmp_store() as store:
+            await fill(store, clock, days=1)
+            record = (await collect(store))[0]
+            with pytest.raises(ValueError):
+                await collect(store, descending=True, cursor=record.cursor)
+            with pytest.raises(ValueError):
+                await collect(store, cursor="not-a-cursor")
+
+    asyncio.run(scenario())
+
+
+def test_counters_match_recount_after_mixed_writes(tmp_store, clock, tmp_path):
+    db_path = str(tmp_path / "quarantine.sqlite3")
+
+    async def check(store):
+        await store.flush()
+        assert counters(db_path) == recount(db_path)
+
+    async def scenario():
+        async with tmp_store() as store:
+            # Day 1: a repeat merged in the buffer moves its reason
+            a1 = await store.store("sensors/a", b"payload-a", "too large")
+            await store.store("sensors/b", b"payload-b", "too large")
+            await store.store("sensors/a", b"payload-a", "bad schema")
+            await check(store)
+
+            # A stored repeat moves all earlier occurrences to the new reason
+            await store.store("sensors/a", b"payload-a", "bad topic")
+            await check(store)
+
+            # Processed marks are counted once, however often they are applied
+            assert await store.mark_processed_batch([a1]) == 1
+            await store.mark_processed(a1)
+            await store.increment_retry_count(a1)
+            await check(store)
+
+            # A repeat reopens a processed message
+            clock.current += timedelta(hours=1)
+            await store.store("sensors/a", b"payload-a", "bad schema")
+            await store.store("sensors/c", b"payload-a", "bad schema")
+            await check(store)
+            await store.mark_processed(a1)
+
+            # Day 2 and 3: the same content lands in new partitions
+            for day in (1, 2):
+                clock.current = datetime(2024, 1, 1, 12, 0) + timedelta(days=day)
+                repeat = await store.store("sensors/a", b"payload-a", "bad schema")
+                await store.store("sensors/b", b"payload-b", f"reason {day}")
+                await store.store("sensors/d", b"x" * 5000, "too large")
+                await store.store("sensors/d", b"x" * 5000, "too large")
+                await store.mark_processed_batch([repeat])
+                await check(store)
+
+            hours = counters(db_path, scopes_excluded=())
+            hour_total = sum(
+                value for (scope, _), value in hours.items() if scope == "hour"
+            )
+            assert hour_total == recount(db_path)[("total", "")]
+
+            stats = await store.get_statistics()
+            expected = recount(db_path)
+            assert stats["total_messages"] == expected[("total", "")]
+            assert stats["processed_messages"] == expected[("processed", "")]
+            assert stats["unprocessed_messages"] == expected[("unprocessed", "")]
+            assert stats["messages_by_reason"] == {
+                key: value for (scope, key), value in expected.items() if scope == "reason"
+            }
+            assert await store.get_topic_counts() == {
+                key: value for (scope, key), value in expected.items() if scope == "topic"
+            }
+
+            # Retention drops days 1 and 2 and subtracts them from the totals
+            before = recount(db_path)[("total", "")]
+            clock.current = datetime(2024, 2, 2, 12, 0)
+            deleted = await store.cleanup_old_messages(days_old=30)
+            assert deleted == before - recount(db_path)[("total", "")]
+            assert deleted > 0
+            assert (await store.get_statistics())["partitions"] == 1
+            await check(store)
+
+            # Hour buckets older than the retention cutoff are gone as well
+            cutoff = (clock.current - timedelta(days=30)).isoformat()[:13]
+            assert all(
+                key >= cutoff
+                for (scope, key) in counters(db_path, scopes_excluded=())
+                if scope == "hour"
+            )
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+"""Tests for the topic pattern trie."""
+
+import random
+
+import pytest
+
+from topic_matcher import ALLOW_TABLE, SCHEMA_TABLE, TopicMatcher, compile_topic_rules
+from utils import match_topic
+
+
+PATTERNS = [
+    "#", "+", "+/+", "+/+/+", "+/b", "a/#", "a/+", "a/b", "a/+/c", "a/b/#",
+    "a/#/c", "x+y/z", "regex:^a/b.*$", "sensors/+/temperature",
+]
+
+TOPICS = [
+    "", "/", "//", "a", "a/", "/b", "b", "a/b", "a//c", "a/b/c", "a/b/c/d",
+    "x+y/z", "sensors/1/temperature", "sensors//temperature",
+]
+
+
+def first_match(table, topic):
+    """Reference semantics: value of the first pattern in table order that matches."""
+    return next((value for pattern, value in table if match_topic(pattern, topic)), None)
+
+
+@pytest.mark.parametrize("table, topic, expected", [
+    # Rule order wins, not specificity
+    ([("sensors/#", "any"), ("sensors/+/temperature", "temp")], "sensors/1/temperature", "any"),
+    ([("sensors/+/temperature", "temp"), ("sensors/#", "any")], "sensors/1/temperature", "temp"),
+    # Regex fallbacks take part in the same ordering as trie patterns
+    ([("regex:^a/.*$", "regex"), ("a/b", "exact")], "a/b", "regex"),
+    ([("a/b", "exact"), ("regex:^a/.*$", "regex")], "a/b", "exact"),
+    ([("a/#", "hash"), ("a", "exact")], "a", "exact"),
+    ([("a/+", "plus")], "a/", None),
+    ([("a/+", "plus")], "a/b/c", None),
+    # A pattern listed twice keeps its first position
+    ([("a/b", "first"), ("#", "hash"), ("a/b", "second")], "a/b", "first"),
+])
+def test_first_matching_rule_wins(table, topic, expected):
+    assert TopicMatcher([table]).match(topic) == (expected,)
+
+
+def test_matches_reference_semantics_for_random_tables():
+    rng = random.Random(20240101)
+    for _ in range(500):
+        table = [(pattern, index) for index, pattern in enumerate(
+            rng.sample(PATTERNS, rng.randint(1, 6))
+        )]
+        matcher = TopicMatcher([table])
+        for topic in TOPICS:
+            assert matcher.match(topic) == (first_match(table, topic),), (table, topic)
+
+
+def test_tables_are_resolved_independently():
+    matcher = compile_topic_rules(
+        ["sensors/#", "devices/+/status"],
+        {"sensors/+/humidity": "humidity:v1", "sensors/#": "sensor_event:v1"},
+    )
+    result = matcher.match("sensors/1/humidity")
+    assert result[ALLOW_TABLE] == "sensors/#"
+    assert result[SCHEMA_TABLE] == "humidity:v1"
+
+    result = matcher.match("devices/1/status")
+    assert result[ALLOW_TABLE] == "devices/+/status"
+    assert result[SCHEMA_TABLE] is None
+
+    assert matcher.match("other/topic") == (None, None)